@@ -0,0 +1,185 @@
+"""Measure v2 sync stream parsing, from raw SSE payloads to storage rows.
+
+Feed it a recorded stream, e.g. the body of a /sync/v1/download response
+saved with curl, or let it generate a synthetic one with --tasks.
+
+Usage: python -m benchmarks.sse_parse [PAYLOAD] [--tasks N] [--save PATH] [--rounds N]
+"""
+
+import argparse
+import json
+import lzma
+import time
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import Any
+
+from evernote_backup.evernote_client_sync import _parse_sync_event_data, orjson
+from evernote_backup.evernote_types import EvernoteEntityType, SyncChunkV2
+from evernote_backup.note_storage import _get_reminder_row, _get_task_row
+
+EVENT_SIZE = 100
+DEFAULT_LZMA_PRESET = 6
+
+
+def make_payload(tasks_count: int) -> str:
+    """SSE stream with a task and a reminder per item, as the server sends it."""
+
+    items = []
+    for i in range(tasks_count):
+        task_id = f"{i:08x}-0000-4000-8000-000000000000"
+        updated = 1700000000000 + i
+
+        items.append(
+            {
+                "instance": {
+                    "ref": {"id": task_id, "type": EvernoteEntityType.TASK},
+                    "type": 1,
+                    "parentEntity": {
+                        "id": f"{i:08x}-1111-4000-8000-000000000000",
+                        "type": EvernoteEntityType.NOTE,
+                    },
+                    "label": f"Synthetic task {i}",
+                    "description": "Some description",
+                    "noteLevelID": "nl-0123456789",
+                    "taskGroupNoteLevelID": "tg-0123456789",
+                    "status": "open",
+                    "inNote": True,
+                    "flag": False,
+                    "sortWeight": "A",
+                    "ownerId": 1,
+                    "creator": 1,
+                    "lastEditor": 1,
+                    "created": updated,
+                    "updated": updated,
+                },
+                "operation": 2,
+                "updated": updated,
+            }
+        )
+        items.append(
+            {
+                "instance": {
+                    "ref": {"id": f"r-{task_id}", "type": EvernoteEntityType.REMINDER},
+                    "type": 1,
+                    "parentEntity": {"id": task_id, "type": EvernoteEntityType.TASK},
+                    "reminderDate": updated + 86400000,
+                    "status": "active",
+                    "ownerId": 1,
+                    "created": updated,
+                    "updated": updated,
+                },
+                "operation": 2,
+                "updated": updated,
+            }
+        )
+
+    lines = ['event: connection\ndata: {"connectionId":"benchmark"}\n\n']
+    for pos in range(0, len(items), EVENT_SIZE):
+        data = json.dumps(items[pos : pos + EVENT_SIZE], separators=(",", ":"))
+        lines.append(f"event: sync\ndata: {data}\n\n")
+    lines.append('event: complete\ndata: {"documentCount":0}\n\n')
+    lines.append("event: close\ndata: {}\n\n")
+
+    return "".join(lines)
+
+
+def read_sync_events(payload: str) -> list[str]:
+    """Data of "sync" events from a raw text/event-stream body."""
+
+    events = []
+
+    for block in payload.replace("\r\n", "\n").split("\n\n"):
+        event_type = "message"
+        data_lines = []
+
+        for line in block.split("\n"):
+            field, _, value = line.partition(":")
+            value = value.removeprefix(" ")
+
+            if field == "event":
+                event_type = value
+            elif field == "data":
+                data_lines.append(value)
+
+        if event_type == "sync" and data_lines:
+            events.append("\n".join(data_lines))
+
+    return events
+
+
+def measure(func: Callable[[], Any], rounds: int) -> float:
+    best = float("inf")
+
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def get_rows(chunks: Iterable[SyncChunkV2]) -> None:
+    for chunk in chunks:
+        for task in chunk.tasks:
+            _get_task_row(task)
+        for reminder in chunk.reminders:
+            _get_reminder_row(reminder)
+
+
+def get_rows_default_preset(chunks: Iterable[SyncChunkV2]) -> None:
+    for chunk in chunks:
+        for record in (*chunk.tasks, *chunk.reminders):
+            lzma.compress(record.to_json().encode("utf-8"), preset=DEFAULT_LZMA_PRESET)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("payload", type=Path, nargs="?")
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--save", type=Path)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.payload:
+        payload = args.payload.read_text(encoding="utf-8")
+    else:
+        payload = make_payload(args.tasks)
+
+    if args.save:
+        args.save.write_text(payload, encoding="utf-8")
+
+    events = read_sync_events(payload)
+    decoded = [json.loads(e) for e in events]
+    chunks = [_parse_sync_event_data(d, current_user_id=1) for d in decoded]
+
+    records_count = sum(len(c.tasks) + len(c.reminders) for c in chunks)
+
+    print(f"Payload size: {len(payload) / 1024 / 1024:.1f} MB")
+    print(f"Sync events: {len(events)}, tasks and reminders: {records_count}")
+
+    json_time = measure(lambda: [json.loads(e) for e in events], args.rounds)
+    print(f"json.loads:             {json_time * 1000:8.1f} ms")
+
+    if orjson is not None:
+        orjson_time = measure(lambda: [orjson.loads(e) for e in events], args.rounds)
+        print(f"orjson.loads:           {orjson_time * 1000:8.1f} ms")
+    else:
+        print("orjson.loads:           not installed")
+
+    parse_time = measure(
+        lambda: [_parse_sync_event_data(d, current_user_id=1) for d in decoded],
+        args.rounds,
+    )
+    print(f"_parse_sync_event_data: {parse_time * 1000:8.1f} ms")
+
+    rows_time = measure(lambda: get_rows(chunks), args.rounds)
+    default_rows_time = measure(lambda: get_rows_default_preset(chunks), args.rounds)
+    print(f"Storage rows:           {rows_time * 1000:8.1f} ms")
+    print(
+        f"Storage rows, preset {DEFAULT_LZMA_PRESET}:  {default_rows_time * 1000:8.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
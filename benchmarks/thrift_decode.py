@@ -0,0 +1,109 @@
+"""Compare Thrift decoding speed of the pure Python and accelerated protocols.
+
+Usage: python -m benchmarks.thrift_decode [--resources N] [--rounds N]
+"""
+
+import argparse
+import time
+from collections.abc import Callable
+
+from evernote.edam.notestore.NoteStore import getNote_result
+from evernote.edam.type.ttypes import (
+    Data,
+    Note,
+    NoteAttributes,
+    Resource,
+    ResourceAttributes,
+    SharedNote,
+    SharedNotePrivilegeLevel,
+)
+from thrift.protocol.TBinaryProtocol import TBinaryProtocol
+from thrift.transport.TTransport import TMemoryBuffer
+
+from evernote_backup.evernote_client_api_http import (
+    TBinaryProtocolAcceleratedHotfix,
+    TBinaryProtocolHotfix,
+)
+
+
+def make_note(resources_count: int) -> Note:
+    body = "<div>Synthetic paragraph with some text.</div>" * 20000
+
+    return Note(
+        guid="note-guid",
+        title="Synthetic note",
+        content=f"<en-note>{body}</en-note>",
+        notebookGuid="notebook-guid",
+        active=True,
+        created=1600000000000,
+        updated=1600000000000,
+        tagGuids=[f"tag-{i}" for i in range(50)],
+        attributes=NoteAttributes(author="author", source="web.clip"),
+        sharedNotes=[
+            SharedNote(sharerUserID=i, privilege=SharedNotePrivilegeLevel.READ_NOTE)
+            for i in range(10)
+        ],
+        resources=[
+            Resource(
+                guid=f"res-{i}",
+                noteGuid="note-guid",
+                mime="image/png",
+                width=640,
+                height=480,
+                data=Data(bodyHash=i.to_bytes(16, "big"), size=4096, body=b"x" * 4096),
+                recognition=Data(
+                    bodyHash=i.to_bytes(16, "big"), size=2048, body=b"r" * 2048
+                ),
+                attributes=ResourceAttributes(
+                    fileName=f"image-{i}.png", timestamp=1600000000000
+                ),
+            )
+            for i in range(resources_count)
+        ],
+    )
+
+
+def encode_message(note: Note) -> bytes:
+    buf = TMemoryBuffer()
+    getNote_result(success=note).write(TBinaryProtocol(buf))
+    return buf.getvalue()
+
+
+def measure(
+    protocol_type: Callable[[TMemoryBuffer], TBinaryProtocol],
+    message: bytes,
+    rounds: int,
+) -> float:
+    best = float("inf")
+
+    for _ in range(rounds):
+        result = getNote_result()
+        protocol = protocol_type(TMemoryBuffer(message))
+
+        start = time.perf_counter()
+        result.read(protocol)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--resources", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    note = make_note(args.resources)
+    message = encode_message(note)
+
+    python_time = measure(TBinaryProtocolHotfix, message, args.rounds)
+    fast_time = measure(TBinaryProtocolAcceleratedHotfix, message, args.rounds)
+
+    print(f"Message size: {len(message) / 1024 / 1024:.1f} MB")
+    print(f"TBinaryProtocolHotfix:            {python_time * 1000:8.1f} ms")
+    print(f"TBinaryProtocolAcceleratedHotfix: {fast_time * 1000:8.1f} ms")
+    print(f"Speedup: {python_time / fast_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
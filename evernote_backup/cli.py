@@ -15,12 +15,14 @@ from evernote_backup import cli_app, config_defaults
 from evernote_backup.cli_app_click_util import (
     DIR_ONLY,
     FILE_ONLY,
+    TRAFFIC_RULE,
     DescribedChoice,
     DescribedChoiceCommand,
     NaturalOrderGroup,
     group_options,
 )
 from evernote_backup.errors import ProgramTerminatedError
+from evernote_backup.evernote_client_api_traffic import TrafficRule
 from evernote_backup.evernote_client_util import require, thrift_attrs
 from evernote_backup.log_util import get_time_from_now_txt, get_time_txt, init_logging
 from evernote_backup.version import __version__
@@ -150,6 +152,110 @@ opt_api_data = click.option(
     help="Custom API data, use 'key:secret' format. (Advanced option)",
 )
 
+opt_max_chunk_results = click.option(
+    "--max-chunk-results",
+    default=config_defaults.SYNC_CHUNK_MAX_RESULTS,
+    type=click.IntRange(1, config_defaults.SYNC_CHUNK_MAX_RESULTS_SERVER_LIMIT),
+    show_default=True,
+    help="Max entries per sync chunk. (Advanced option)",
+)
+
+opt_max_download_workers = click.option(
+    "--max-download-workers",
+    default=config_defaults.SYNC_MAX_DOWNLOAD_WORKERS,
+    show_default=True,
+    type=click.IntRange(1, config_defaults.SYNC_MAX_DOWNLOAD_WORKERS_SANE_LIMIT),
+    help=(
+        "Max number of parallel downloads. Don't set too high to avoid rate limits."
+        " (Advanced option)"
+    ),
+)
+
+opt_download_cache_memory_limit = click.option(
+    "--download-cache-memory-limit",
+    default=config_defaults.SYNC_DOWNLOAD_CACHE_MEMORY_LIMIT,
+    show_default=True,
+    type=click.IntRange(1),
+    help=(
+        "Cache size in MB for notes stored in memory before writing to disk."
+        " (Advanced option)"
+    ),
+)
+
+opt_two_phase = click.option(
+    "--two-phase",
+    is_flag=True,
+    help=(
+        "Download notes without attachments first, then download attachments."
+        " Makes database usable for listing and export sooner on large accounts."
+    ),
+)
+
+opt_max_backfill_size = click.option(
+    "--max-backfill-size",
+    default=config_defaults.SYNC_BACKFILL_SIZE_LIMIT,
+    show_default=True,
+    type=click.IntRange(0),
+    help=(
+        "Max size in MB of attachments to download per run, 0 means no limit."
+        " The rest is downloaded during the next sync. (Advanced option)"
+    ),
+)
+
+opt_no_http_compression = click.option(
+    "--no-http-compression",
+    is_flag=True,
+    help=(
+        "Don't request gzip/deflate compressed API responses."
+        " Saves some CPU on very fast connections. (Advanced option)"
+    ),
+)
+
+opt_http2 = click.option(
+    "--http2",
+    is_flag=True,
+    help=(
+        "Send all parallel downloads over a single HTTP/2 connection"
+        " instead of one connection per download worker. (Advanced option)"
+    ),
+)
+
+opt_max_rate_limit_wait = click.option(
+    "--max-rate-limit-wait",
+    default=config_defaults.SYNC_MAX_RATE_LIMIT_WAIT,
+    show_default=True,
+    type=click.IntRange(0),
+    help=(
+        "Max number of seconds to pause downloads when Evernote rate limit"
+        " is reached, 0 means no limit. Longer limits abort the sync."
+        " (Advanced option)"
+    ),
+)
+
+opt_max_request_rate = click.option(
+    "--max-request-rate",
+    multiple=True,
+    type=TRAFFIC_RULE,
+    metavar="RPM[@HH:MM-HH:MM]",
+    help=(
+        "Max number of API requests per minute, 0 means no limit."
+        " Repeat with a time of day window to use a different limit"
+        " during that time, e.g. 300@09:00-18:00. (Advanced option)"
+    ),
+)
+
+opt_max_download_rate = click.option(
+    "--max-download-rate",
+    multiple=True,
+    type=TRAFFIC_RULE,
+    metavar="MBPS[@HH:MM-HH:MM]",
+    help=(
+        "Max download speed in MB/s, 0 means no limit."
+        " Repeat with a time of day window to use a different limit"
+        " during that time, e.g. 1.5@09:00-18:00. (Advanced option)"
+    ),
+)
+
 
 def handle_errors(f: Callable) -> Callable:
     logger = logging.getLogger(__name__)
@@ -158,6 +264,8 @@ def handle_errors(f: Callable) -> Callable:
     def wrapper(*args: Any, **kwargs: Any) -> Any:
         try:
             return f(*args, **kwargs)
+        except click.ClickException:
+            raise
         except ProgramTerminatedError as e:
             logger.critical(e)
         except SSLError as e:
@@ -289,30 +397,58 @@ def init_db(
 
 @cli.command()
 @opt_database
+@opt_max_chunk_results
+@opt_max_download_workers
+@opt_download_cache_memory_limit
+@opt_two_phase
 @click.option(
-    "--max-chunk-results",
-    default=config_defaults.SYNC_CHUNK_MAX_RESULTS,
-    type=click.IntRange(1, config_defaults.SYNC_CHUNK_MAX_RESULTS_SERVER_LIMIT),
+    "--no-pipeline",
+    is_flag=True,
+    help=(
+        "Don't download notes while sync chunks are still being fetched,"
+        " download them only after the whole sync. (Advanced option)"
+    ),
+)
+@click.option(
+    "--max-backfill-workers",
+    default=config_defaults.SYNC_MAX_BACKFILL_WORKERS,
     show_default=True,
-    help="Max entries per sync chunk. (Advanced option)",
+    type=click.IntRange(1, config_defaults.SYNC_MAX_DOWNLOAD_WORKERS_SANE_LIMIT),
+    help="Max number of parallel attachment downloads. (Advanced option)",
 )
+@opt_max_backfill_size
 @click.option(
-    "--max-download-workers",
-    default=config_defaults.SYNC_MAX_DOWNLOAD_WORKERS,
+    "--max-linked-sync-workers",
+    default=config_defaults.SYNC_MAX_LINKED_SYNC_WORKERS,
     show_default=True,
     type=click.IntRange(1, config_defaults.SYNC_MAX_DOWNLOAD_WORKERS_SANE_LIMIT),
+    help="Max number of linked notebooks synced in parallel. (Advanced option)",
+)
+@click.option(
+    "--download-engine",
+    default=config_defaults.SYNC_DOWNLOAD_ENGINE,
+    show_default=True,
+    type=click.Choice(["thread", "process", "async"]),
     help=(
-        "Max number of parallel downloads. Don't set too high to avoid rate limits."
+        "Download notes in threads, in separate processes or on an asyncio"
+        " event loop. Processes use more memory but scale better on fast"
+        " connections, async allows many more parallel downloads."
         " (Advanced option)"
     ),
 )
+@opt_no_http_compression
+@opt_http2
+@opt_max_rate_limit_wait
+@opt_max_request_rate
+@opt_max_download_rate
 @click.option(
-    "--download-cache-memory-limit",
-    default=config_defaults.SYNC_DOWNLOAD_CACHE_MEMORY_LIMIT,
+    "--v2-checkpoint-chunks",
+    default=config_defaults.SYNC_V2_CHECKPOINT_CHUNKS,
     show_default=True,
     type=click.IntRange(1),
     help=(
-        "Cache size in MB for notes stored in memory before writing to disk."
+        "Save tasks, reminders and shared notes sync progress every N sync chunks."
+        " Higher values mean fewer database writes on large accounts."
         " (Advanced option)"
     ),
 )
@@ -325,12 +461,30 @@ def sync(
     max_chunk_results: int,
     max_download_workers: int,
     download_cache_memory_limit: int,
+    two_phase: bool,
+    no_pipeline: bool,
+    max_backfill_workers: int,
+    max_backfill_size: int,
+    max_linked_sync_workers: int,
+    download_engine: str,
+    no_http_compression: bool,
+    http2: bool,
+    max_rate_limit_wait: int,
+    max_request_rate: tuple[TrafficRule, ...],
+    max_download_rate: tuple[TrafficRule, ...],
+    v2_checkpoint_chunks: int,
     network_retry_count: int,
     use_system_ssl_ca: bool,
     token: str | None,
 ) -> None:
     """Sync local database with Evernote, downloading all notes."""
 
+    if http2 and download_engine == "async":
+        raise click.UsageError(
+            "--http2 can't be used with --download-engine async,"
+            " async downloads use HTTP/1.1 connections."
+        )
+
     cli_app.sync(
         database=database,
         max_chunk_results=max_chunk_results,
@@ -339,6 +493,97 @@ def sync(
         network_retry_count=network_retry_count,
         use_system_ssl_ca=use_system_ssl_ca,
         token=token,
+        is_two_phase=two_phase,
+        is_pipelined=not no_pipeline,
+        max_backfill_workers=max_backfill_workers,
+        max_backfill_size=max_backfill_size,
+        max_linked_sync_workers=max_linked_sync_workers,
+        download_engine=download_engine,
+        http_compression=not no_http_compression,
+        http2=http2,
+        max_rate_limit_wait=max_rate_limit_wait,
+        request_rate_rules=max_request_rate,
+        download_rate_rules=max_download_rate,
+        v2_checkpoint_chunks=v2_checkpoint_chunks,
+    )
+
+
+@cli.command()
+@click.argument(
+    "manifest",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+)
+@click.option(
+    "--max-parallel-syncs",
+    default=config_defaults.SYNC_MANY_MAX_PARALLEL_SYNCS,
+    show_default=True,
+    type=click.IntRange(1),
+    help="Max number of databases synced at the same time.",
+)
+@click.option(
+    "--max-total-download-workers",
+    default=config_defaults.SYNC_MANY_MAX_TOTAL_DOWNLOAD_WORKERS,
+    show_default=True,
+    type=click.IntRange(0),
+    help=(
+        "Max number of parallel downloads of all databases together,"
+        " 0 means no limit. Downloads are shared fairly between databases."
+    ),
+)
+@opt_max_chunk_results
+@opt_max_download_workers
+@opt_download_cache_memory_limit
+@opt_two_phase
+@opt_max_backfill_size
+@opt_no_http_compression
+@opt_http2
+@opt_max_rate_limit_wait
+@opt_max_request_rate
+@opt_max_download_rate
+@opt_network_retry_count
+@opt_use_system_ssl_ca
+@handle_errors
+def sync_many(
+    manifest: Path,
+    max_parallel_syncs: int,
+    max_total_download_workers: int,
+    max_chunk_results: int,
+    max_download_workers: int,
+    download_cache_memory_limit: int,
+    two_phase: bool,
+    max_backfill_size: int,
+    no_http_compression: bool,
+    http2: bool,
+    max_rate_limit_wait: int,
+    max_request_rate: tuple[TrafficRule, ...],
+    max_download_rate: tuple[TrafficRule, ...],
+    network_retry_count: int,
+    use_system_ssl_ca: bool,
+) -> None:
+    """Sync many databases listed in MANIFEST file, one path per line.
+
+    \b
+    Databases are synced in one process, sharing traffic limits
+    and connections. '--max-download-workers' applies to each database.
+    """
+
+    cli_app.sync_many(
+        manifest=manifest,
+        max_parallel_syncs=max_parallel_syncs,
+        max_total_download_workers=max_total_download_workers,
+        max_chunk_results=max_chunk_results,
+        max_download_workers=max_download_workers,
+        download_cache_memory_limit=download_cache_memory_limit,
+        network_retry_count=network_retry_count,
+        use_system_ssl_ca=use_system_ssl_ca,
+        is_two_phase=two_phase,
+        max_backfill_size=max_backfill_size,
+        http_compression=not no_http_compression,
+        http2=http2,
+        max_rate_limit_wait=max_rate_limit_wait,
+        request_rate_rules=max_request_rate,
+        download_rate_rules=max_download_rate,
     )
 
 
@@ -612,5 +857,38 @@ def manage_blacklist(
     )
 
 
+@manage.command("failures")
+@opt_database
+@click.option(
+    "--del-note-id",
+    multiple=True,
+    help="Reset failed download record of note GUID(s). (Can be used multiple times)",
+)
+@click.option(
+    "--reset-notes",
+    is_flag=True,
+    help="Reset all failed download records.",
+)
+@handle_errors
+def manage_failures(
+    database: Path,
+    del_note_id: tuple[str, ...],
+    reset_notes: bool,
+) -> None:
+    """Manage notes that failed to download
+
+    \b
+    Notes that fail to download are skipped by following syncs for a
+    cool-down period, which doubles after every failure. Reset them here
+    to retry on the next sync.
+    """
+
+    cli_app.manage_failures(
+        database=database,
+        del_note_id=del_note_id,
+        reset_notes=reset_notes,
+    )
+
+
 def main() -> None:
     cli()
@@ -1,7 +1,16 @@
+import datetime as dt
+import functools
 import logging
+import sqlite3
+import time
+from collections import Counter
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
 from ssl import SSLError
 
+from evernote_backup import config_defaults
 from evernote_backup.cli_app_auth import (
     get_auth_token,
     get_ping_client,
@@ -12,6 +21,8 @@ from evernote_backup.cli_app_storage import (
     initialize_storage,
     raise_on_existing_database,
     raise_on_old_database_version,
+    read_sync_manifest,
+    store_auth_token,
 )
 from evernote_backup.cli_app_util import (
     parse_guid,
@@ -21,18 +32,42 @@ from evernote_backup.errors import (
     DatabaseCorruptError,
     DatabaseEmptyError,
     ProgramTerminatedError,
+    WorkerStopException,
     WrongAuthUserError,
 )
+from evernote_backup.evernote_client_api_http import (
+    close_http2_connections,
+    is_http2_available,
+    transfer_stats,
+)
+from evernote_backup.evernote_client_api_traffic import TrafficRule, traffic_shaper
 from evernote_backup.evernote_client_util_ssl import log_ssl_debug_info
+from evernote_backup.log_util import get_time_txt, log_label
 from evernote_backup.note_checker import NoteChecker
 from evernote_backup.note_exporter import NoteExporter
 from evernote_backup.note_lister import NoteLister
-from evernote_backup.note_synchronizer import NoteSynchronizer
-from evernote_backup.token_util import resolve_auth_token
+from evernote_backup.note_synchronizer import (
+    DownloadSlots,
+    NoteSynchronizer,
+    StopSignal,
+)
+from evernote_backup.token_util import (
+    OAuth2TokenBundle,
+    TokenRefresher,
+    resolve_auth_token,
+)
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class DatabaseSyncResult:
+    database: Path
+    duration: float
+    report: list[tuple[str, int]] = field(default_factory=list)
+    error: str | None = None
+
+
 def init_db(
     database: Path,
     auth_user: str | None,
@@ -150,6 +185,9 @@ def reauth(
 
     storage.config.set_config_value("auth_token", auth_resolved.auth_for_storage)
 
+    # Shared notebook tokens were issued for the previous user token
+    storage.notebooks.clear_linked_notebooks_auth()
+
     logger.info(f"Successfully refreshed auth token for {local_user}!")
 
 
@@ -161,7 +199,233 @@ def sync(
     network_retry_count: int,
     use_system_ssl_ca: bool,
     token: str | None,
+    is_two_phase: bool = False,
+    is_pipelined: bool = True,
+    max_backfill_workers: int = config_defaults.SYNC_MAX_BACKFILL_WORKERS,
+    max_backfill_size: int = config_defaults.SYNC_BACKFILL_SIZE_LIMIT,
+    max_linked_sync_workers: int = config_defaults.SYNC_MAX_LINKED_SYNC_WORKERS,
+    download_engine: str = config_defaults.SYNC_DOWNLOAD_ENGINE,
+    http_compression: bool = True,
+    http2: bool = False,
+    max_rate_limit_wait: int = config_defaults.SYNC_MAX_RATE_LIMIT_WAIT,
+    request_rate_rules: Sequence[TrafficRule] = (),
+    download_rate_rules: Sequence[TrafficRule] = (),
+    v2_checkpoint_chunks: int = config_defaults.SYNC_V2_CHECKPOINT_CHUNKS,
+) -> None:
+    _raise_on_missing_http2(http2)
+    _configure_traffic(request_rate_rules, download_rate_rules)
+
+    try:
+        _sync_database(
+            database=database,
+            max_chunk_results=max_chunk_results,
+            max_download_workers=max_download_workers,
+            download_cache_memory_limit=download_cache_memory_limit,
+            network_retry_count=network_retry_count,
+            use_system_ssl_ca=use_system_ssl_ca,
+            token=token,
+            is_two_phase=is_two_phase,
+            is_pipelined=is_pipelined,
+            max_backfill_workers=max_backfill_workers,
+            max_backfill_size=max_backfill_size,
+            max_linked_sync_workers=max_linked_sync_workers,
+            download_engine=download_engine,
+            http_compression=http_compression,
+            http2=http2,
+            max_rate_limit_wait=max_rate_limit_wait,
+            v2_checkpoint_chunks=v2_checkpoint_chunks,
+        )
+    finally:
+        close_http2_connections()
+        log_transfer_stats()
+
+    logger.info("Synchronization completed!")
+
+
+def sync_many(
+    manifest: Path,
+    max_parallel_syncs: int,
+    max_total_download_workers: int,
+    max_chunk_results: int,
+    max_download_workers: int,
+    download_cache_memory_limit: int,
+    network_retry_count: int,
+    use_system_ssl_ca: bool,
+    is_two_phase: bool = False,
+    max_backfill_size: int = config_defaults.SYNC_BACKFILL_SIZE_LIMIT,
+    http_compression: bool = True,
+    http2: bool = False,
+    max_rate_limit_wait: int = config_defaults.SYNC_MAX_RATE_LIMIT_WAIT,
+    request_rate_rules: Sequence[TrafficRule] = (),
+    download_rate_rules: Sequence[TrafficRule] = (),
+) -> None:
+    _raise_on_missing_http2(http2)
+
+    databases = read_sync_manifest(manifest)
+
+    _configure_traffic(request_rate_rules, download_rate_rules)
+
+    # Downloads of all databases queue up for the same slots
+    download_slots = DownloadSlots(max_total_download_workers)
+
+    stop_signal = StopSignal()
+    stop_signal.add_listener(download_slots.cancel)
+
+    sync_database = functools.partial(
+        _sync_database,
+        max_chunk_results=max_chunk_results,
+        max_download_workers=max_download_workers,
+        download_cache_memory_limit=download_cache_memory_limit,
+        network_retry_count=network_retry_count,
+        use_system_ssl_ca=use_system_ssl_ca,
+        is_two_phase=is_two_phase,
+        max_backfill_size=max_backfill_size,
+        http_compression=http_compression,
+        http2=http2,
+        max_rate_limit_wait=max_rate_limit_wait,
+        download_slots=download_slots,
+        stop_signal=stop_signal,
+    )
+
+    logger.info(
+        f"Syncing {len(databases)} database(s), up to {max_parallel_syncs} at a time..."
+    )
+
+    executor = ThreadPoolExecutor(
+        max_workers=max_parallel_syncs, thread_name_prefix="sync_many"
+    )
+
+    try:
+        futures = [
+            executor.submit(_sync_account, sync_database, database)
+            for database in databases
+        ]
+
+        results = [f.result() for f in futures]
+    except KeyboardInterrupt:
+        logger.warning("Aborting, please wait...")
+
+        stop_signal.set()
+        executor.shutdown(cancel_futures=True)
+
+        raise
+    finally:
+        executor.shutdown()
+
+        close_http2_connections()
+        log_transfer_stats()
+
+    _log_sync_many_report(results)
+
+    failed_count = sum(1 for r in results if r.error is not None)
+    if failed_count:
+        raise ProgramTerminatedError(
+            f"Synchronization failed for {failed_count} of {len(results)} database(s)!"
+        )
+
+    logger.info("Synchronization of all databases completed!")
+
+
+def _sync_account(
+    sync_database: Callable[..., NoteSynchronizer], database: Path
+) -> DatabaseSyncResult:
+    start = time.monotonic()
+
+    # Syncs run side by side, label their messages with the database
+    with log_label(str(database)):
+        try:
+            note_synchronizer = sync_database(database=database)
+        except ProgramTerminatedError as e:
+            error = str(e)
+        except WorkerStopException:
+            error = "Synchronization stopped"
+        except Exception as e:
+            logger.exception("Unknown exception")
+            error = str(e) or type(e).__name__
+        else:
+            logger.info("Synchronization completed!")
+
+            return DatabaseSyncResult(
+                database=database,
+                duration=time.monotonic() - start,
+                report=note_synchronizer.get_report(),
+            )
+
+        logger.error(error)
+
+    return DatabaseSyncResult(
+        database=database, duration=time.monotonic() - start, error=error
+    )
+
+
+def _log_sync_many_report(results: Sequence[DatabaseSyncResult]) -> None:
+    totals: Counter[str] = Counter()
+
+    logger.info("Databases:")
+
+    for result in results:
+        status = "OK" if result.error is None else f"failed, {result.error}"
+        logger.info(
+            f"  {result.database}: {status} ({get_time_txt(int(result.duration))})"
+        )
+
+        for msg, count in result.report:
+            totals[msg] += count
+
+    for msg, count in totals.items():
+        if count > 0:
+            logger.info(f"{msg}: {count}")
+
+
+def _raise_on_missing_http2(http2: bool) -> None:
+    if http2 and not is_http2_available():
+        raise ProgramTerminatedError(
+            "--http2 requires the 'h2' package."
+            " Install evernote-backup with the 'http2' extra to use it."
+        )
+
+
+def _configure_traffic(
+    request_rate_rules: Sequence[TrafficRule],
+    download_rate_rules: Sequence[TrafficRule],
 ) -> None:
+    traffic_shaper.configure(request_rate_rules, download_rate_rules)
+
+    if traffic_limits := traffic_shaper.describe():
+        logger.info(f"Traffic limits: {traffic_limits}")
+
+
+def _store_refreshed_auth(database: Path, bundle: OAuth2TokenBundle) -> None:
+    try:
+        store_auth_token(database, bundle.to_json())
+    except sqlite3.Error as e:
+        logger.warning(f"Failed to store refreshed OAuth2 token bundle: {e}")
+        return
+
+    logger.debug("Stored refreshed OAuth2 token bundle in the database.")
+
+
+def _sync_database(
+    database: Path,
+    max_chunk_results: int,
+    max_download_workers: int,
+    download_cache_memory_limit: int,
+    network_retry_count: int,
+    use_system_ssl_ca: bool,
+    token: str | None = None,
+    is_two_phase: bool = False,
+    is_pipelined: bool = True,
+    max_backfill_workers: int = config_defaults.SYNC_MAX_BACKFILL_WORKERS,
+    max_backfill_size: int = config_defaults.SYNC_BACKFILL_SIZE_LIMIT,
+    max_linked_sync_workers: int = config_defaults.SYNC_MAX_LINKED_SYNC_WORKERS,
+    download_engine: str = config_defaults.SYNC_DOWNLOAD_ENGINE,
+    http_compression: bool = True,
+    http2: bool = False,
+    max_rate_limit_wait: int = config_defaults.SYNC_MAX_RATE_LIMIT_WAIT,
+    v2_checkpoint_chunks: int = config_defaults.SYNC_V2_CHECKPOINT_CHUNKS,
+    download_slots: DownloadSlots | None = None,
+    stop_signal: StopSignal | None = None,
+) -> NoteSynchronizer:
     storage = get_storage(database)
 
     raise_on_old_database_version(storage)
@@ -192,16 +456,43 @@ def sync(
         network_error_retry_count=network_retry_count,
         use_system_ssl_ca=use_system_ssl_ca,
         max_chunk_results=max_chunk_results,
+        http_compression=http_compression,
+        http2=http2,
     )
 
+    # Long syncs outlive OAuth2 tokens, keep them fresh meanwhile
+    token_refresher = None
+    if auth_resolved.bundle is not None:
+        token_refresher = TokenRefresher(auth_resolved.bundle)
+
     note_synchronizer = NoteSynchronizer(
         note_client,
         storage,
         max_download_workers,
         download_cache_memory_limit,
         is_v2_api_enabled,
+        is_two_phase=is_two_phase,
+        is_pipelined=is_pipelined,
+        max_backfill_workers=max_backfill_workers,
+        max_backfill_size=max_backfill_size,
+        max_linked_sync_workers=max_linked_sync_workers,
+        download_engine=download_engine,
+        max_rate_limit_wait=max_rate_limit_wait,
+        v2_checkpoint_chunks=v2_checkpoint_chunks,
+        token_refresher=token_refresher,
+        download_slots=download_slots,
+        stop_signal=stop_signal,
     )
 
+    if token_refresher is not None:
+        # Old refresh token may be rotated, don't wait for the sync to end
+        if not token:
+            token_refresher.add_listener(
+                functools.partial(_store_refreshed_auth, database)
+            )
+
+        token_refresher.start()
+
     try:
         note_synchronizer.sync()
     except WrongAuthUserError as e:
@@ -209,8 +500,27 @@ def sync(
             f"Current user of this database is {e.local_user}, not {e.remote_user}!"
             " Each user must use a different database file."
         )
+    finally:
+        if token_refresher is not None:
+            token_refresher.stop()
 
-    logger.info("Synchronization completed!")
+    return note_synchronizer
+
+
+def log_transfer_stats() -> None:
+    if not transfer_stats.received:
+        return
+
+    logger.debug(
+        f"API responses: {transfer_stats.received / 1024 / 1024:.2f} MB received,"
+        f" {transfer_stats.decoded / 1024 / 1024:.2f} MB decoded"
+    )
+
+    if traffic_shaper.throttled_seconds:
+        logger.debug(
+            f"Traffic limits delayed API calls by"
+            f" {traffic_shaper.throttled_seconds:.1f} seconds in total"
+        )
 
 
 def export(
@@ -401,6 +711,37 @@ def manage_blacklist(
     storage.config.set_blacklist_notebooks(notebooks)
 
 
+def manage_failures(
+    database: Path,
+    del_note_id: tuple[str, ...],
+    reset_notes: bool,
+) -> None:
+    storage = get_storage(database)
+
+    raise_on_old_database_version(storage)
+
+    if not del_note_id and not reset_notes:
+        _list_failures(storage)
+        return
+
+    del_notes = _parse_guids(del_note_id)
+
+    if reset_notes:
+        storage.download_failures.clear_failures()
+        logger.info("Cleared all failed note downloads.")
+        return
+
+    failed_notes = {f.guid for f in storage.download_failures.iter_failures()}
+
+    for note_id in del_notes:
+        if note_id in failed_notes:
+            logger.info(f"Reset failed downloads of note [{note_id}].")
+        else:
+            logger.warning(f"Note [{note_id}] has no failed downloads.")
+
+    storage.download_failures.reset_failures(del_notes)
+
+
 def _parse_guids(values: tuple[str, ...]) -> list[str]:
     parsed: list[str] = []
 
@@ -434,3 +775,22 @@ def _list_blacklist(storage) -> None:
             logger.info(f"- {notebook_id}")
     else:
         logger.info("- (none)")
+
+
+def _list_failures(storage) -> None:
+    failures = list(storage.download_failures.iter_failures())
+
+    if not failures:
+        logger.info("No failed note downloads.")
+        return
+
+    logger.info("Failed note downloads:")
+    for failure in failures:
+        next_attempt = dt.datetime.fromtimestamp(failure.next_attempt, dt.timezone.utc)
+
+        logger.info(
+            f"- '{failure.title}' [{failure.guid}],"
+            f" failed {failure.attempts} time(s),"
+            f" next attempt after {next_attempt.astimezone():%Y-%m-%d %H:%M:%S}"
+        )
+        logger.info(f"  {failure.last_error}")
@@ -23,6 +23,8 @@ def get_sync_client(
     use_system_ssl_ca: bool,
     max_chunk_results: int,
     jwt_token: str | None = None,
+    http_compression: bool = True,
+    http2: bool = False,
 ) -> EvernoteClientSync:
     logger.info(f"Authorizing monolith token, {backend} backend...")
 
@@ -35,6 +37,8 @@ def get_sync_client(
         cafile=cafile,
         max_chunk_results=max_chunk_results,
         jwt_token=jwt_token,
+        http_compression=http_compression,
+        http2=http2,
     )
 
     try:
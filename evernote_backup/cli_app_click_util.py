@@ -4,6 +4,8 @@ from typing import Any
 
 import click
 
+from evernote_backup.evernote_client_api_traffic import TrafficRule, parse_traffic_rule
+
 DIR_ONLY = click.Path(
     file_okay=False,
     writable=True,
@@ -19,6 +21,22 @@ FILE_ONLY = click.Path(
 )
 
 
+class TrafficRuleType(click.ParamType):
+    name = "limit"
+
+    def convert(self, value: Any, param: Any, ctx: Any) -> TrafficRule:
+        if isinstance(value, TrafficRule):
+            return value
+
+        try:
+            return parse_traffic_rule(value)
+        except ValueError as e:
+            self.fail(str(e), param, ctx)
+
+
+TRAFFIC_RULE = TrafficRuleType()
+
+
 class NaturalOrderGroup(click.Group):
     def list_commands(self, ctx: Any) -> list[str]:
         return list(self.commands.keys())
@@ -21,6 +21,16 @@ def get_storage(database_path: Path) -> SqliteStorage:
         )
 
 
+def store_auth_token(database_path: Path, auth_token: str) -> None:
+    """Store auth token with a separate connection, usable from any thread."""
+    storage = SqliteStorage(database_path)
+
+    try:
+        storage.config.set_config_value("auth_token", auth_token)
+    finally:
+        storage.db.close()
+
+
 def raise_on_old_database_version(storage: SqliteStorage) -> None:
     try:
         storage.check_version()
@@ -50,3 +60,30 @@ def initialize_storage(database_path: Path, force: bool) -> SqliteStorage:
     initialize_db(database_path)
 
     return get_storage(database_path)
+
+
+def read_sync_manifest(manifest_path: Path) -> list[Path]:
+    """Database paths listed one per line, relative to the manifest file."""
+
+    databases: list[Path] = []
+
+    for line in manifest_path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+
+        if not line or line.startswith("#"):
+            continue
+
+        database_path = manifest_path.parent / line
+
+        # Two syncs can't share a database
+        if database_path.resolve() in {d.resolve() for d in databases}:
+            raise ProgramTerminatedError(
+                f"Database {database_path} is listed in the manifest more than once."
+            )
+
+        databases.append(database_path)
+
+    if not databases:
+        raise ProgramTerminatedError(f"No databases listed in {manifest_path.name}.")
+
+    return databases
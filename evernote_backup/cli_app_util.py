@@ -5,13 +5,16 @@ import re
 import sys
 import uuid
 from collections.abc import Iterable, Iterator, Sequence
-from typing import TextIO
+from itertools import islice
+from typing import TextIO, TypeVar
 
 import click
 
 from evernote_backup.config import API_DATA_YINXIANG
 from evernote_backup.errors import ProgramTerminatedError
 
+T = TypeVar("T")
+
 # Evernote EDAM Guid: 36-char UUID string, e.g. 01234567-89ab-cdef-0123-456789abcdef
 _GUID_RE = re.compile(
     r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$",
@@ -60,6 +63,10 @@ def unscramble(scrambled_data: bytes) -> tuple[str, str]:
 
 
 def get_progress_output() -> TextIO | None:
+    # Syncs running in their own threads (sync-many) don't draw progress bars
+    if click.get_current_context(silent=True) is None:
+        return io.StringIO()
+
     is_verbose_mode = click.get_current_context().find_root().params["verbose"]
 
     if not is_console_interactive() or is_verbose_mode:
@@ -86,3 +93,11 @@ def chunks(lst: Sequence, n: int) -> Iterator[Iterable]:
     """Yield successive n-sized chunks from lst."""
 
     yield from (lst[i : i + n] for i in range(0, len(lst), n))
+
+
+def iter_chunks(items: Iterable[T], n: int) -> Iterator[list[T]]:
+    """Yield successive n-sized chunks from an iterable of unknown length."""
+
+    items_iter = iter(items)
+    while chunk := list(islice(items_iter, n)):
+        yield chunk
@@ -1,7 +1,7 @@
 API_DATA_YINXIANG = b"WFgyaS4uNmJ4bWN+OHp2ZTEpbGtvNDg6MW0wPmM9ZmFn"
 MCP_NAME = "Evernote Backup"
 
-CURRENT_DB_VERSION = 7
+CURRENT_DB_VERSION = 13
 
 # Local synthetic notebook for notes shared individually with the user.
 # Remote notebook shares continue to use Linked Notebooks (EDAM).
@@ -6,6 +6,14 @@ OAUTH_HOST = "localhost"
 SYNC_CHUNK_MAX_RESULTS = 200
 SYNC_MAX_DOWNLOAD_WORKERS = 5
 SYNC_DOWNLOAD_CACHE_MEMORY_LIMIT = 256
+SYNC_MAX_BACKFILL_WORKERS = 5
+SYNC_BACKFILL_SIZE_LIMIT = 0
+SYNC_MAX_LINKED_SYNC_WORKERS = 5
+SYNC_DOWNLOAD_ENGINE = "thread"
+SYNC_MAX_RATE_LIMIT_WAIT = 0
+SYNC_V2_CHECKPOINT_CHUNKS = 1
+SYNC_MANY_MAX_PARALLEL_SYNCS = 4
+SYNC_MANY_MAX_TOTAL_DOWNLOAD_WORKERS = 20
 DATABASE_NAME = "en_backup.db"
 BACKEND = "evernote"
 
@@ -13,6 +21,10 @@ SYNC_CHUNK_MAX_RESULTS_SERVER_LIMIT = 256
 SYNC_MAX_DOWNLOAD_WORKERS_SANE_LIMIT = 256
 
 TOKEN_REFRESH_SKEW = timedelta(minutes=15)
+LINKED_NOTEBOOK_AUTH_SKEW = timedelta(hours=1)
+
+SYNC_FAILED_NOTE_COOLDOWN = timedelta(hours=6)
+SYNC_FAILED_NOTE_MAX_COOLDOWN = timedelta(days=30)
 
 EVERNOTE_OAUTH_BASE = "https://accounts.evernote.com"
 EVERNOTE_TOKEN_URL = f"{EVERNOTE_OAUTH_BASE}/auth/token"
@@ -43,3 +43,7 @@ class WorkerStopException(Exception):
 
 class NoteDownloadException(Exception):
     """Raise when downloading note fails"""
+
+
+class SyncStreamInterruptedError(ConnectionError):
+    """Raise when sync event stream is dropped before it is complete"""
@@ -8,14 +8,16 @@ from evernote.edam.error.ttypes import (
     EDAMUserException,
 )
 from evernote.edam.userstore.constants import EDAM_VERSION_MAJOR, EDAM_VERSION_MINOR
-from requests_sse import EventSource, MessageEvent
+from requests_sse import EventSource, MessageEvent, ReadyState
 
 from evernote_backup.config_defaults import EVERNOTE_API_SYNC_DOWNLOAD_URL
-from evernote_backup.errors import EvernoteAuthError
+from evernote_backup.errors import EvernoteAuthError, SyncStreamInterruptedError
+from evernote_backup.evernote_client_api_async import AsyncNoteStoreClient
 from evernote_backup.evernote_client_api_http import (
     NoteStoreClientRetryable,
     UserStoreClientRetryable,
 )
+from evernote_backup.evernote_client_api_traffic import traffic_shaper
 from evernote_backup.evernote_client_util import raise_auth_error, require
 from evernote_backup.evernote_types import EvernoteEntityType
 from evernote_backup.token_util import EvernoteToken
@@ -55,6 +57,8 @@ class EvernoteClient(EvernoteClientBase):
         network_error_retry_count: int = 5,
         cafile: str | None = None,
         jwt_token: str | None = None,
+        http_compression: bool = True,
+        http2: bool = False,
     ) -> None:
         super().__init__(backend=backend)
 
@@ -67,11 +71,18 @@ class EvernoteClient(EvernoteClientBase):
 
         self.network_error_retry_count = network_error_retry_count
         self.cafile = cafile
+        self.http_compression = http_compression
+        self.http2 = http2
 
         self._user: str | None = None
         # OAuth2 access_token for new API (tasks). Provided by caller after refresh.
         self._token_jwt: str | None = jwt_token
 
+    def set_token(self, token: str, jwt_token: str | None = None) -> None:
+        """Switch to refreshed tokens, store clients are created per call."""
+        self.token = EvernoteToken.from_string(token)
+        self._token_jwt = jwt_token
+
     def check_version(self) -> bool:
         return self.user_store.checkVersion(
             self.user_agent, EDAM_VERSION_MAJOR, EDAM_VERSION_MINOR
@@ -95,6 +106,8 @@ class EvernoteClient(EvernoteClientBase):
             user_agent=self.user_agent,
             retry_max=self.network_error_retry_count,
             cafile=self.cafile,
+            http_compression=self.http_compression,
+            http2=self.http2,
         )
 
     @property
@@ -127,6 +140,25 @@ class EvernoteClient(EvernoteClientBase):
             user_agent=self.user_agent,
             retry_max=self.network_error_retry_count,
             cafile=self.cafile,
+            http_compression=self.http_compression,
+            http2=self.http2,
+        )
+
+    def get_async_note_store(
+        self,
+        shard: str | None = None,
+    ) -> "AsyncNoteStoreClient":
+        token = str(self.token) if self.token else ""
+        shard = shard if shard else self.shard
+        note_store_uri = self._get_endpoint(f"edam/note/{shard}")
+
+        return AsyncNoteStoreClient(
+            auth_token=token,
+            store_url=note_store_uri,
+            user_agent=self.user_agent,
+            retry_max=self.network_error_retry_count,
+            cafile=self.cafile,
+            http_compression=self.http_compression,
         )
 
     def iter_sync_events(
@@ -147,5 +179,24 @@ class EvernoteClient(EvernoteClientBase):
 
         url = f"{EVERNOTE_API_SYNC_DOWNLOAD_URL}?lastConnection={last_connection}&connectionId={connection_id}&entityFilter={entity_filter_arg}"
 
-        with EventSource(url, timeout=30, headers=headers) as event_source:
-            yield from event_source
+        traffic_shaper.wait_for_request()
+
+        def on_error() -> None:
+            # Don't let EventSource reconnect to the same url and replay the stream,
+            # caller resumes from the last applied event instead
+            if event_source.ready_state == ReadyState.CONNECTING:
+                raise SyncStreamInterruptedError("Sync stream interrupted")
+
+        event_source = EventSource(
+            url,
+            timeout=30,
+            headers=headers,
+            max_connect_retry=0,
+            on_error=on_error,
+        )
+
+        with event_source as events:
+            for event in events:
+                traffic_shaper.wait_for_received(len(event.data or ""))
+
+                yield event
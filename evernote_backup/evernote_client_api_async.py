@@ -0,0 +1,461 @@
+import asyncio
+import base64
+import logging
+import socket
+import ssl
+import tempfile
+import urllib.request
+from collections.abc import AsyncIterator
+from http.client import HTTPException
+from io import BytesIO
+from typing import IO, Any, cast
+from urllib.parse import SplitResult, unquote, urlsplit
+
+from evernote.edam.notestore import NoteStore
+from evernote.edam.type.ttypes import Note
+from thrift.transport.TTransport import TMemoryBuffer, TTransportBase
+
+from evernote_backup.evernote_client_api_http import (
+    DEFAULT_RETRY_BACKOFF_FACTOR,
+    DEFAULT_RETRY_DELAY,
+    DEFAULT_RETRY_EXCEPTIONS,
+    DEFAULT_RETRY_MAX,
+    DEFAULT_RETRY_MAX_DELAY,
+    RESPONSE_READ_SIZE,
+    TBinaryProtocolAcceleratedHotfix,
+    TStreamedResponseTransport,
+    get_accept_encoding,
+    get_response_decompressor,
+    transfer_stats,
+)
+from evernote_backup.evernote_client_api_traffic import traffic_shaper
+from evernote_backup.evernote_client_retry import get_backoff_delay
+from evernote_backup.evernote_client_util import require
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_HEADERS = 100
+
+# Larger responses are spooled to a temporary file until decoded
+RESPONSE_SPOOL_SIZE = 1024 * 1024
+
+StreamPair = tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class AsyncThriftHttpClient:
+    """
+    Thrift binary over HTTP/1.1 on asyncio streams
+
+    Idle keep-alive connections are pooled, so concurrent requests
+    each get their own connection without holding a thread.
+    Proxy from environment is used the same way as THttpClient does,
+    through a CONNECT tunnel.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        user_agent: str | None = None,
+        headers: dict[str, str] | None = None,
+        cafile: str | None = None,
+        http_compression: bool = True,
+    ):
+        self.url = url
+
+        url_parts = urlsplit(url)
+
+        self.scheme = url_parts.scheme
+        self.host = require(url_parts.hostname)
+        self.port = url_parts.port or (443 if self.scheme == "https" else 80)
+        self.path = url_parts.path or "/"
+        if url_parts.query:
+            self.path += f"?{url_parts.query}"
+
+        self._proxy: tuple[str, int, str | None] | None = None
+
+        proxy = urllib.request.getproxies().get(self.scheme)
+        if proxy and not urllib.request.proxy_bypass(self.host):
+            proxy_parts = urlsplit(proxy)
+            self._proxy = (
+                require(proxy_parts.hostname),
+                proxy_parts.port or 80,
+                _get_proxy_auth(proxy_parts),
+            )
+
+        self._ssl_context = (
+            ssl.create_default_context(cafile=cafile)
+            if self.scheme == "https"
+            else None
+        )
+
+        self._default_headers = {
+            "Host": url_parts.netloc,
+            "Content-Type": "application/x-thrift",
+            "x-feature-version": "3",
+            "accept": "application/x-thrift",
+            "accept-encoding": get_accept_encoding(http_compression),
+            "cache-control": "no-cache",
+        }
+
+        if user_agent:
+            self._default_headers["User-Agent"] = user_agent
+
+        if headers:
+            self._default_headers.update(headers)
+
+        self._idle_connections: list[StreamPair] = []
+
+    async def request(self, body: bytes) -> IO[bytes]:
+        await traffic_shaper.wait_for_request_async()
+
+        if self._idle_connections:
+            connection = self._idle_connections.pop()
+
+            try:
+                return await self._request(connection, body)
+            except ConnectionError:
+                # Server may drop idle keep-alive connections at any time
+                logger.debug("Keep-alive connection closed, reconnecting")
+
+        return await self._request(await self._connect(), body)
+
+    async def close(self) -> None:
+        idle_connections, self._idle_connections = self._idle_connections, []
+
+        for _, writer in idle_connections:
+            writer.close()
+
+    async def _connect(self) -> StreamPair:
+        if self._proxy is None:
+            return await asyncio.open_connection(
+                self.host,
+                self.port,
+                ssl=self._ssl_context,
+            )
+
+        return await asyncio.open_connection(
+            sock=await self._open_tunnel(*self._proxy),
+            ssl=self._ssl_context,
+            server_hostname=self.host if self._ssl_context else None,
+        )
+
+    async def _open_tunnel(
+        self, proxy_host: str, proxy_port: int, proxy_auth: str | None
+    ) -> socket.socket:
+        loop = asyncio.get_running_loop()
+
+        family, sock_type, proto, _, address = (
+            await loop.getaddrinfo(proxy_host, proxy_port, type=socket.SOCK_STREAM)
+        )[0]
+
+        sock = socket.socket(family, sock_type, proto)
+        sock.setblocking(False)
+
+        try:
+            await loop.sock_connect(sock, address)
+
+            request_head = f"CONNECT {self.host}:{self.port} HTTP/1.1\r\n"
+            request_head += f"Host: {self.host}:{self.port}\r\n"
+            if proxy_auth:
+                request_head += f"Proxy-Authorization: {proxy_auth}\r\n"
+            request_head += "\r\n"
+
+            await loop.sock_sendall(sock, request_head.encode("latin-1"))
+
+            # Nothing is sent through the tunnel before the client speaks
+            response_head = b""
+            while b"\r\n\r\n" not in response_head:
+                if len(response_head) > RESPONSE_READ_SIZE:
+                    raise HTTPException("Proxy response headers are too long")
+
+                chunk = await loop.sock_recv(sock, RESPONSE_READ_SIZE)
+                if not chunk:
+                    raise ConnectionError("Connection closed by proxy")
+                response_head += chunk
+
+            status_line = response_head.split(b"\r\n", 1)[0].decode("latin-1")
+            _, _, status_txt = status_line.partition(" ")
+            status, _, reason = status_txt.partition(" ")
+            if status != "200":
+                raise OSError(f"Tunnel connection failed: {status} {reason}".strip())
+        except BaseException:
+            sock.close()
+            raise
+
+        return sock
+
+    async def _request(self, connection: StreamPair, body: bytes) -> IO[bytes]:
+        reader, writer = connection
+
+        try:
+            response_body, keep_alive = await self._exchange(reader, writer, body)
+        except asyncio.IncompleteReadError:
+            writer.close()
+            raise ConnectionError("Connection closed by server")
+        except BaseException:
+            writer.close()
+            raise
+
+        if keep_alive:
+            self._idle_connections.append(connection)
+        else:
+            writer.close()
+
+        return response_body
+
+    async def _exchange(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        body: bytes,
+    ) -> tuple[IO[bytes], bool]:
+        request_headers = {**self._default_headers, "Content-Length": str(len(body))}
+
+        request_head = f"POST {self.path} HTTP/1.1\r\n"
+        request_head += "".join(f"{k}: {v}\r\n" for k, v in request_headers.items())
+        request_head += "\r\n"
+
+        writer.write(request_head.encode("latin-1") + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by server")
+
+        # Reason phrase may be missing, some proxies send just "HTTP/1.1 200"
+        http_version, _, status_txt = status_line.decode("latin-1").partition(" ")
+        status, _, reason = status_txt.rstrip("\r\n").partition(" ")
+        if not status:
+            raise HTTPException(f"Bad HTTP status line: {status_line!r}")
+
+        response_headers = await _read_headers(reader)
+
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            body_chunks = _iter_chunked_body(reader)
+        elif "content-length" in response_headers:
+            body_chunks = _iter_sized_body(
+                reader, int(response_headers["content-length"])
+            )
+        else:
+            body_chunks = _iter_body_till_eof(reader)
+            response_headers["connection"] = "close"
+
+        # Decoded response goes to a spool as it arrives, so large notes
+        # are not held in memory twice while being decoded
+        response_body = tempfile.SpooledTemporaryFile(max_size=RESPONSE_SPOOL_SIZE)
+
+        try:
+            await self._receive_body(
+                body_chunks,
+                response_body,
+                response_headers.get("content-encoding"),
+            )
+        except BaseException:
+            response_body.close()
+            raise
+
+        keep_alive = (
+            http_version == "HTTP/1.1"
+            and response_headers.get("connection", "").lower() != "close"
+        )
+
+        if status != "200":
+            response_body.close()
+            raise HTTPException(f"HTTP request failed: {status} {reason.strip()}")
+
+        response_body.seek(0)
+
+        return response_body, keep_alive
+
+    async def _receive_body(
+        self,
+        body_chunks: AsyncIterator[bytes],
+        response_body: IO[bytes],
+        content_encoding: str | None,
+    ) -> None:
+        decompressor = get_response_decompressor(content_encoding)
+
+        async for chunk in body_chunks:
+            await traffic_shaper.wait_for_received_async(len(chunk))
+
+            decoded = chunk
+            if decompressor is not None:
+                decoded = decompressor.decompress(chunk)
+
+            response_body.write(decoded)
+            transfer_stats.add(len(chunk), len(decoded))
+
+        if decompressor is not None:
+            decoded = decompressor.flush()
+            response_body.write(decoded)
+            transfer_stats.add(0, len(decoded))
+
+
+def _get_proxy_auth(proxy_parts: SplitResult) -> str | None:
+    if not proxy_parts.username:
+        return None
+
+    credentials = (
+        f"{unquote(proxy_parts.username)}:{unquote(proxy_parts.password or '')}"
+    )
+    return "Basic " + base64.b64encode(credentials.encode()).decode("ascii")
+
+
+async def _read_headers(reader: asyncio.StreamReader) -> dict[str, str]:
+    headers = {}
+
+    for _ in range(HTTP_MAX_HEADERS):
+        line = await reader.readline()
+        if line in {b"\r\n", b"\n"}:
+            return headers
+        if not line:
+            raise asyncio.IncompleteReadError(line, None)
+
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    raise HTTPException(f"Got more than {HTTP_MAX_HEADERS} headers")
+
+
+async def _iter_sized_body(
+    reader: asyncio.StreamReader, size: int
+) -> AsyncIterator[bytes]:
+    while size > 0:
+        chunk = await reader.readexactly(min(size, RESPONSE_READ_SIZE))
+        size -= len(chunk)
+        yield chunk
+
+
+async def _iter_body_till_eof(reader: asyncio.StreamReader) -> AsyncIterator[bytes]:
+    while chunk := await reader.read(RESPONSE_READ_SIZE):
+        yield chunk
+
+
+async def _iter_chunked_body(reader: asyncio.StreamReader) -> AsyncIterator[bytes]:
+    while True:
+        size_line = await reader.readline()
+        chunk_size = int(size_line.split(b";", 1)[0], 16)
+
+        if chunk_size == 0:
+            await _read_headers(reader)  # trailers
+            return
+
+        async for chunk in _iter_sized_body(reader, chunk_size):
+            yield chunk
+
+        await reader.readexactly(2)  # CRLF
+
+
+class TSpooledResponseTransport(TStreamedResponseTransport, TTransportBase):
+    """
+    Response spooled by AsyncThriftHttpClient, decoded window by window
+
+    Traffic is accounted for while the response is received.
+    """
+
+    def __init__(self, response_body: IO[bytes]) -> None:
+        self._http_response = response_body
+        self._read_buf = BytesIO(self._read_chunk(RESPONSE_READ_SIZE))
+
+    def _read_chunk(self, size: int) -> bytes:
+        if self._http_response is None:
+            return b""
+
+        return cast(bytes, self._http_response.read(size))
+
+
+class AsyncNoteStoreClient:
+    """
+    NoteStore calls needed for note downloads, over AsyncThriftHttpClient
+
+    Messages are framed by the generated Thrift client,
+    only the HTTP exchange itself is asynchronous.
+    """
+
+    def __init__(
+        self,
+        auth_token: str,
+        store_url: str,
+        user_agent: str | None = None,
+        headers: dict[str, str] | None = None,
+        cafile: str | None = None,
+        http_compression: bool = True,
+        retry_max: int = DEFAULT_RETRY_MAX,
+        retry_delay: float = DEFAULT_RETRY_DELAY,
+        retry_backoff_factor: float = DEFAULT_RETRY_BACKOFF_FACTOR,
+        retry_exceptions: tuple[type[Exception], ...] = DEFAULT_RETRY_EXCEPTIONS,
+    ):
+        self.authenticationToken = auth_token
+
+        self._retry_max = retry_max
+        self._retry_delay = retry_delay
+        self._retry_backoff_factor = retry_backoff_factor
+        self._retry_exceptions = retry_exceptions
+
+        self._base_client = AsyncThriftHttpClient(
+            url=store_url,
+            user_agent=user_agent,
+            headers=headers,
+            cafile=cafile,
+            http_compression=http_compression,
+        )
+
+    async def getNote(
+        self,
+        guid: str,
+        withContent: bool,
+        withResourcesData: bool,
+        withResourcesRecognition: bool,
+        withResourcesAlternateData: bool,
+    ) -> Note:
+        return await self._call(
+            "getNote",
+            guid,
+            withContent,
+            withResourcesData,
+            withResourcesRecognition,
+            withResourcesAlternateData,
+        )
+
+    async def getResourceData(self, guid: str) -> bytes:
+        return await self._call("getResourceData", guid)
+
+    async def close(self) -> None:
+        await self._base_client.close()
+
+    async def _call(self, method: str, *args: Any) -> Any:
+        request_buf = TMemoryBuffer()
+        request_client = NoteStore.Client(TBinaryProtocolAcceleratedHotfix(request_buf))
+        getattr(request_client, f"send_{method}")(self.authenticationToken, *args)
+
+        response_transport = TSpooledResponseTransport(
+            await self._request(request_buf.getvalue())
+        )
+
+        try:
+            response_client = NoteStore.Client(
+                TBinaryProtocolAcceleratedHotfix(response_transport)
+            )
+            return getattr(response_client, f"recv_{method}")()
+        finally:
+            response_transport.close_response()
+
+    async def _request(self, body: bytes) -> IO[bytes]:
+        delay = self._retry_delay
+        attempt = 0
+
+        while True:
+            try:
+                return await self._base_client.request(body)
+            except self._retry_exceptions:
+                if attempt >= self._retry_max:
+                    raise
+
+                attempt += 1
+                delay = get_backoff_delay(
+                    delay,
+                    self._retry_delay,
+                    DEFAULT_RETRY_MAX_DELAY,
+                    self._retry_backoff_factor,
+                )
+                await asyncio.sleep(delay)
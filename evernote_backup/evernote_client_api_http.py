@@ -1,24 +1,97 @@
 import functools
 import http.client as http_client
+import importlib.util
+import logging
+import os
+import select
+import socket
+import ssl
+import threading
 import time
+import types
+import typing
+import urllib.parse
+import zlib
+from collections import deque
 from collections.abc import Callable
+from enum import Enum
 from http.client import HTTPException
-from typing import Any, cast
+from io import BytesIO
+from typing import TYPE_CHECKING, Any, cast
 
 from thrift.protocol.TBinaryProtocol import TBinaryProtocol
+from thrift.Thrift import TType
 from thrift.transport.THttpClient import THttpClient
+from thrift.transport.TTransport import CReadableTransport, TTransportBase
 
 from evernote_backup.evernote_client_api_tokenized import (
     TokenizedNoteStoreClient,
     TokenizedUserStoreClient,
 )
+from evernote_backup.evernote_client_api_traffic import traffic_shaper
+from evernote_backup.evernote_client_retry import get_backoff_delay
 from evernote_backup.evernote_client_util import require
 
+try:
+    from thrift.protocol import fastbinary
+except ImportError:  # pragma: no cover
+    fastbinary = None
+
+if TYPE_CHECKING:
+    import h2.events
+
+logger = logging.getLogger(__name__)
+
 DEFAULT_RETRY_MAX = 3
 DEFAULT_RETRY_DELAY = 0.5
 DEFAULT_RETRY_BACKOFF_FACTOR = 2.0
+DEFAULT_RETRY_MAX_DELAY = 30.0
 DEFAULT_RETRY_EXCEPTIONS = (HTTPException, ConnectionError)
 
+RESPONSE_READ_SIZE = 64 * 1024
+
+HTTP2_STREAM_WINDOW_SIZE = 1024 * 1024
+HTTP2_CONNECTION_WINDOW_SIZE = 16 * 1024 * 1024
+
+
+class TransferStats:
+    """
+    Byte counts of API responses in this process
+
+    `received` is what came over the network, `decoded` is the size after
+    HTTP decompression.
+    """
+
+    def __init__(self) -> None:
+        self.received = 0
+        self.decoded = 0
+        self._lock = threading.Lock()
+
+    def add(self, received: int, decoded: int) -> None:
+        with self._lock:
+            self.received += received
+            self.decoded += decoded
+
+
+transfer_stats = TransferStats()
+
+
+def get_accept_encoding(http_compression: bool) -> str:
+    return "gzip, deflate" if http_compression else "identity"
+
+
+def get_response_decompressor(content_encoding: str | None) -> Any:
+    encoding = (content_encoding or "identity").strip().lower()
+
+    if encoding == "identity":
+        return None
+
+    if encoding in {"gzip", "x-gzip", "deflate"}:
+        # Detect gzip or zlib header automatically
+        return zlib.decompressobj(32 + zlib.MAX_WBITS)
+
+    raise HTTPException(f"Unsupported response encoding: {content_encoding}")
+
 
 class TBinaryProtocolHotfix(TBinaryProtocol):
     """
@@ -29,24 +102,317 @@ class TBinaryProtocolHotfix(TBinaryProtocol):
         return cast(str, self.readBinary().decode("utf-8", errors="replace"))
 
 
-class THttpClientHotfix(THttpClient):
+class TBinaryProtocolAcceleratedHotfix(TBinaryProtocolHotfix):
+    """
+    C-accelerated decoding with per-message fallback to TBinaryProtocolHotfix
+
+    Generated structs drop enum fields set to plain ints, which is what
+    fastbinary produces, so structs with enum fields are built through
+    a factory that converts them first.
+    """
+
+    def __init__(self, trans: TTransportBase) -> None:
+        super().__init__(trans)
+
+        if fastbinary is not None:
+            self._fast_decode = self._decode_message
+            self._fast_encode = fastbinary.encode_binary
+
+    def readMessageEnd(self) -> None:
+        if isinstance(self.trans, TStreamedResponseTransport):
+            self.trans.close_response()
+
+    def _decode_message(self, obj: Any, iprot: TBinaryProtocol, spec: list) -> Any:
+        struct_type = spec[0]
+        message_buf = self.trans.cstringio_buf
+        message_start = message_buf.tell()
+
+        # Fields of the top level struct are set directly, skipping factories
+        if obj is None or not _get_enum_converters(struct_type):
+            fast_spec = [_get_struct_factory(struct_type), _get_fast_spec(struct_type)]
+
+            try:
+                return fastbinary.decode_binary(obj, iprot, fast_spec)
+            except Exception:
+                # Streamed responses can't be rewound past the current window
+                if self.trans.cstringio_buf is not message_buf:
+                    raise
+
+                logger.debug("Accelerated decoding failed, retrying", exc_info=True)
+
+            message_buf.seek(message_start)
+
+        fallback_protocol = TBinaryProtocolHotfix(self.trans)
+
+        if obj is None:
+            return struct_type.read(fallback_protocol)
+
+        obj.read(fallback_protocol)
+        return None
+
+
+_fast_specs: dict[type, tuple] = {}
+
+
+def _get_fast_spec(struct_type: type) -> tuple:
+    try:
+        return _fast_specs[struct_type]
+    except KeyError:
+        pass
+
+    # Recursive structs fall back to the original spec
+    _fast_specs[struct_type] = struct_type.thrift_spec
+
+    fast_spec = tuple(
+        field
+        if field is None
+        else (*field[:3], _get_fast_typeargs(field[1], field[3]), *field[4:])
+        for field in struct_type.thrift_spec
+    )
+
+    if fast_spec != struct_type.thrift_spec:
+        _fast_specs[struct_type] = fast_spec
+
+    return _fast_specs[struct_type]
+
+
+def _get_fast_typeargs(ttype: int, typeargs: Any) -> Any:
+    if ttype == TType.STRUCT:
+        return [_get_struct_factory(typeargs[0]), _get_fast_spec(typeargs[0])]
+
+    if ttype in {TType.LIST, TType.SET}:
+        return (
+            typeargs[0],
+            _get_fast_typeargs(typeargs[0], typeargs[1]),
+            *typeargs[2:],
+        )
+
+    if ttype == TType.MAP:
+        return (
+            typeargs[0],
+            _get_fast_typeargs(typeargs[0], typeargs[1]),
+            typeargs[2],
+            _get_fast_typeargs(typeargs[2], typeargs[3]),
+            *typeargs[4:],
+        )
+
+    return typeargs
+
+
+def _get_struct_factory(struct_type: type) -> Callable[..., Any]:
+    converters = _get_enum_converters(struct_type)
+    if not converters:
+        return struct_type
+
+    return functools.partial(_build_struct, struct_type, converters)
+
+
+def _build_struct(
+    struct_type: type,
+    converters: tuple[tuple[str, Callable[[Any], Any]], ...],
+    **fields: Any,
+) -> Any:
+    for field_name, convert in converters:
+        if fields.get(field_name) is not None:
+            fields[field_name] = convert(fields[field_name])
+
+    return struct_type(**fields)
+
+
+@functools.cache
+def _get_enum_converters(
+    struct_type: type,
+) -> tuple[tuple[str, Callable[[Any], Any]], ...]:
+    field_types = typing.get_type_hints(struct_type.__init__)
+
+    converters = []
+    for field in struct_type.thrift_spec:
+        if field is None:
+            continue
+
+        convert = _get_enum_converter(field_types.get(field[2]))
+        if convert is not None:
+            converters.append((field[2], convert))
+
+    return tuple(converters)
+
+
+def _get_enum_converter(value_type: Any) -> Callable[[Any], Any] | None:
+    origin = typing.get_origin(value_type)
+    args = typing.get_args(value_type)
+
+    if origin in {typing.Union, types.UnionType}:
+        non_none_args = [a for a in args if a is not type(None)]
+        return _get_enum_converter(non_none_args[0]) if non_none_args else None
+
+    if origin in {list, set}:
+        convert_item = _get_enum_converter(args[0])
+        if convert_item is None:
+            return None
+        return lambda v: origin(convert_item(i) for i in v)
+
+    if isinstance(value_type, type) and issubclass(value_type, Enum):
+        return functools.partial(_to_enum, value_type)
+
+    return None
+
+
+def _to_enum(enum_type: type[Enum], value: Any) -> Any:
+    if isinstance(value, enum_type):
+        return value
+
+    try:
+        return enum_type(value)
+    except ValueError:
+        return value
+
+
+class HTTPConnectionHotfix(http_client.HTTPConnection):
+    """
+    Accept-Encoding is sent with custom headers, don't add a default one
+    """
+
+    def putrequest(
+        self,
+        method: str,
+        url: str,
+        skip_host: bool = False,
+        skip_accept_encoding: bool = True,
+    ) -> None:
+        super().putrequest(method, url, skip_host, skip_accept_encoding)
+
+
+class HTTPSConnectionHotfix(http_client.HTTPSConnection):
+    """
+    Accept-Encoding is sent with custom headers, don't add a default one
+    """
+
+    def putrequest(
+        self,
+        method: str,
+        url: str,
+        skip_host: bool = False,
+        skip_accept_encoding: bool = True,
+    ) -> None:
+        super().putrequest(method, url, skip_host, skip_accept_encoding)
+
+
+class TStreamedResponseTransport(CReadableTransport):
+    """
+    Response is decoded while it is read from the socket, only the current
+    window of it is kept in memory.
+    """
+
+    _http_response: Any = None
+    _decompressor: Any = None
+    _read_buf = BytesIO()
+
+    def read(self, sz: int) -> bytes:
+        chunk = self._read_buf.read(sz)
+        if chunk:
+            return chunk
+
+        self._read_buf = BytesIO(self._read_chunk(RESPONSE_READ_SIZE))
+        return self._read_buf.read(sz)
+
+    def close_response(self) -> None:
+        if self._http_response is not None:
+            self._http_response.close()
+
+        # Last window may hold a copy of a large binary field
+        self._http_response = None
+        self._decompressor = None
+        self._read_buf = BytesIO()
+
+    @property
+    def cstringio_buf(self) -> BytesIO:
+        return self._read_buf
+
+    def cstringio_refill(self, partialread: bytes, reqlen: int) -> BytesIO:
+        chunks = [partialread]
+        size = len(partialread)
+
+        while size < reqlen:
+            # Read ahead for small fields, but not past the end of large ones
+            chunk = self._read_chunk(max(reqlen - size, RESPONSE_READ_SIZE))
+            if not chunk:
+                raise EOFError("Unexpected end of Thrift response")
+
+            chunks.append(chunk)
+            size += len(chunk)
+
+        self._read_buf = BytesIO(b"".join(chunks))
+        return self._read_buf
+
+    def _start_response(self, http_response: Any) -> None:
+        self._http_response = http_response
+        self._decompressor = get_response_decompressor(
+            http_response.getheader("Content-Encoding")
+        )
+
+        # Small responses fit into the first window whole,
+        # so accelerated decoding can be retried on them
+        self._read_buf = BytesIO(self._read_chunk(RESPONSE_READ_SIZE))
+
+    def _read_chunk(self, size: int) -> bytes:
+        if self._http_response is None:
+            return b""
+
+        if self._decompressor is None:
+            chunk = self._http_response.read(size)
+            transfer_stats.add(len(chunk), len(chunk))
+            traffic_shaper.wait_for_received(len(chunk))
+            return cast(bytes, chunk)
+
+        while not self._decompressor.eof:
+            data = self._decompressor.unconsumed_tail
+            if not data:
+                data = self._http_response.read(RESPONSE_READ_SIZE)
+                transfer_stats.add(len(data), 0)
+                traffic_shaper.wait_for_received(len(data))
+
+            if not data:
+                chunk = self._decompressor.flush()
+                transfer_stats.add(0, len(chunk))
+                return cast(bytes, chunk)
+
+            chunk = self._decompressor.decompress(data, size)
+            if chunk:
+                transfer_stats.add(0, len(chunk))
+                return cast(bytes, chunk)
+
+        return b""
+
+
+class THttpClientHotfix(THttpClient, TStreamedResponseTransport):
     """
     Hotfix for deprecated `key_file` and `cert_file` args
     https://issues.apache.org/jira/browse/THRIFT-5847
     https://github.com/apache/thrift/pull/3108
     """
 
+    def read(self, sz: int) -> bytes:
+        return TStreamedResponseTransport.read(self, sz)
+
+    def flush(self) -> None:
+        traffic_shaper.wait_for_request()
+
+        super().flush()
+
+        # Name-mangled attrs from thrift THttpClient; not visible to type checkers.
+        self._start_response(getattr(self, "_THttpClient__http_response"))  # noqa: B009
+
     def open(self) -> None:  # pragma: no cover
         # Name-mangled attrs from thrift THttpClient; not visible to type checkers.
         timeout = getattr(self, "_THttpClient__timeout")  # noqa: B009
         if self.scheme == "http":
-            http = http_client.HTTPConnection(
+            http = HTTPConnectionHotfix(
                 self.host,
                 self.port,
                 timeout=timeout,
             )
         elif self.scheme == "https":
-            http = http_client.HTTPSConnection(
+            http = HTTPSConnectionHotfix(
                 self.host,
                 self.port,
                 timeout=timeout,
@@ -63,6 +429,411 @@ class THttpClientHotfix(THttpClient):
             )
 
 
+class Http2Response:
+    """
+    Response on an HTTP/2 stream, body is read as it arrives
+
+    Received data is acknowledged only once it is read, so the stream
+    window limits how much of the body is buffered.
+    """
+
+    def __init__(self, connection: "Http2Connection", stream_id: int) -> None:
+        self.status: int | None = None
+        self.headers: dict[str, str] = {}
+
+        self._connection = connection
+        self._stream_id = stream_id
+        self._chunks: deque[bytes] = deque()
+        self._ended = False
+        self._error: Exception | None = None
+
+    def getheader(self, name: str) -> str | None:
+        return self.headers.get(name.lower())
+
+    def read(self, size: int) -> bytes:
+        with self._connection.cond:
+            while not self._chunks and not self._ended and self._error is None:
+                self._connection.cond.wait()
+
+            if not self._chunks:
+                if self._error is not None:
+                    raise self._error
+                return b""
+
+            chunk = self._chunks.popleft()
+            if len(chunk) > size:
+                self._chunks.appendleft(chunk[size:])
+                chunk = chunk[:size]
+
+            self._connection.acknowledge(self._stream_id, len(chunk))
+
+        return chunk
+
+    def close(self) -> None:
+        with self._connection.cond:
+            if not self._ended and self._error is None:
+                self._connection.cancel(self._stream_id)
+
+            # Unread data still counts against the connection window
+            unread_size = sum(len(c) for c in self._chunks)
+            if unread_size:
+                self._connection.acknowledge(self._stream_id, unread_size)
+
+            self._chunks.clear()
+
+    def wait_headers(self) -> None:
+        with self._connection.cond:
+            while self.status is None and self._error is None:
+                self._connection.cond.wait()
+
+            if self.status is None:
+                raise require(self._error)
+
+
+class Http2Connection:
+    """
+    HTTP/2 connection shared by all Thrift clients of one host
+
+    Requests from many threads are multiplexed as separate streams.
+    All socket I/O happens in a background thread, other threads only
+    update connection state and wake it up.
+    """
+
+    def __init__(self, scheme: str, host: str, port: int, cafile: str | None):
+        # Optional dependency, only needed for --http2
+        import h2.config
+        import h2.connection
+        import h2.settings
+
+        self.cond = threading.Condition()
+        self.authority = host if port in {80, 443} else f"{host}:{port}"
+        self.scheme = scheme
+
+        self._streams: dict[int, Http2Response] = {}
+        self._error: Exception | None = None
+        self._closing = False
+
+        self._sock = self._connect(scheme, host, port, cafile)
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_w.setblocking(False)
+
+        self._conn = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=True, header_encoding="latin-1")
+        )
+        self._conn.initiate_connection()
+        self._conn.update_settings(
+            {h2.settings.SettingCodes.INITIAL_WINDOW_SIZE: HTTP2_STREAM_WINDOW_SIZE}
+        )
+        self._conn.increment_flow_control_window(
+            HTTP2_CONNECTION_WINDOW_SIZE - self._conn.inbound_flow_control_window
+        )
+
+        self._io_thread = threading.Thread(
+            target=self._io_loop, name="http2-io", daemon=True
+        )
+        self._io_thread.start()
+        self._wakeup()
+
+    @property
+    def is_usable(self) -> bool:
+        return self._error is None
+
+    def request(self, path: str, headers: dict[str, str], body: bytes) -> Http2Response:
+        with self.cond:
+            while (
+                self._error is None
+                and self._conn.open_outbound_streams
+                >= self._conn.remote_settings.max_concurrent_streams
+            ):
+                self.cond.wait()
+
+            if self._error is not None:
+                raise self._error
+
+            stream_id = self._conn.get_next_available_stream_id()
+            response = Http2Response(self, stream_id)
+            self._streams[stream_id] = response
+
+            self._conn.send_headers(
+                stream_id,
+                [
+                    (":method", "POST"),
+                    (":scheme", self.scheme),
+                    (":authority", self.authority),
+                    (":path", path),
+                    *((k.lower(), v) for k, v in headers.items()),
+                    ("content-length", str(len(body))),
+                ],
+                end_stream=not body,
+            )
+
+            self._send_body(stream_id, body)
+
+        self._wakeup()
+
+        response.wait_headers()
+
+        return response
+
+    def acknowledge(self, stream_id: int, size: int) -> None:
+        """Open flow control window for read data, must hold cond"""
+        if self._error is None:
+            self._conn.acknowledge_received_data(size, stream_id)
+            self._wakeup()
+
+    def cancel(self, stream_id: int) -> None:
+        """Reset a stream whose response is not needed, must hold cond"""
+        self._streams.pop(stream_id, None)
+
+        import h2.errors
+
+        if self._error is None:
+            self._conn.reset_stream(stream_id, h2.errors.ErrorCodes.CANCEL)
+            self._wakeup()
+
+    def close(self) -> None:
+        with self.cond:
+            self._closing = self._error is None
+            self._fail(ConnectionError("HTTP/2 connection closed"))
+
+        self._wakeup()
+        self._io_thread.join()
+
+    def _connect(
+        self, scheme: str, host: str, port: int, cafile: str | None
+    ) -> socket.socket:
+        sock = socket.create_connection((host, port))
+
+        if scheme != "https":
+            # Plain HTTP/2 with prior knowledge, used for testing
+            return sock
+
+        ssl_context = ssl.create_default_context(cafile=cafile)
+        ssl_context.set_alpn_protocols(["h2"])
+
+        ssl_sock = ssl_context.wrap_socket(sock, server_hostname=host)
+        if ssl_sock.selected_alpn_protocol() != "h2":
+            ssl_sock.close()
+            raise ConnectionError(f"Server {host} does not support HTTP/2")
+
+        return ssl_sock
+
+    def _send_body(self, stream_id: int, body: bytes) -> None:
+        view = memoryview(body)
+
+        while view:
+            window = min(
+                self._conn.local_flow_control_window(stream_id),
+                self._conn.max_outbound_frame_size,
+            )
+
+            if window <= 0:
+                self._wakeup()
+                self.cond.wait()
+                if self._error is not None:
+                    raise self._error
+                continue
+
+            self._conn.send_data(
+                stream_id, view[:window].tobytes(), end_stream=len(view) <= window
+            )
+            view = view[window:]
+
+    def _wakeup(self) -> None:
+        try:
+            self._wakeup_w.send(b"\0")
+        except OSError:
+            # Already closed, or enough wakeups are pending
+            pass
+
+    def _io_loop(self) -> None:
+        try:
+            while self._error is None:
+                self._io_step()
+
+            if self._closing:
+                self._conn.close_connection()
+                self._sock.sendall(self._conn.data_to_send())
+        except Exception as e:
+            with self.cond:
+                self._fail(e)
+        finally:
+            self._sock.close()
+            self._wakeup_r.close()
+            self._wakeup_w.close()
+
+    def _io_step(self) -> None:
+        data = None
+
+        # TLS may have decrypted data buffered that select() won't report
+        if isinstance(self._sock, ssl.SSLSocket) and self._sock.pending():
+            data = self._sock.recv(RESPONSE_READ_SIZE)
+        else:
+            readable, _, _ = select.select([self._sock, self._wakeup_r], [], [])
+
+            if self._wakeup_r in readable:
+                self._wakeup_r.recv(RESPONSE_READ_SIZE)
+
+            if self._sock in readable:
+                data = self._sock.recv(RESPONSE_READ_SIZE)
+                if not data:
+                    raise ConnectionError("HTTP/2 connection closed by server")
+
+        with self.cond:
+            if data:
+                for event in self._conn.receive_data(data):
+                    self._handle_event(event)
+
+            data_to_send = self._conn.data_to_send()
+
+            self.cond.notify_all()
+
+        if data_to_send:
+            self._sock.sendall(data_to_send)
+
+    def _handle_event(self, event: "h2.events.Event") -> None:
+        import h2.events
+
+        stream_id = getattr(event, "stream_id", None)
+        response = self._streams.get(stream_id) if stream_id else None
+
+        if isinstance(event, h2.events.ResponseReceived) and response:
+            headers = dict(cast(list[tuple[str, str]], event.headers))
+            response.status = int(headers.pop(":status"))
+            response.headers = headers
+        elif isinstance(event, h2.events.DataReceived):
+            if response:
+                response._chunks.append(event.data)
+                # Padding is not passed on to the reader
+                padding = event.flow_controlled_length - len(event.data)
+                if padding:
+                    self._conn.acknowledge_received_data(padding, event.stream_id)
+            else:
+                self._conn.acknowledge_received_data(
+                    event.flow_controlled_length, event.stream_id
+                )
+        elif isinstance(event, h2.events.StreamEnded) and response:
+            response._ended = True
+            del self._streams[event.stream_id]
+        elif isinstance(event, h2.events.StreamReset) and response:
+            response._error = ConnectionError(
+                f"HTTP/2 stream reset by server: {event.error_code!r}"
+            )
+            del self._streams[event.stream_id]
+        elif isinstance(event, h2.events.ConnectionTerminated):
+            raise ConnectionError(
+                f"HTTP/2 connection terminated by server: {event.error_code!r}"
+            )
+
+    def _fail(self, error: Exception) -> None:
+        """Fail all pending streams, must hold cond"""
+        if self._error is not None:
+            return
+
+        if not isinstance(error, ConnectionError):
+            error = ConnectionError(f"HTTP/2 connection failed: {error}")
+
+        self._error = error
+
+        for response in self._streams.values():
+            response._error = error
+        self._streams.clear()
+
+        self.cond.notify_all()
+
+
+def is_http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+_http2_connections: dict[tuple, Http2Connection] = {}
+_http2_connections_lock = threading.Lock()
+
+
+def get_http2_connection(
+    scheme: str, host: str, port: int, cafile: str | None
+) -> Http2Connection:
+    # Forked download processes must not share the parent's connection
+    key = (os.getpid(), scheme, host, port, cafile)
+
+    with _http2_connections_lock:
+        connection = _http2_connections.get(key)
+
+        if connection is None or not connection.is_usable:
+            connection = Http2Connection(scheme, host, port, cafile)
+            _http2_connections[key] = connection
+
+        return connection
+
+
+def close_http2_connections() -> None:
+    with _http2_connections_lock:
+        connections = list(_http2_connections.values())
+        _http2_connections.clear()
+
+    for connection in connections:
+        connection.close()
+
+
+class THttp2Client(TStreamedResponseTransport, TTransportBase):
+    """
+    Thrift HTTP transport over a shared HTTP/2 connection
+    """
+
+    def __init__(self, uri: str, cafile: str | None = None) -> None:
+        url_parts = urllib.parse.urlsplit(uri)
+
+        self.scheme = url_parts.scheme
+        self.host = require(url_parts.hostname)
+        self.port = url_parts.port or (443 if self.scheme == "https" else 80)
+        self.path = url_parts.path or "/"
+        if url_parts.query:
+            self.path += f"?{url_parts.query}"
+        self.cafile = cafile
+
+        self._wbuf = BytesIO()
+        self._custom_headers: dict[str, str] = {}
+
+    def setCustomHeaders(self, headers: dict[str, str]) -> None:
+        self._custom_headers = headers
+
+    def isOpen(self) -> bool:
+        return True
+
+    def open(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.close_response()
+
+    def write(self, buf: bytes) -> None:
+        self._wbuf.write(buf)
+
+    def flush(self) -> None:
+        body = self._wbuf.getvalue()
+        self._wbuf = BytesIO()
+
+        self.close_response()
+
+        traffic_shaper.wait_for_request()
+
+        connection = get_http2_connection(
+            self.scheme, self.host, self.port, self.cafile
+        )
+
+        response = connection.request(
+            self.path,
+            {"Content-Type": "application/x-thrift", **self._custom_headers},
+            body,
+        )
+
+        if response.status != 200:
+            response.close()
+            raise HTTPException(f"HTTP request failed: {response.status}")
+
+        self._start_response(response)
+
+
 class BinaryHttpThriftClient:
     def __init__(
         self,
@@ -70,13 +841,17 @@ class BinaryHttpThriftClient:
         user_agent: str | None = None,
         headers: dict[str, str] | None = None,
         cafile: str | None = None,
+        http_compression: bool = True,
+        http2: bool = False,
     ):
         self.url = url
         self.cafile = cafile
+        self.http2 = http2
 
         self._default_headers = {
             "x-feature-version": "3",
             "accept": "application/x-thrift",
+            "accept-encoding": get_accept_encoding(http_compression),
             "cache-control": "no-cache",
         }
 
@@ -88,16 +863,21 @@ class BinaryHttpThriftClient:
 
         self._protocol = self._create_protocol()
 
-    def _create_protocol(self) -> TBinaryProtocolHotfix:
+    def _create_protocol(self) -> TBinaryProtocolAcceleratedHotfix:
+        thrift_http_client: THttpClientHotfix | THttp2Client
+
         try:
-            thrift_http_client = THttpClientHotfix(self.url, cafile=self.cafile)
+            if self.http2:
+                thrift_http_client = THttp2Client(self.url, cafile=self.cafile)
+            else:
+                thrift_http_client = THttpClientHotfix(self.url, cafile=self.cafile)
             thrift_http_client.setCustomHeaders(self._default_headers)
-            return TBinaryProtocolHotfix(thrift_http_client)
+            return TBinaryProtocolAcceleratedHotfix(thrift_http_client)
         except Exception as e:
             raise ConnectionError(f"Failed to create Thrift binary http client: {e}")
 
     @property
-    def protocol(self) -> TBinaryProtocolHotfix:
+    def protocol(self) -> TBinaryProtocolAcceleratedHotfix:
         return self._protocol
 
 
@@ -109,12 +889,16 @@ class UserStoreClient(TokenizedUserStoreClient):
         user_agent: str | None = None,
         headers: dict[str, str] | None = None,
         cafile: str | None = None,
+        http_compression: bool = True,
+        http2: bool = False,
     ):
         self._base_client = BinaryHttpThriftClient(
             url=store_url,
             user_agent=user_agent,
             headers=headers,
             cafile=cafile,
+            http_compression=http_compression,
+            http2=http2,
         )
         super().__init__(auth_token, self._base_client.protocol)
 
@@ -127,12 +911,16 @@ class NoteStoreClient(TokenizedNoteStoreClient):
         user_agent: str | None = None,
         headers: dict[str, str] | None = None,
         cafile: str | None = None,
+        http_compression: bool = True,
+        http2: bool = False,
     ):
         self._base_client = BinaryHttpThriftClient(
             url=store_url,
             user_agent=user_agent,
             headers=headers,
             cafile=cafile,
+            http_compression=http_compression,
+            http2=http2,
         )
         super().__init__(auth_token, self._base_client.protocol)
 
@@ -140,6 +928,8 @@ class NoteStoreClient(TokenizedNoteStoreClient):
 class RetryableMixin:
     """
     Mixin class that adds retry capability for network (or other) exceptions to each non-private method.
+
+    Delays are jittered, so workers failing together don't retry in lockstep.
     """
 
     def __init__(
@@ -178,8 +968,13 @@ class RetryableMixin:
                     except self._retry_exceptions as e:
                         last_exception = e
                         if attempt < self._retry_max:
+                            delay = get_backoff_delay(
+                                delay,
+                                self._retry_delay,
+                                DEFAULT_RETRY_MAX_DELAY,
+                                self._retry_backoff_factor,
+                            )
                             time.sleep(delay)
-                            delay *= self._retry_backoff_factor
                         else:
                             raise last_exception
 
@@ -198,6 +993,8 @@ class UserStoreClientRetryable(RetryableMixin, UserStoreClient):
         user_agent: str | None = None,
         headers: dict[str, str] | None = None,
         cafile: str | None = None,
+        http_compression: bool = True,
+        http2: bool = False,
         # RetryableMixin params
         retry_max: int = DEFAULT_RETRY_MAX,
         retry_delay: float = DEFAULT_RETRY_DELAY,
@@ -210,6 +1007,8 @@ class UserStoreClientRetryable(RetryableMixin, UserStoreClient):
             user_agent=user_agent,
             headers=headers,
             cafile=cafile,
+            http_compression=http_compression,
+            http2=http2,
             retry_max=retry_max,
             retry_delay=retry_delay,
             retry_backoff_factor=retry_backoff_factor,
@@ -227,6 +1026,8 @@ class NoteStoreClientRetryable(RetryableMixin, NoteStoreClient):
         user_agent: str | None = None,
         headers: dict[str, str] | None = None,
         cafile: str | None = None,
+        http_compression: bool = True,
+        http2: bool = False,
         # RetryableMixin params
         retry_max: int = DEFAULT_RETRY_MAX,
         retry_delay: float = DEFAULT_RETRY_DELAY,
@@ -239,6 +1040,8 @@ class NoteStoreClientRetryable(RetryableMixin, NoteStoreClient):
             user_agent=user_agent,
             headers=headers,
             cafile=cafile,
+            http_compression=http_compression,
+            http2=http2,
             retry_max=retry_max,
             retry_delay=retry_delay,
             retry_backoff_factor=retry_backoff_factor,
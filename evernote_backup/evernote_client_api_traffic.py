@@ -0,0 +1,292 @@
+import asyncio
+import datetime as dt
+import logging
+import threading
+import time
+from collections.abc import Callable, Sequence
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# Short bursts are allowed, sustained rate stays at the limit
+TOKEN_BUCKET_BURST_SECONDS = 1.0
+
+
+class TrafficRule(NamedTuple):
+    """
+    Limit active during a time of day window, or all day if no window is set
+    """
+
+    limit: float
+    start: dt.time | None = None
+    end: dt.time | None = None
+
+    def is_active(self, now: dt.time) -> bool:
+        if self.start is None or self.end is None:
+            return True
+
+        if self.start <= self.end:
+            return self.start <= now < self.end
+
+        # Window wraps around midnight, e.g. 22:00-06:00
+        return now >= self.start or now < self.end
+
+
+def parse_traffic_rule(value: str) -> TrafficRule:
+    """Parse LIMIT or LIMIT@HH:MM-HH:MM."""
+
+    limit_txt, has_window, window_txt = value.partition("@")
+
+    try:
+        limit = float(limit_txt)
+    except ValueError:
+        raise ValueError(f"'{limit_txt}' is not a number")
+
+    if limit < 0:
+        raise ValueError("limit must not be negative")
+
+    if not has_window:
+        return TrafficRule(limit)
+
+    start_txt, _, end_txt = window_txt.partition("-")
+
+    try:
+        start = dt.time.fromisoformat(start_txt)
+        end = dt.time.fromisoformat(end_txt)
+    except ValueError:
+        raise ValueError(f"'{window_txt}' is not a HH:MM-HH:MM time window")
+
+    return TrafficRule(limit, start, end)
+
+
+def get_active_limit(rules: Sequence[TrafficRule], now: dt.time) -> float:
+    """First matching windowed rule wins, all-day rule is the fallback."""
+
+    for rule in rules:
+        if rule.start is not None and rule.is_active(now):
+            return rule.limit
+
+    for rule in rules:
+        if rule.start is None:
+            return rule.limit
+
+    return 0
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket, rate is in tokens per second, 0 means no limit
+
+    Tokens are reserved before waiting, so the bucket may go into debt
+    and callers queue up behind each other instead of racing.
+    """
+
+    def __init__(self, rate: float = 0) -> None:
+        self.rate = 0.0
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.set_rate(rate)
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            self._refill()
+            is_started = not self.rate
+            self.rate = rate
+
+            # Start with a full bucket, keep debt on rate change
+            if is_started:
+                self._tokens = self._capacity
+            self._tokens = min(self._tokens, self._capacity)
+
+    def reserve(self, amount: float) -> float:
+        """Take tokens and return how many seconds to wait for them."""
+
+        with self._lock:
+            if not self.rate:
+                return 0
+
+            self._refill()
+            self._tokens -= amount
+
+            if self._tokens >= 0:
+                return 0
+
+            return -self._tokens / self.rate
+
+    @property
+    def _capacity(self) -> float:
+        return max(self.rate * TOKEN_BUCKET_BURST_SECONDS, 1)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+
+        if self.rate:
+            self._tokens = min(
+                self._capacity, self._tokens + (now - self._updated) * self.rate
+            )
+
+        self._updated = now
+
+
+class TrafficShaper:
+    """
+    Request rate and download bandwidth limits for all API calls in this process
+
+    Limits are given as requests per minute and MB/s, each as a list of rules
+    that may depend on time of day. Active limits are re-evaluated on every
+    call, so a schedule takes effect during long syncs too.
+    """
+
+    def __init__(self, clock: Callable[[], dt.datetime] | None = None) -> None:
+        self.request_rules: tuple[TrafficRule, ...] = ()
+        self.bandwidth_rules: tuple[TrafficRule, ...] = ()
+        self.share = 1.0
+        self.throttled_seconds = 0.0
+
+        self._clock = clock or _get_local_time
+        self._requests = TokenBucket()
+        self._bandwidth = TokenBucket()
+        self._limits: tuple[float, float] | None = None
+        self._child_processes = 0
+        self._listeners: list[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+
+    def configure(
+        self,
+        request_rules: Sequence[TrafficRule] = (),
+        bandwidth_rules: Sequence[TrafficRule] = (),
+        share: float = 1.0,
+    ) -> None:
+        """Set limits, share is the fraction of them this process may use."""
+
+        self.request_rules = tuple(request_rules)
+        self.bandwidth_rules = tuple(bandwidth_rules)
+        self.share = share
+        self.throttled_seconds = 0.0
+
+        # Forked processes get a copy of the parent's counter
+        self._child_processes = 0
+        self._limits = None
+        self._update_limits()
+
+    def add_child_processes(self, count: int) -> float:
+        """Split limits with child processes, returns the share for each one.
+
+        This process keeps an equal part until `remove_child_processes`.
+        """
+        with self._lock:
+            self._child_processes += count
+            self._limits = None
+
+        self._update_limits()
+
+        return self.share / (count + 1)
+
+    def remove_child_processes(self, count: int) -> None:
+        with self._lock:
+            self._child_processes -= count
+            self._limits = None
+
+        self._update_limits()
+
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        """Call listener with the new description whenever active limits change."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str], None]) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def describe(self) -> str:
+        requests_per_minute, mb_per_second = self._update_limits()
+
+        limits = []
+        if requests_per_minute:
+            limits.append(f"{requests_per_minute:g} req/min")
+        if mb_per_second:
+            limits.append(f"{mb_per_second:g} MB/s")
+
+        return f"[{', '.join(limits)}]" if limits else ""
+
+    def wait_for_request(self) -> None:
+        self._sleep(self._reserve_request())
+
+    def wait_for_received(self, size: int) -> None:
+        self._sleep(self._reserve_received(size))
+
+    async def wait_for_request_async(self) -> None:
+        await self._sleep_async(self._reserve_request())
+
+    async def wait_for_received_async(self, size: int) -> None:
+        await self._sleep_async(self._reserve_received(size))
+
+    def _reserve_request(self) -> float:
+        if not self.request_rules:
+            return 0
+
+        self._update_limits()
+        return self._requests.reserve(1)
+
+    def _reserve_received(self, size: int) -> float:
+        if not self.bandwidth_rules or not size:
+            return 0
+
+        self._update_limits()
+        return self._bandwidth.reserve(size)
+
+    def _sleep(self, delay: float) -> None:
+        if delay > 0:
+            self._add_throttled(delay)
+            time.sleep(delay)
+
+    async def _sleep_async(self, delay: float) -> None:
+        if delay > 0:
+            self._add_throttled(delay)
+            await asyncio.sleep(delay)
+
+    def _add_throttled(self, delay: float) -> None:
+        with self._lock:
+            self.throttled_seconds += delay
+
+    def _update_limits(self) -> tuple[float, float]:
+        now = self._clock().time()
+
+        limits = (
+            get_active_limit(self.request_rules, now),
+            get_active_limit(self.bandwidth_rules, now),
+        )
+
+        with self._lock:
+            if limits == self._limits:
+                return limits
+
+            is_changed = self._limits is not None
+            self._limits = limits
+
+            share = self.share / (self._child_processes + 1)
+            listeners = list(self._listeners)
+
+        requests_per_minute, mb_per_second = limits
+
+        self._requests.set_rate(requests_per_minute / 60 * share)
+        self._bandwidth.set_rate(mb_per_second * 1024 * 1024 * share)
+
+        if is_changed:
+            description = self.describe()
+            logger.info(f"Traffic limits changed: {description or 'no limit'}")
+
+            for listener in listeners:
+                listener(description)
+
+        return limits
+
+
+def _get_local_time() -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc).astimezone()
+
+
+traffic_shaper = TrafficShaper()
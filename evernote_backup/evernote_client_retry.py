@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from collections.abc import Mapping
+from enum import Enum
+from http.client import HTTPException
+
+from evernote.edam.error.ttypes import (
+    EDAMErrorCode,
+    EDAMNotFoundException,
+    EDAMSystemException,
+    EDAMUserException,
+)
+from thrift.transport.TTransport import TTransportException
+
+from evernote_backup.evernote_client_util import thrift_attrs
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_FACTOR = 3.0
+
+CIRCUIT_BREAKER_THRESHOLD = 5
+CIRCUIT_BREAKER_TIMEOUT = 5.0
+CIRCUIT_BREAKER_MAX_TIMEOUT = 60.0
+
+
+class ErrorKind(Enum):
+    TRANSIENT = "network error"
+    BAD_PAYLOAD = "bad server data"
+    PERMANENT = "server error"
+    RATE_LIMIT = "rate limit"
+
+
+def classify_error(e: BaseException) -> ErrorKind:
+    if isinstance(e, EDAMSystemException):
+        if thrift_attrs(e).errorCode == EDAMErrorCode.RATE_LIMIT_REACHED:
+            return ErrorKind.RATE_LIMIT
+        return ErrorKind.PERMANENT
+
+    if isinstance(e, (EDAMUserException, EDAMNotFoundException)):
+        return ErrorKind.PERMANENT
+
+    if isinstance(e, (OSError, HTTPException, TTransportException)):
+        return ErrorKind.TRANSIENT
+
+    # Known errors so far:
+    # EOFError     - thrift.transport.TTransport, empty body from server
+    # struct.error - some of the fields returned wrong type
+    return ErrorKind.BAD_PAYLOAD
+
+
+def get_backoff_delay(
+    previous: float, base: float, cap: float, factor: float = BACKOFF_FACTOR
+) -> float:
+    """Next delay with decorrelated jitter, so retrying clients spread out."""
+    upper = max(base, previous * factor)
+    return min(cap, random.uniform(base, upper))  # noqa: S311
+
+
+class CircuitBreaker:
+    """
+    Stop calling a shard after a run of network errors
+
+    While open, callers wait for the timeout instead of failing, then calls
+    go through again. If the first of them fails too, the breaker opens
+    with a doubled timeout, a success closes it.
+    """
+
+    def __init__(
+        self, name: str, threshold: int, timeout: float, max_timeout: float
+    ) -> None:
+        self.name = name
+        self.threshold = threshold
+        self.base_timeout = timeout
+        self.max_timeout = max_timeout
+        self.trip_count = 0
+
+        self._failures = 0
+        self._timeout = timeout
+        self._open_until = 0.0
+        self._is_cancelled = False
+        self._cond = threading.Condition()
+
+    @property
+    def is_open(self) -> bool:
+        return self._time_left() > 0
+
+    def record_success(self) -> None:
+        with self._cond:
+            self._failures = 0
+            self._timeout = self.base_timeout
+
+    def record_failure(self) -> None:
+        with self._cond:
+            self._failures += 1
+
+            if self._failures < self.threshold or self.is_open:
+                return
+
+            self.trip_count += 1
+            self._open_until = time.monotonic() + self._timeout
+
+            logger.warning(
+                f"Too many network errors on shard [{self.name}],"
+                f" pausing it for {self._timeout:.0f} seconds..."
+            )
+
+            self._timeout = min(self._timeout * 2, self.max_timeout)
+
+    def wait(self) -> None:
+        with self._cond:
+            while not self._is_cancelled and (left := self._time_left()) > 0:
+                self._cond.wait(left)
+
+    async def wait_async(self) -> None:
+        while not self._is_cancelled and (left := self._time_left()) > 0:
+            await asyncio.sleep(left)
+
+    def cancel(self) -> None:
+        with self._cond:
+            self._is_cancelled = True
+            self._cond.notify_all()
+
+    def _time_left(self) -> float:
+        return self._open_until - time.monotonic()
+
+
+class RetryPolicy:
+    """
+    Retry budgets and backoff shared by all download workers
+
+    Each error kind has its own budget of retries per call, permanent
+    errors and rate limits are not retried. Counters are kept for the
+    end-of-sync report.
+    """
+
+    def __init__(
+        self,
+        budgets: Mapping[ErrorKind, int],
+        base_delay: float,
+        max_delay: float,
+    ) -> None:
+        self.budgets = budgets
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.retry_counts: Counter[ErrorKind] = Counter()
+        self.failure_counts: Counter[ErrorKind] = Counter()
+
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def breaker_trip_count(self) -> int:
+        return sum(b.trip_count for b in self._breakers.values())
+
+    def start(self, shard: str) -> "RetryState":
+        with self._lock:
+            breaker = self._breakers.get(shard)
+            if breaker is None:
+                breaker = self._breakers[shard] = CircuitBreaker(
+                    shard,
+                    CIRCUIT_BREAKER_THRESHOLD,
+                    CIRCUIT_BREAKER_TIMEOUT,
+                    CIRCUIT_BREAKER_MAX_TIMEOUT,
+                )
+
+        return RetryState(self, breaker)
+
+    def sleep(self, delay: float) -> None:
+        self._cancelled.wait(delay)
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+        with self._lock:
+            for breaker in self._breakers.values():
+                breaker.cancel()
+
+    def _count(self, kind: ErrorKind, is_retry: bool) -> None:
+        with self._lock:
+            if is_retry:
+                self.retry_counts[kind] += 1
+            else:
+                self.failure_counts[kind] += 1
+
+
+class RetryState:
+    """Retries of a single call."""
+
+    def __init__(self, policy: RetryPolicy, breaker: CircuitBreaker) -> None:
+        self.policy = policy
+        self.breaker = breaker
+        self.attempts = 0
+
+        self._retries: Counter[ErrorKind] = Counter()
+        self._delay = policy.base_delay
+
+    def on_success(self) -> None:
+        self.breaker.record_success()
+
+    def on_error(self, e: BaseException) -> float | None:
+        """Count the failed attempt, return delay before the next one or None."""
+        kind = classify_error(e)
+        self.attempts += 1
+
+        if kind is ErrorKind.TRANSIENT:
+            self.breaker.record_failure()
+
+        if self._retries[kind] >= self.policy.budgets.get(kind, 0):
+            self.policy._count(kind, is_retry=False)
+            return None
+
+        self._retries[kind] += 1
+        self.policy._count(kind, is_retry=True)
+
+        self._delay = get_backoff_delay(
+            self._delay, self.policy.base_delay, self.policy.max_delay
+        )
+        return self._delay
@@ -1,14 +1,21 @@
+import asyncio
 import json
 import logging
-from collections.abc import Iterator, Sequence
+import threading
+import time
+from collections.abc import Callable, Collection, Iterator, Mapping, Sequence
 from typing import Any
 
+import requests
 from evernote.edam.error.ttypes import EDAMNotFoundException
 from evernote.edam.notestore import NoteStore
 from evernote.edam.notestore.ttypes import SyncChunk
-from evernote.edam.type.ttypes import LinkedNotebook, Note
+from evernote.edam.type.ttypes import LinkedNotebook, Note, Resource
 
+from evernote_backup.errors import SyncStreamInterruptedError
 from evernote_backup.evernote_client import EvernoteClient
+from evernote_backup.evernote_client_api_async import AsyncNoteStoreClient
+from evernote_backup.evernote_client_retry import get_backoff_delay
 from evernote_backup.evernote_client_util import NotebookAuth, NoteStoreAccess, require
 from evernote_backup.evernote_types import (
     EVERNOTE_DEL_OPERATIONS,
@@ -22,8 +29,146 @@ from evernote_backup.evernote_types import (
     Task,
 )
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+SYNC_STREAM_RETRY_DELAY = 1.0
+SYNC_STREAM_RETRY_MAX_DELAY = 60.0
+
+# Enum constructors are slow, sync items are matched against these instead
+_SYNC_OPERATION_TYPES = {t.value: t for t in EvernoteSyncOperationType}
+_SYNC_INSTANCE_TYPES = {t.value: t for t in EvernoteSyncInstanceType}
+_ENTITY_TYPES = {t.value: t for t in EvernoteEntityType}
+
+# Field name → sync instance key, for fields copied as is
+_TASK_FIELDS = (
+    ("noteLevelID", "noteLevelID"),
+    ("taskGroupNoteLevelID", "taskGroupNoteLevelID"),
+    ("label", "label"),
+    ("description", "description"),
+    ("dueDate", "dueDate"),
+    ("dueDateUIOption", "dueDateUIOption"),
+    ("timeZone", "timeZone"),
+    ("status", "status"),
+    ("statusUpdated", "statusUpdated"),
+    ("inNote", "inNote"),
+    ("flag", "flag"),
+    ("taskFlag", "taskFlag"),
+    ("priority", "priority"),
+    ("idClock", "idClock"),
+    ("sortWeight", "sortWeight"),
+    ("creator", "creator"),
+    ("lastEditor", "lastEditor"),
+    ("ownerId", "ownerId"),
+    ("created", "created"),
+    ("updated", "updated"),
+    ("assigneeUserId", "assigneeUserID"),
+    ("assigneeEmail", "assigneeEmail"),
+    ("assignedByUserId", "assignedByUserID"),
+    ("recurrence", "recurrence"),
+    ("repeatAfterCompletion", "repeatAfterCompletion"),
+)
+_REMINDER_FIELDS = (
+    ("noteLevelID", "noteLevelID"),
+    ("reminderDate", "reminderDate"),
+    ("reminderDateUIOption", "reminderDateUIOption"),
+    ("timeZone", "timeZone"),
+    ("dueDateOffset", "dueDateOffset"),
+    ("status", "status"),
+    ("ownerId", "ownerId"),
+    ("created", "created"),
+    ("updated", "updated"),
+)
+
+
+def get_json_backend() -> str:
+    return "orjson" if orjson is not None else "json"
+
+
+def load_json(data: str) -> Any:
+    """Decode JSON with orjson if it is installed, it is several times faster."""
+    if orjson is not None:
+        return orjson.loads(data)
+
+    return json.loads(data)
+
+
+class TagNameCache:
+    """Tag guid → name map shared by all sync clients.
+
+    Names are seeded from local storage, so tag API calls only happen for
+    tags that were not seen in sync chunks yet. Names fetched from the API
+    are kept aside until the caller persists them with `pop_fetched`.
+    """
+
+    def __init__(self) -> None:
+        self._names: dict[str, str] = {}
+        self._fetched: dict[str, str] = {}
+        self._in_flight: dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def update(self, tag_names: Mapping[str, str]) -> None:
+        with self._lock:
+            self._names.update(tag_names)
+
+    def get_names(self) -> dict[str, str]:
+        with self._lock:
+            return dict(self._names)
+
+    def resolve(
+        self,
+        tag_guids: Sequence[str],
+        fetch: Callable[[], Mapping[str, str]],
+        fetch_key: str = "",
+    ) -> list[str]:
+        """Names of the tags, calling fetch once per fetch_key if any are missing.
+
+        The fetch runs outside the lock, concurrent callers with the same
+        fetch_key wait for it instead of repeating the call.
+        """
+        while True:
+            with self._lock:
+                if all(t in self._names for t in tag_guids):
+                    return [self._names[t] for t in tag_guids]
+
+                in_flight = self._in_flight.get(fetch_key)
+                if in_flight is None:
+                    in_flight = self._in_flight[fetch_key] = threading.Event()
+                    break
+
+            in_flight.wait()
+
+        tag_names: Mapping[str, str] = {}
+        try:
+            tag_names = fetch()
+        finally:
+            with self._lock:
+                self._names.update(tag_names)
+                self._fetched.update(tag_names)
+                del self._in_flight[fetch_key]
+
+            in_flight.set()
+
+        with self._lock:
+            return [self._names[t] for t in tag_guids]
+
+    def lookup(self, tag_guids: Sequence[str]) -> list[str] | None:
+        """Names of the tags, or None if any of them is not known yet."""
+        with self._lock:
+            if any(t not in self._names for t in tag_guids):
+                return None
+
+            return [self._names[t] for t in tag_guids]
+
+    def pop_fetched(self) -> dict[str, str]:
+        with self._lock:
+            fetched, self._fetched = self._fetched, {}
+            return fetched
+
 
 class EvernoteClientSync(EvernoteClient):
     def __init__(
@@ -34,6 +179,9 @@ class EvernoteClientSync(EvernoteClient):
         max_chunk_results: int,
         cafile: str | None,
         jwt_token: str | None = None,
+        tag_cache: TagNameCache | None = None,
+        http_compression: bool = True,
+        http2: bool = False,
     ) -> None:
         super().__init__(
             backend=backend,
@@ -41,45 +189,143 @@ class EvernoteClientSync(EvernoteClient):
             network_error_retry_count=network_error_retry_count,
             cafile=cafile,
             jwt_token=jwt_token,
+            http_compression=http_compression,
+            http2=http2,
         )
 
         self._tags: dict | None = None
         self._notebook_tags: dict[str, dict[str, str]] = {}
+        self.tag_cache = tag_cache if tag_cache is not None else TagNameCache()
         self._linked_notebooks: dict | None = None
         self.max_chunk_results = max_chunk_results
 
         self.access = NoteStoreAccess.OWN
 
-    def get_note(self, note_guid: str) -> Note:
+    def get_note(
+        self,
+        note_guid: str,
+        known_resource_hashes: Collection[bytes] = (),
+        with_resources_data: bool = True,
+    ) -> Note:
         logger.debug(f"Downloading note [{note_guid}]")
 
+        # Bodies of known resources are restored from local storage later,
+        # so only request note metadata and fetch new bodies one by one.
+        is_partial = bool(known_resource_hashes) or not with_resources_data
+
         note = self.note_store.getNote(
             note_guid,
             True,
+            not is_partial,
+            True,
+            True,
+        )
+
+        if is_partial and with_resources_data:
+            self.download_resources(note, known_resource_hashes)
+
+        if self._has_tag_names(note):
+            note.tagNames = self.tag_cache.resolve(
+                require(note.tagGuids),
+                lambda: self._get_note_tags(note),
+                self._get_note_tags_key(note),
+            )
+
+        logger.debug(f"Finished downloading note [{note.guid}]")
+
+        return note
+
+    async def get_note_async(
+        self,
+        note_store: AsyncNoteStoreClient,
+        note_guid: str,
+        known_resource_hashes: Collection[bytes] = (),
+        with_resources_data: bool = True,
+    ) -> Note:
+        """Same as get_note, with note and resource calls made on note_store."""
+        logger.debug(f"Downloading note [{note_guid}]")
+
+        is_partial = bool(known_resource_hashes) or not with_resources_data
+
+        note = await note_store.getNote(
+            note_guid,
             True,
+            not is_partial,
             True,
             True,
         )
 
-        # getNote returns tagGuids but not names. Map guids → names for export/filter.
-        # SINGLE_NOTE_SHARE: no usable tag API on the foreign shard (permission denied).
-        if note.tagGuids and self.access is not NoteStoreAccess.SINGLE_NOTE_SHARE:
-            if self.access is NoteStoreAccess.LINKED_NOTEBOOK:
-                nb_tags = self.list_notebook_tags(require(note.notebookGuid))
-                note.tagNames = [nb_tags[t] for t in note.tagGuids]
-            else:
-                note.tagNames = [self.tags[t] for t in note.tagGuids]
+        if is_partial and with_resources_data:
+            for resource in self._iter_missing_resources(note, known_resource_hashes):
+                require(resource.data).body = await note_store.getResourceData(
+                    require(resource.guid)
+                )
+
+        if self._has_tag_names(note):
+            tag_guids = require(note.tagGuids)
+
+            # Tag API calls are rare and blocking, keep them off the event loop
+            note.tagNames = self.tag_cache.lookup(tag_guids)
+            if note.tagNames is None:
+                note.tagNames = await asyncio.to_thread(
+                    self.tag_cache.resolve,
+                    tag_guids,
+                    lambda: self._get_note_tags(note),
+                    self._get_note_tags_key(note),
+                )
 
         logger.debug(f"Finished downloading note [{note.guid}]")
 
         return note
 
+    def _has_tag_names(self, note: Note) -> bool:
+        # getNote returns tagGuids but not names. Map guids → names for export/filter.
+        # SINGLE_NOTE_SHARE: no usable tag API on the foreign shard (permission denied).
+        return (
+            bool(note.tagGuids) and self.access is not NoteStoreAccess.SINGLE_NOTE_SHARE
+        )
+
+    def _get_note_tags(self, note: Note) -> dict[str, str]:
+        if self.access is NoteStoreAccess.LINKED_NOTEBOOK:
+            return self.list_notebook_tags(require(note.notebookGuid))
+        return self.tags
+
+    def _get_note_tags_key(self, note: Note) -> str:
+        if self.access is NoteStoreAccess.LINKED_NOTEBOOK:
+            return require(note.notebookGuid)
+        return ""
+
+    def download_resources(
+        self, note: Note, known_resource_hashes: Collection[bytes] = ()
+    ) -> None:
+        """Fill in resource bodies missing from the note."""
+        for resource in self._iter_missing_resources(note, known_resource_hashes):
+            require(resource.data).body = self.note_store.getResourceData(
+                require(resource.guid)
+            )
+
+    def _iter_missing_resources(
+        self, note: Note, known_resource_hashes: Collection[bytes]
+    ) -> Iterator[Resource]:
+        for resource in note.resources or []:
+            data = resource.data
+            if data is None or data.body is not None:
+                continue
+
+            if data.bodyHash in known_resource_hashes:
+                continue
+
+            logger.debug(f"Downloading resource [{resource.guid}] of [{note.guid}]")
+
+            yield resource
+
     def iter_sync_chunks(self, after_usn: int) -> Iterator[SyncChunk]:
         sync_filter = NoteStore.SyncChunkFilter(
             includeNotes=True,
             includeNoteResources=True,
             includeNoteAttributes=True,
             includeNotebooks=True,
+            includeTags=True,
             includeExpunged=True,
             includeLinkedNotebooks=True,
         )
@@ -144,17 +390,17 @@ class EvernoteClientSync(EvernoteClient):
 
         if is_notebook_public:
             auth_token = str(self.token)
+            auth_expiration = None
         else:
-            auth_token = require(
-                ln_note_store.authenticateToSharedNotebook(
-                    notebook_guid
-                ).authenticationToken
-            )
+            auth_result = ln_note_store.authenticateToSharedNotebook(notebook_guid)
+            auth_token = require(auth_result.authenticationToken)
+            auth_expiration = auth_result.expiration
 
         return NotebookAuth(
             token=auth_token,
             shard=require(l_notebook.shardId or self.shard),
             access=NoteStoreAccess.LINKED_NOTEBOOK,
+            expiration=auth_expiration,
         )
 
     @property
@@ -184,10 +430,69 @@ class EvernoteClientSync(EvernoteClient):
     def get_remote_usn(self) -> int:
         return require(self.note_store.getSyncState().updateCount)
 
+    def get_linked_notebook_remote_usn(self, l_notebook: LinkedNotebook) -> int | None:
+        ln_note_store = self.get_note_store(l_notebook.shardId)
+
+        try:
+            sync_state = ln_note_store.getLinkedNotebookSyncState(l_notebook)
+        except EDAMNotFoundException:
+            # Unshared notebook, reported while iterating its chunks
+            return None
+
+        return require(sync_state.updateCount)
+
     def iter_sync_chunks_v2(
         self,
         last_connection: int,
         entity_filter: Sequence[EvernoteEntityType],
+    ) -> Iterator[SyncChunkV2]:
+        """
+        Stream sync chunks, reconnecting when the stream drops
+
+        After a reconnect the stream resumes right after the last chunk
+        yielded, so chunks already applied by the caller are not sent again.
+        """
+
+        logger.debug(f"Sync stream data is decoded with {get_json_backend()}")
+
+        attempt = 0
+        delay = SYNC_STREAM_RETRY_DELAY
+
+        while True:
+            try:
+                for chunk in self._iter_sync_stream_chunks(
+                    last_connection, entity_filter
+                ):
+                    last_connection = chunk.last_timestamp + 1
+                    attempt = 0
+                    delay = SYNC_STREAM_RETRY_DELAY
+
+                    yield chunk
+            except (
+                SyncStreamInterruptedError,
+                requests.ConnectionError,
+                requests.Timeout,
+            ):
+                if attempt >= self.network_error_retry_count:
+                    raise
+
+                attempt += 1
+                delay = get_backoff_delay(
+                    delay, SYNC_STREAM_RETRY_DELAY, SYNC_STREAM_RETRY_MAX_DELAY
+                )
+
+                logger.warning(
+                    f"Sync stream interrupted, reconnecting in {delay:.0f} seconds..."
+                )
+
+                time.sleep(delay)
+            else:
+                return
+
+    def _iter_sync_stream_chunks(
+        self,
+        last_connection: int,
+        entity_filter: Sequence[EvernoteEntityType],
     ) -> Iterator[SyncChunkV2]:
         for event in self.iter_sync_events(
             last_connection, entity_filter=entity_filter
@@ -197,7 +502,7 @@ class EvernoteClientSync(EvernoteClient):
                 continue
 
             try:
-                data = json.loads(event.data)
+                data = load_json(event.data)
             except ValueError:
                 logger.warning("Failed to decode sync chunk data")
                 continue
@@ -239,10 +544,14 @@ def _parse_sync_event_data(
         "expunged_notes": set(),
     }
 
+    last_timestamp = 0
+
     for item in sync_data:
+        last_timestamp = max(last_timestamp, item.get("updated", 0))
+
         try:
-            operation = EvernoteSyncOperationType(item["operation"])
-        except ValueError:
+            operation = _SYNC_OPERATION_TYPES[item["operation"]]
+        except (KeyError, TypeError):
             logger.debug("Sync data inconsistency - unknown operation type")
             logger.debug(item)
             continue
@@ -252,8 +561,8 @@ def _parse_sync_event_data(
 
         try:
             instance = item["instance"]
-            instance_type = EvernoteSyncInstanceType(instance["type"])
-        except (ValueError, KeyError, TypeError):
+            instance_type = _SYNC_INSTANCE_TYPES[instance["type"]]
+        except (KeyError, TypeError):
             logger.debug("Sync data inconsistency - unknown instance type")
             logger.debug(item)
             continue
@@ -272,8 +581,8 @@ def _parse_sync_event_data(
 
         try:
             guid = instance["ref"]["id"]
-            entity_type = EvernoteEntityType(instance["ref"]["type"])
-        except (ValueError, KeyError, TypeError):
+            entity_type = _ENTITY_TYPES[instance["ref"]["type"]]
+        except (KeyError, TypeError):
             logger.debug("Sync data inconsistency - unknown entity type")
             logger.debug(item)
             continue
@@ -290,8 +599,8 @@ def _parse_sync_event_data(
 
         try:
             parent_id = instance["parentEntity"]["id"]
-            parent_type = EvernoteEntityType(instance["parentEntity"]["type"])
-        except (ValueError, KeyError, TypeError):
+            parent_type = _ENTITY_TYPES[instance["parentEntity"]["type"]]
+        except (KeyError, TypeError):
             logger.debug("Sync data inconsistency - entity without parent")
             logger.debug(item)
             continue
@@ -311,64 +620,26 @@ def _parse_sync_event_data(
                 logger.debug(item)
                 continue
 
-            task = Task(
+            result["tasks"][guid] = Task(
                 taskId=guid,
                 parentId=parent_id,
                 parentType=parent_type,
-                noteLevelID=instance.get("noteLevelID"),
-                taskGroupNoteLevelID=instance.get("taskGroupNoteLevelID"),
-                label=instance.get("label"),
-                description=instance.get("description"),
-                dueDate=instance.get("dueDate"),
-                dueDateUIOption=instance.get("dueDateUIOption"),
-                timeZone=instance.get("timeZone"),
-                status=instance.get("status"),
-                statusUpdated=instance.get("statusUpdated"),
-                inNote=instance.get("inNote"),
-                flag=instance.get("flag"),
-                taskFlag=instance.get("taskFlag"),
-                priority=instance.get("priority"),
-                idClock=instance.get("idClock"),
-                sortWeight=instance.get("sortWeight"),
-                creator=instance.get("creator"),
-                lastEditor=instance.get("lastEditor"),
-                ownerId=instance.get("ownerId"),
-                created=instance.get("created"),
-                updated=instance.get("updated"),
-                assigneeUserId=instance.get("assigneeUserID"),
-                assigneeEmail=instance.get("assigneeEmail"),
-                assignedByUserId=instance.get("assignedByUserID"),
-                recurrence=instance.get("recurrence"),
-                repeatAfterCompletion=instance.get("repeatAfterCompletion"),
+                **{field: instance.get(key) for field, key in _TASK_FIELDS},
             )
 
-            result["tasks"][guid] = task
-
         elif entity_type == EvernoteEntityType.REMINDER:
             if parent_type != EvernoteEntityType.TASK:
                 logger.debug("Sync data inconsistency - reminder outside of task")
                 logger.debug(item)
                 continue
 
-            reminder = Reminder(
+            result["reminders"][guid] = Reminder(
                 reminderId=guid,
                 sourceId=parent_id,
                 sourceType=parent_type,
-                noteLevelID=instance.get("noteLevelID"),
-                reminderDate=instance.get("reminderDate"),
-                reminderDateUIOption=instance.get("reminderDateUIOption"),
-                timeZone=instance.get("timeZone"),
-                dueDateOffset=instance.get("dueDateOffset"),
-                status=instance.get("status"),
-                ownerId=instance.get("ownerId"),
-                created=instance.get("created"),
-                updated=instance.get("updated"),
+                **{field: instance.get(key) for field, key in _REMINDER_FIELDS},
             )
 
-            result["reminders"][guid] = reminder
-
-    last_timestamp = max([sd.get("updated", 0) for sd in sync_data])
-
     return SyncChunkV2(
         last_timestamp=last_timestamp,
         tasks=list(result["tasks"].values()),
@@ -392,7 +663,7 @@ def _parse_membership_instance(
 ) -> None:
     """Handle MEMBERSHIP instances for single-note EXPLICIT shares only."""
     try:
-        dst_type = EvernoteEntityType(instance["ref"]["dst"]["type"])
+        dst_type = _ENTITY_TYPES[instance["ref"]["dst"]["type"]]
         note_guid: str = instance["ref"]["dst"]["id"]
         ref_type: int = instance["ref"]["type"]
         owner_id: int = instance["ownerId"]
@@ -33,6 +33,7 @@ class NotebookAuth(NamedTuple):
     token: str
     shard: str
     access: NoteStoreAccess = NoteStoreAccess.OWN
+    expiration: int | None = None  # ms since epoch, None if token never expires
 
 
 def require(value: T | None) -> T:
@@ -3,8 +3,11 @@ import logging
 import logging.config
 import sys
 import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from typing import Any
+from typing import Any, TypeVar
 
 from evernote.edam.type.ttypes import Note, Notebook
 
@@ -12,6 +15,10 @@ from evernote_backup.cli_app_util import is_output_to_terminal
 
 IS_TESTING = "pytest" in sys.modules
 
+T = TypeVar("T")
+
+_log_label: ContextVar[str | None] = ContextVar("log_label", default=None)
+
 
 class LevelPrefixFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
@@ -25,11 +32,52 @@ class LevelPrefixFormatter(logging.Formatter):
         return f"{record.levelname}: {formatted_message}"
 
 
+class LogLabelFilter(logging.Filter):
+    """Prefix messages with the label of the current thread, if it has one."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        label = _log_label.get()
+        record.log_label = f"[{label}] " if label else ""
+        return True
+
+
+@contextmanager
+def log_label(label: str) -> Iterator[None]:
+    """Label log messages of this thread, e.g. with the database being synced."""
+    token = _log_label.set(label)
+    try:
+        yield
+    finally:
+        _log_label.reset(token)
+
+
+def get_log_label() -> str | None:
+    return _log_label.get()
+
+
+def set_log_label(label: str | None) -> None:
+    _log_label.set(label)
+
+
+def keep_log_label(func: Callable[..., T]) -> Callable[..., T]:
+    """Run func with the log label of the calling thread, e.g. in a new thread."""
+    label = _log_label.get()
+
+    def wrapper(*args: Any, **kwargs: Any) -> T:
+        token = _log_label.set(label)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _log_label.reset(token)
+
+    return wrapper
+
+
 def init_logging(log_level: str, log_file: Path | None = None) -> None:
     main_logger = "evernote_backup"
 
-    format_short = "%(message)s"
-    format_long = "%(asctime)s | %(levelname)s | %(message)s"
+    format_short = "%(log_label)s%(message)s"
+    format_long = "%(asctime)s | %(levelname)s | %(log_label)s%(message)s"
 
     if is_output_to_terminal():
         console_formatter = {
@@ -44,6 +92,7 @@ def init_logging(log_level: str, log_file: Path | None = None) -> None:
             "class": "logging.StreamHandler",
             "level": log_level,
             "formatter": "console",
+            "filters": ["log_label"],
         }
     }
     logger_handlers: list[str] = ["console"]
@@ -60,6 +109,7 @@ def init_logging(log_level: str, log_file: Path | None = None) -> None:
             "class": "logging.FileHandler",
             "level": log_level,
             "formatter": "file",
+            "filters": ["log_label"],
             "filename": str(log_file),
             "encoding": "utf-8",
             "delay": True,
@@ -73,6 +123,7 @@ def init_logging(log_level: str, log_file: Path | None = None) -> None:
             "console": console_formatter,
             "file": {"format": format_long},
         },
+        "filters": {"log_label": {"()": LogLabelFilter}},
         "handlers": handlers,
         "loggers": loggers,
     }
@@ -48,6 +48,8 @@ class NoteExporter:
         self.filter_notebooks = filter_notebooks
         self.filter_tags = filter_tags
 
+        self.tag_names: dict[str, str] = {}
+
     def export_notebooks(self) -> None:
         count_notes = self.storage.notes.get_notes_count()
         count_trash = self.storage.notes.get_notes_count(is_active=False)
@@ -63,6 +65,9 @@ class NoteExporter:
         if count_notes == 0 and count_trash == 0:
             raise DatabaseEmptyError
 
+        # Tag renames arrive with sync chunks, notes keep names from download time
+        self.tag_names = self.storage.tags.get_tag_names()
+
         if count_notes > 0:
             logger.info("Exporting notebooks...")
 
@@ -103,6 +108,12 @@ class NoteExporter:
 
                 self._export_notes(nb)
 
+    def _update_tag_names(self, note: Note) -> Note:
+        if note.tagGuids and all(t in self.tag_names for t in note.tagGuids):
+            note.tagNames = [self.tag_names[t] for t in note.tagGuids]
+
+        return note
+
     def _filter_tags(self, note: Note) -> bool:
         if not note.tagNames:
             return False
@@ -114,7 +125,9 @@ class NoteExporter:
         notebook_guid = require(notebook.guid)
         notebook_name = require(notebook.name)
 
-        notes_source = self.storage.notes.iter_notes(notebook_guid)
+        notes_source = map(
+            self._update_tag_names, self.storage.notes.iter_notes(notebook_guid)
+        )
 
         if self.filter_tags:
             notes_source = filter(self._filter_tags, notes_source)
@@ -126,7 +139,9 @@ class NoteExporter:
             self._output_notebook(parent_dir, notebook_name, notes_source)
 
     def _export_trash(self) -> None:
-        notes_source = self.storage.notes.iter_notes_trash()
+        notes_source = map(
+            self._update_tag_names, self.storage.notes.iter_notes_trash()
+        )
 
         if self.filter_tags:
             notes_source = filter(self._filter_tags, notes_source)
@@ -34,7 +34,7 @@ class NoteFormatter:
                 "tag": note.tagNames,
                 "note-attributes": {},
                 "content": self._fmt_raw(fmt_content(note.content)),
-                "resource": map(self._fmt_resource, note.resources or []),
+                "resource": map(self._fmt_resource, _downloaded_resources(note)),
                 "task": map(self._fmt_task, note_tasks or []),
             }
         }
@@ -164,3 +164,10 @@ class NoteFormatter:
             "dueDateOffset": reminder.dueDateOffset,
             "reminderStatus": reminder.status,
         }
+
+
+def _downloaded_resources(note: Note) -> list[Resource]:
+    """Skip attachments that are not downloaded yet (two-phase sync)."""
+    return [
+        r for r in note.resources or [] if r.data is None or r.data.body is not None
+    ]
@@ -1,24 +1,37 @@
+import json
 import logging
 import lzma
 import pickle
 import sqlite3
-from collections.abc import Iterable, Iterator
+import time
+from collections.abc import Iterable, Iterator, Mapping
 from pathlib import Path
 from typing import NamedTuple
 
-from evernote.edam.type.ttypes import LinkedNotebook, Note, Notebook
+from evernote.edam.type.ttypes import LinkedNotebook, Note, Notebook, Tag
 
 from evernote_backup.config import (
     CURRENT_DB_VERSION,
     SHARED_WITH_ME_NOTEBOOK_GUID,
     SHARED_WITH_ME_NOTEBOOK_NAME,
 )
+from evernote_backup.config_defaults import (
+    SYNC_FAILED_NOTE_COOLDOWN,
+    SYNC_FAILED_NOTE_MAX_COOLDOWN,
+)
 from evernote_backup.errors import DatabaseResyncRequiredError
-from evernote_backup.evernote_types import Reminder, Task
+from evernote_backup.evernote_client_util import NotebookAuth, NoteStoreAccess, require
+from evernote_backup.evernote_types import Reminder, SyncChunkV2, Task
 from evernote_backup.log_util import log_format_note, log_format_notebook
 
 logger = logging.getLogger(__name__)
 
+NOTES_PAGE_SIZE = 1000
+
+# Tasks and reminders are a few hundred bytes of JSON, higher presets
+# compress them no better and take several times longer to set up
+SMALL_RECORD_LZMA_PRESET = 0
+
 
 class NoteForSync(NamedTuple):
     guid: str
@@ -26,6 +39,16 @@ class NoteForSync(NamedTuple):
     notebook_guid: str | None
     linked_notebook_guid: str | None
     shard_id: str | None
+    is_shared: bool = False
+    is_linked: bool = False
+
+
+class DownloadFailure(NamedTuple):
+    guid: str
+    title: str | None
+    attempts: int
+    last_error: str
+    next_attempt: int
 
 
 DB_SCHEMA = """CREATE TABLE IF NOT EXISTS notebooks(
@@ -38,12 +61,19 @@ DB_SCHEMA = """CREATE TABLE IF NOT EXISTS notebooks(
                         notebook_guid TEXT,
                         usn INT DEFAULT 0
                     );
+                    CREATE TABLE IF NOT EXISTS notebooks_linked_auth(
+                        guid TEXT PRIMARY KEY,
+                        token TEXT,
+                        shard TEXT,
+                        expiration INT
+                    );
                     CREATE TABLE IF NOT EXISTS notes(
                         guid TEXT PRIMARY KEY,
                         title TEXT,
                         notebook_guid TEXT,
                         is_active BOOLEAN,
-                        raw_note BLOB
+                        raw_note BLOB,
+                        resources_pending BOOLEAN DEFAULT 0
                     );
                     CREATE TABLE IF NOT EXISTS tasks(
                         guid TEXT PRIMARY KEY,
@@ -60,6 +90,20 @@ DB_SCHEMA = """CREATE TABLE IF NOT EXISTS notebooks(
                         shard_id TEXT NOT NULL,
                         owner_id INT
                     );
+                    CREATE TABLE IF NOT EXISTS tags(
+                        guid TEXT PRIMARY KEY,
+                        name TEXT
+                    );
+                    CREATE TABLE IF NOT EXISTS stashed_notes(
+                        guid TEXT PRIMARY KEY,
+                        raw_note BLOB
+                    );
+                    CREATE TABLE IF NOT EXISTS download_failures(
+                        guid TEXT PRIMARY KEY,
+                        attempts INT,
+                        last_error TEXT,
+                        next_attempt INT
+                    );
                     CREATE TABLE IF NOT EXISTS config(
                         name TEXT PRIMARY KEY,
                         value TEXT
@@ -72,6 +116,8 @@ DB_SCHEMA = """CREATE TABLE IF NOT EXISTS notebooks(
                      ON notebooks_linked(guid, notebook_guid);
                     CREATE INDEX IF NOT EXISTS idx_notes_raw_null
                      ON notes(guid) WHERE raw_note IS NULL;
+                    CREATE INDEX IF NOT EXISTS idx_notes_resources_pending
+                     ON notes(guid) WHERE resources_pending=1;
                     CREATE INDEX IF NOT EXISTS idx_tasks
                      ON tasks(note_guid);
                     CREATE INDEX IF NOT EXISTS idx_reminders
@@ -79,6 +125,41 @@ DB_SCHEMA = """CREATE TABLE IF NOT EXISTS notebooks(
 """
 
 
+def get_failure_cooldown(attempts: int) -> int:
+    """Seconds to wait before retrying a note that failed `attempts` times."""
+    cooldown = SYNC_FAILED_NOTE_COOLDOWN * 2 ** (attempts - 1)
+
+    return int(min(cooldown, SYNC_FAILED_NOTE_MAX_COOLDOWN).total_seconds())
+
+
+def is_resources_pending(note: Note) -> bool:
+    return any(r.data is not None and r.data.body is None for r in note.resources or [])
+
+
+class RawNote(NamedTuple):
+    guid: str
+    title: str | None
+    notebook_guid: str | None
+    is_active: bool | None
+    resources_pending: bool
+    raw_note: bytes
+
+
+def serialize_note(note: Note) -> RawNote:
+    return RawNote(
+        guid=require(note.guid),
+        title=note.title,
+        notebook_guid=note.notebookGuid,
+        is_active=note.active,
+        resources_pending=is_resources_pending(note),
+        raw_note=lzma.compress(pickle.dumps(note)),
+    )
+
+
+def deserialize_note(raw_note: bytes) -> Note:
+    return pickle.loads(lzma.decompress(raw_note))
+
+
 def initialize_db(database_path: Path) -> None:
     if database_path.exists():
         raise FileExistsError
@@ -126,6 +207,18 @@ class SqliteStorage:
     def shared_notes(self) -> "SharedNotesStorage":
         return SharedNotesStorage(self.db)
 
+    @property
+    def resources(self) -> "ResourceStorage":
+        return ResourceStorage(self.db)
+
+    @property
+    def tags(self) -> "TagStorage":
+        return TagStorage(self.db)
+
+    @property
+    def download_failures(self) -> "DownloadFailuresStorage":
+        return DownloadFailuresStorage(self.db)
+
     def integrity_check(self) -> str:
         with self.db as con:
             cur = con.execute("PRAGMA integrity_check;")
@@ -226,6 +319,73 @@ class SqliteStorage:
                 )
             self.notebooks.ensure_shared_with_me_notebook()
 
+        if db_version < 8:
+            with self.db as con7:
+                con7.executescript(
+                    """
+                    CREATE TABLE IF NOT EXISTS resource_bodies(
+                        note_guid TEXT,
+                        body_hash BLOB,
+                        body BLOB,
+                        PRIMARY KEY (note_guid, body_hash)
+                    );
+                    """
+                )
+
+        if db_version < 9:
+            with self.db as con8:
+                cur = con8.execute("PRAGMA table_info(notes);")
+                if "resources_pending" not in {row[1] for row in cur}:
+                    con8.execute(
+                        "ALTER TABLE notes"
+                        " ADD COLUMN resources_pending BOOLEAN DEFAULT 0;"
+                    )
+                con8.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_notes_resources_pending"
+                    " ON notes(guid) WHERE resources_pending=1;"
+                )
+
+        if db_version < 10:
+            with self.db as con9:
+                con9.execute(
+                    "CREATE TABLE IF NOT EXISTS tags("
+                    " guid TEXT PRIMARY KEY,"
+                    " name TEXT"
+                    " );"
+                )
+
+        if db_version < 11:
+            with self.db as con10:
+                con10.execute(
+                    "CREATE TABLE IF NOT EXISTS notebooks_linked_auth("
+                    " guid TEXT PRIMARY KEY,"
+                    " token TEXT,"
+                    " shard TEXT,"
+                    " expiration INT"
+                    " );"
+                )
+
+        if db_version < 12:
+            with self.db as con11:
+                con11.execute(
+                    "CREATE TABLE IF NOT EXISTS download_failures("
+                    " guid TEXT PRIMARY KEY,"
+                    " attempts INT,"
+                    " last_error TEXT,"
+                    " next_attempt INT"
+                    " );"
+                )
+
+        if db_version < 13:
+            with self.db as con12:
+                con12.execute(
+                    "CREATE TABLE IF NOT EXISTS stashed_notes("
+                    " guid TEXT PRIMARY KEY,"
+                    " raw_note BLOB"
+                    " );"
+                )
+                con12.execute("DROP TABLE IF EXISTS resource_bodies;")
+
         self.config.set_config_value("DB_VERSION", str(CURRENT_DB_VERSION))
 
         if need_resync:
@@ -343,20 +503,65 @@ class NoteBookStorage(SqliteStorage):
                 (usn, l_notebook_guid),
             )
 
+    def get_linked_notebooks_auth(self, valid_after: int) -> dict[str, NotebookAuth]:
+        with self.db as con:
+            cur = con.execute(
+                "select guid, token, shard, expiration from notebooks_linked_auth"
+                " where expiration > ?",
+                (valid_after,),
+            )
+
+            return {
+                row["guid"]: NotebookAuth(
+                    token=row["token"],
+                    shard=row["shard"],
+                    access=NoteStoreAccess.LINKED_NOTEBOOK,
+                    expiration=row["expiration"],
+                )
+                for row in cur
+            }
+
+    def add_linked_notebooks_auth(self, auths: Mapping[str, NotebookAuth]) -> None:
+        with self.db as con:
+            con.executemany(
+                "replace into notebooks_linked_auth(guid, token, shard, expiration)"
+                " values (?, ?, ?, ?)",
+                (
+                    (guid, auth.token, auth.shard, auth.expiration)
+                    for guid, auth in auths.items()
+                ),
+            )
+
+    def clear_linked_notebooks_auth(self) -> None:
+        with self.db as con:
+            con.execute("delete from notebooks_linked_auth")
+
     def expunge_linked_notebooks(self, guids: Iterable[str]) -> None:
+        guids = list(guids)
+
         with self.db as con:
             con.executemany(
                 "delete from notebooks_linked where guid=?", ((g,) for g in guids)
             )
+            con.executemany(
+                "delete from notebooks_linked_auth where guid=?", ((g,) for g in guids)
+            )
 
 
 class NoteStorage(SqliteStorage):
     def add_notes_for_sync(self, notes: Iterable[Note]) -> None:
+        notes = list(notes)
+
         if logger.getEffectiveLevel() == logging.DEBUG:  # pragma: no cover
             for note in notes:
                 n_info = log_format_note(note)
                 logger.debug(f"Scheduling note for sync {n_info}")
 
+        self.resources.stash_note_resources(n.guid for n in notes)
+
+        # Note changed on the server, so it may download fine now
+        self.download_failures.reset_failures(n.guid for n in notes)
+
         with self.db as con:
             con.executemany(
                 "replace into notes(guid, title, notebook_guid) values (?, ?, ?)",
@@ -368,23 +573,51 @@ class NoteStorage(SqliteStorage):
             n_info = log_format_note(note)
             logger.debug(f"Adding/updating note {n_info}")
 
-        note_deflated = lzma.compress(pickle.dumps(note))
+        self.add_raw_note(serialize_note(note))
 
+    def add_raw_note(self, note: RawNote) -> None:
+        """Store a note already serialized with `serialize_note`."""
         with self.db as con:
             con.execute(
-                "replace into notes(guid, title, notebook_guid, is_active, raw_note)"
-                " values (?, ?, ?, ?, ?)",
+                "replace into notes(guid, title, notebook_guid, is_active, raw_note,"
+                " resources_pending)"
+                " values (?, ?, ?, ?, ?, ?)",
                 (
                     note.guid,
                     note.title,
-                    note.notebookGuid,
-                    note.active,
-                    note_deflated,
+                    note.notebook_guid,
+                    note.is_active,
+                    note.raw_note,
+                    note.resources_pending,
                 ),
             )
+            con.execute(
+                "delete from stashed_notes where guid=?",
+                (note.guid,),
+            )
+            con.execute(
+                "delete from download_failures where guid=?",
+                (note.guid,),
+            )
 
         logger.debug(f"Added note [{note.guid}]")
 
+    def get_note(self, note_guid: str) -> Note | None:
+        with self.db as con:
+            cur = con.execute(
+                "select title, guid, raw_note"
+                " from notes"
+                " where guid=? and raw_note is not NULL",
+                (note_guid,),
+            )
+
+            row = cur.fetchone()
+
+            if row is None:
+                return None
+
+            return self._get_raw_note(row["title"], row["guid"], row["raw_note"])
+
     def iter_notes(self, notebook_guid: str) -> Iterator[Note]:
         for note_guid in self._get_notes_by_notebook(notebook_guid):
             with self.db as con:
@@ -448,37 +681,167 @@ class NoteStorage(SqliteStorage):
                         self._mark_note_for_redownload(row["guid"])
                     yield None
 
-    def get_notes_for_sync(self) -> tuple[NoteForSync, ...]:
+    def iter_notes_for_sync(
+        self,
+        exclude_notes: Iterable[str] = (),
+        exclude_notebooks: Iterable[str] = (),
+        page_size: int = NOTES_PAGE_SIZE,
+    ) -> Iterator[NoteForSync]:
+        """Notes pending download in guid order, fetched page by page.
+
+        Keyset pagination keeps memory flat for any number of pending notes
+        and stays correct while notes are stored during iteration.
+        """
+        exclude = (json.dumps(list(exclude_notes)), json.dumps(list(exclude_notebooks)))
+        last_guid = ""
+
+        while True:
+            with self.db as con:
+                cur = con.execute(
+                    "select notes.guid, title, notes.notebook_guid,"
+                    " notebooks_linked.guid as l_notebook,"
+                    " shared_notes.shard_id as shard_id,"
+                    " shared_notes.guid is not NULL as is_shared,"
+                    " notebooks_linked.guid is not NULL as is_linked"
+                    " from notes"
+                    " left join notebooks_linked"
+                    " using (notebook_guid)"
+                    " left join shared_notes"
+                    " on shared_notes.guid = notes.guid"
+                    " where raw_note is NULL and notes.guid > ?"
+                    " and notes.guid not in (select value from json_each(?))"
+                    " and (notes.notebook_guid is NULL"
+                    " or notes.notebook_guid not in (select value from json_each(?)))"
+                    " and notes.guid not in"
+                    " (select guid from download_failures where next_attempt > ?)"
+                    " order by notes.guid"
+                    " limit ?",
+                    (last_guid, *exclude, _get_timestamp(), page_size),
+                )
+
+                page = [self._get_note_for_sync(row) for row in cur]
+
+            yield from page
+
+            if len(page) < page_size:
+                return
+
+            last_guid = page[-1].guid
+
+    def get_notes_for_sync_by_guid(
+        self,
+        guids: Iterable[str],
+        exclude_notes: Iterable[str] = (),
+        exclude_notebooks: Iterable[str] = (),
+    ) -> tuple[NoteForSync, ...]:
+        """Notes from the given list that are still pending download."""
         with self.db as con:
             cur = con.execute(
                 "select notes.guid, title, notes.notebook_guid,"
                 " notebooks_linked.guid as l_notebook,"
-                " shared_notes.shard_id as shard_id"
+                " shared_notes.shard_id as shard_id,"
+                " shared_notes.guid is not NULL as is_shared,"
+                " notebooks_linked.guid is not NULL as is_linked"
                 " from notes"
                 " left join notebooks_linked"
                 " using (notebook_guid)"
                 " left join shared_notes"
                 " on shared_notes.guid = notes.guid"
                 " where raw_note is NULL"
+                " and notes.guid in (select value from json_each(?))"
+                " and notes.guid not in (select value from json_each(?))"
+                " and (notes.notebook_guid is NULL"
+                " or notes.notebook_guid not in (select value from json_each(?)))"
+                " and notes.guid not in"
+                " (select guid from download_failures where next_attempt > ?)"
+                " order by notes.guid",
+                (
+                    json.dumps(list(guids)),
+                    json.dumps(list(exclude_notes)),
+                    json.dumps(list(exclude_notebooks)),
+                    _get_timestamp(),
+                ),
             )
 
-            notes = (
-                NoteForSync(
-                    guid=row["guid"],
-                    title=row["title"],
-                    notebook_guid=row["notebook_guid"],
-                    linked_notebook_guid=row["l_notebook"],
-                    shard_id=row["shard_id"],
-                )
-                for row in cur.fetchall()
+            return tuple(self._get_note_for_sync(row) for row in cur.fetchall())
+
+    def get_notes_for_sync_count(
+        self,
+        exclude_notes: Iterable[str] = (),
+        exclude_notebooks: Iterable[str] = (),
+    ) -> int:
+        with self.db as con:
+            cur = con.execute(
+                "select COUNT(guid)"
+                " from notes"
+                " where raw_note is NULL"
+                " and guid not in (select value from json_each(?))"
+                " and (notebook_guid is NULL"
+                " or notebook_guid not in (select value from json_each(?)))"
+                " and guid not in"
+                " (select guid from download_failures where next_attempt > ?)",
+                (
+                    json.dumps(list(exclude_notes)),
+                    json.dumps(list(exclude_notebooks)),
+                    _get_timestamp(),
+                ),
             )
 
-            return tuple(notes)
+            return int(cur.fetchone()[0])
+
+    def get_notes_for_backfill(
+        self,
+        exclude_notes: Iterable[str] = (),
+        exclude_notebooks: Iterable[str] = (),
+    ) -> tuple[NoteForSync, ...]:
+        """Stored notes that still miss some resource bodies."""
+        with self.db as con:
+            cur = con.execute(
+                "select notes.guid, title, notes.notebook_guid,"
+                " notebooks_linked.guid as l_notebook,"
+                " shared_notes.shard_id as shard_id,"
+                " shared_notes.guid is not NULL as is_shared,"
+                " notebooks_linked.guid is not NULL as is_linked"
+                " from notes"
+                " left join notebooks_linked"
+                " using (notebook_guid)"
+                " left join shared_notes"
+                " on shared_notes.guid = notes.guid"
+                " where resources_pending=1 and raw_note is not NULL"
+                " and notes.guid not in (select value from json_each(?))"
+                " and (notes.notebook_guid is NULL"
+                " or notes.notebook_guid not in (select value from json_each(?)))"
+                " and notes.guid not in"
+                " (select guid from download_failures where next_attempt > ?)",
+                (
+                    json.dumps(list(exclude_notes)),
+                    json.dumps(list(exclude_notebooks)),
+                    _get_timestamp(),
+                ),
+            )
+
+            return tuple(self._get_note_for_sync(row) for row in cur.fetchall())
+
+    def _get_note_for_sync(self, row: sqlite3.Row) -> NoteForSync:
+        return NoteForSync(
+            guid=row["guid"],
+            title=row["title"],
+            notebook_guid=row["notebook_guid"],
+            linked_notebook_guid=row["l_notebook"],
+            shard_id=row["shard_id"],
+            is_shared=bool(row["is_shared"]),
+            is_linked=bool(row["is_linked"]),
+        )
 
     def expunge_notes(self, guids: Iterable[str]) -> None:
+        guids = list(guids)
+
         with self.db as con:
             con.executemany("delete from notes where guid=?", ((g,) for g in guids))
 
+        self.resources.expunge_note_resources(guids)
+        self.download_failures.reset_failures(guids)
+
     def expunge_notes_by_notebook(
         self,
         notebook_guid: str,
@@ -505,7 +868,10 @@ class NoteStorage(SqliteStorage):
                     ((g,) for g in to_delete),
                 )
 
-            return to_delete
+        self.resources.expunge_note_resources(to_delete)
+        self.download_failures.reset_failures(to_delete)
+
+        return to_delete
 
     def note_exists(self, guid: str) -> bool:
         with self.db as con:
@@ -562,6 +928,10 @@ class NoteStorage(SqliteStorage):
             return to_move
 
     def mark_notes_for_redownload(self, guids: Iterable[str]) -> None:
+        guids = list(guids)
+
+        self.resources.stash_note_resources(guids)
+
         with self.db as con:
             con.executemany(
                 "update notes set raw_note=NULL, is_active=NULL where guid=?",
@@ -605,7 +975,7 @@ class NoteStorage(SqliteStorage):
         raw_note: bytes,
     ) -> Note | None:
         try:
-            return pickle.loads(lzma.decompress(raw_note))
+            return deserialize_note(raw_note)
         except Exception:
             if logger.getEffectiveLevel() == logging.DEBUG:
                 logger.exception(f"Note '{note_title}' [{note_guid}] is corrupt")
@@ -657,6 +1027,147 @@ class SharedNotesStorage(SqliteStorage):
             cur = con.execute("select guid from shared_notes")
             return {row[0] for row in cur.fetchall()}
 
+    def apply_sync_chunk(self, chunk: SyncChunkV2) -> int:
+        """Apply single-note share changes of a v2 sync chunk.
+
+        Everything is done with bulk statements over temp tables in one
+        transaction. Returns the number of expunged notes.
+        """
+        with self.db as con:
+            con.execute(
+                "create temp table if not exists sync_shared_memberships("
+                " guid TEXT PRIMARY KEY,"
+                " shard_id TEXT NOT NULL,"
+                " owner_id INT"
+                " )"
+            )
+            con.execute(
+                "create temp table if not exists sync_shared_changes("
+                " guid TEXT,"
+                " change TEXT,"
+                " PRIMARY KEY (guid, change)"
+                " )"
+            )
+            con.execute("delete from sync_shared_memberships")
+            con.execute("delete from sync_shared_changes")
+
+            con.executemany(
+                "replace into sync_shared_memberships(guid, shard_id, owner_id)"
+                " values (?, ?, ?)",
+                (
+                    (m.note_guid, m.shard_id, m.owner_id)
+                    for m in chunk.shared_note_memberships
+                ),
+            )
+            con.executemany(
+                "insert or ignore into sync_shared_changes(guid, change) values (?, ?)",
+                (
+                    *((g, "updated") for g in chunk.notes_to_sync),
+                    *((g, "expunged") for g in chunk.expunged_notes),
+                    *((g, "unshared") for g in chunk.expunged_shared_note_memberships),
+                ),
+            )
+
+            # New / updated memberships
+            con.execute(
+                "replace into shared_notes(guid, shard_id, owner_id)"
+                " select guid, shard_id, owner_id from sync_shared_memberships"
+            )
+
+            # Notes already stored (e.g. in a linked notebook) keep their place,
+            # new ones get a stub under the synthetic notebook until downloaded.
+            con.execute(
+                "insert into notes(guid, title, notebook_guid)"
+                " select guid, '(Shared note)', ?"
+                " from sync_shared_memberships"
+                " where guid not in (select guid from notes)",
+                (SHARED_WITH_ME_NOTEBOOK_GUID,),
+            )
+
+            # Note updates, redownload only notes tracked as shared
+            cur = con.execute(
+                "select guid from sync_shared_changes"
+                " where change='updated'"
+                " and guid in (select guid from shared_notes)"
+            )
+            self.resources.stash_note_resources_in_transaction(
+                con, [row[0] for row in cur]
+            )
+
+            con.execute(
+                "update notes set raw_note=NULL, is_active=NULL"
+                " where guid in ("
+                "  select guid from sync_shared_changes"
+                "  where change='updated'"
+                "  and guid in (select guid from shared_notes)"
+                " )"
+            )
+
+            # Note expunges of tracked shared notes
+            cur = con.execute(
+                "select COUNT(guid) from sync_shared_changes"
+                " where change='expunged'"
+                " and guid in (select guid from shared_notes)"
+            )
+            expunged_count = int(cur.fetchone()[0])
+
+            con.execute(
+                "delete from notes"
+                " where guid in ("
+                "  select guid from sync_shared_changes"
+                "  where change='expunged'"
+                "  and guid in (select guid from shared_notes)"
+                " )"
+            )
+
+            # Expunged and unshared notes are no longer tracked as shared
+            con.execute(
+                "delete from shared_notes"
+                " where guid in ("
+                "  select guid from sync_shared_changes"
+                "  where change in ('expunged', 'unshared')"
+                " )"
+            )
+
+            # Unshared notes are kept if still available via a linked notebook
+            cur = con.execute(
+                "select notes.guid from notes"
+                " join notebooks_linked"
+                " on notebooks_linked.notebook_guid = notes.notebook_guid"
+                " where notes.guid in ("
+                "  select guid from sync_shared_changes where change='unshared'"
+                " )"
+            )
+            for row in cur:
+                logger.debug(
+                    f"Shared note [{row[0]}] unshared but still in linked notebook,"
+                    " keeping local copy"
+                )
+
+            cur = con.execute(
+                "delete from notes"
+                " where guid in ("
+                "  select guid from sync_shared_changes where change='unshared'"
+                " )"
+                " and guid not in ("
+                "  select notes.guid from notes"
+                "  join notebooks_linked"
+                "  on notebooks_linked.notebook_guid = notes.notebook_guid"
+                " )"
+            )
+            expunged_count += cur.rowcount
+
+            con.execute(
+                "delete from stashed_notes"
+                " where guid in ("
+                "  select guid from sync_shared_changes"
+                "  where change in ('expunged', 'unshared')"
+                " )"
+                " and guid not in (select guid from notes)"
+            )
+
+        return expunged_count
+
     def get_shard_id(self, note_guid: str) -> str | None:
         with self.db as con:
             cur = con.execute(
@@ -667,22 +1178,209 @@ class SharedNotesStorage(SqliteStorage):
             return row[0] if row else None
 
 
-class TasksStorage(SqliteStorage):
-    def add_tasks(self, tasks: Iterable[Task]) -> None:
-        for task in tasks:
-            self.add_task(task)
+class ResourceStorage(SqliteStorage):
+    """Previous versions of notes scheduled for re-download.
 
-    def add_task(self, task: Task) -> None:
-        logger.debug(f"Adding/updating task [{task.taskId}] note_id [{task.parentId}]")
+    When a note that is already stored gets updated remotely, its attachments
+    usually stay the same. The old version is kept aside until the new one is
+    stored, so only resources with unknown bodyHash are downloaded again.
+    """
+
+    def stash_note_resources(self, note_guids: Iterable[str]) -> None:
+        with self.db as con:
+            self.stash_note_resources_in_transaction(con, note_guids)
+
+    def stash_note_resources_in_transaction(
+        self, con: sqlite3.Connection, note_guids: Iterable[str]
+    ) -> None:
+        """Same as stash_note_resources, within the caller's open transaction."""
+        # Kept as is, notes are only decoded once they are downloaded again
+        con.execute(
+            "replace into stashed_notes(guid, raw_note)"
+            " select guid, raw_note from notes"
+            " where guid in (select value from json_each(?))"
+            " and raw_note is not NULL",
+            (json.dumps(list(note_guids)),),
+        )
+
+    def get_resource_hashes_by_guid(
+        self, note_guids: Iterable[str]
+    ) -> dict[str, frozenset[bytes]]:
+        """Resource hashes of stashed versions of the given notes."""
+        with self.db as con:
+            cur = con.execute(
+                "select stashed_notes.guid, notes.title, stashed_notes.raw_note"
+                " from stashed_notes"
+                " left join notes on notes.guid = stashed_notes.guid"
+                " where stashed_notes.guid in (select value from json_each(?))",
+                (json.dumps(list(note_guids)),),
+            )
+
+            hashes: dict[str, frozenset[bytes]] = {}
+            for row in cur:
+                bodies = self._get_resource_bodies(row[0], row[1], row[2])
+                if bodies:
+                    hashes[row[0]] = frozenset(bodies)
+
+            return hashes
+
+    def restore_note_resources(self, note: Note) -> int:
+        """Fill in missing resource bodies from stash. Returns restored count."""
+        with self.db as con:
+            cur = con.execute(
+                "select raw_note from stashed_notes where guid=?",
+                (note.guid,),
+            )
+
+            row = cur.fetchone()
+            if row is None:
+                return 0
+
+        bodies = self._get_resource_bodies(note.guid, note.title, row[0])
+
+        restored = 0
+        for resource in note.resources or []:
+            data = resource.data
+            if data is None or data.body is not None or not data.bodyHash:
+                continue
+
+            body = bodies.get(data.bodyHash)
+            if body is None:
+                continue
+
+            data.body = body
+            restored += 1
 
-        task_deflated = lzma.compress(task.to_json().encode("utf-8"))
+        return restored
 
+    def expunge_note_resources(self, note_guids: Iterable[str]) -> None:
         with self.db as con:
+            con.executemany(
+                "delete from stashed_notes where guid=?",
+                ((g,) for g in note_guids),
+            )
+
+    def _get_resource_bodies(
+        self, note_guid: str, note_title: str | None, raw_note: bytes
+    ) -> dict[bytes, bytes]:
+        note = self.notes._get_raw_note(note_title or "", note_guid, raw_note)
+        if note is None:
+            return {}
+
+        return {
+            r.data.bodyHash: r.data.body
+            for r in note.resources or []
+            if r.data and r.data.bodyHash and r.data.body is not None
+        }
+
+
+class DownloadFailuresStorage(SqliteStorage):
+    def add_failure(self, note_guid: str, error: str) -> int:
+        """Record a failed download, return time of the next attempt."""
+        now = _get_timestamp()
+
+        with self.db as con:
+            cur = con.execute(
+                "select attempts from download_failures where guid=?",
+                (note_guid,),
+            )
+            row = cur.fetchone()
+
+            attempts = row[0] + 1 if row else 1
+            next_attempt = now + get_failure_cooldown(attempts)
+
             con.execute(
+                "replace into download_failures(guid, attempts, last_error,"
+                " next_attempt)"
+                " values (?, ?, ?, ?)",
+                (note_guid, attempts, error, next_attempt),
+            )
+
+        logger.debug(f"Recorded failed download #{attempts} of note [{note_guid}]")
+
+        return next_attempt
+
+    def iter_failures(self) -> Iterator[DownloadFailure]:
+        with self.db as con:
+            cur = con.execute(
+                "select download_failures.guid, title, attempts, last_error,"
+                " next_attempt"
+                " from download_failures"
+                " left join notes"
+                " using (guid)"
+                " order by next_attempt",
+            )
+
+            for row in cur.fetchall():
+                yield DownloadFailure(
+                    guid=row["guid"],
+                    title=row["title"],
+                    attempts=row["attempts"],
+                    last_error=row["last_error"],
+                    next_attempt=row["next_attempt"],
+                )
+
+    def get_deferred_count(self) -> int:
+        """Notes pending download that are skipped until their cool-down ends."""
+        with self.db as con:
+            cur = con.execute(
+                "select COUNT(guid)"
+                " from download_failures"
+                " join notes"
+                " using (guid)"
+                " where next_attempt > ?"
+                " and (raw_note is NULL or resources_pending=1)",
+                (_get_timestamp(),),
+            )
+
+            return int(cur.fetchone()[0])
+
+    def reset_failures(self, note_guids: Iterable[str]) -> None:
+        with self.db as con:
+            con.executemany(
+                "delete from download_failures where guid=?",
+                ((g,) for g in note_guids),
+            )
+
+    def clear_failures(self) -> None:
+        with self.db as con:
+            con.execute("delete from download_failures")
+
+
+class TagStorage(SqliteStorage):
+    def add_tags(self, tags: Iterable[Tag]) -> None:
+        self.add_tag_names({t.guid: t.name for t in tags})
+
+    def add_tag_names(self, tag_names: Mapping[str, str]) -> None:
+        with self.db as con:
+            con.executemany(
+                "replace into tags(guid, name) values (?, ?)",
+                tag_names.items(),
+            )
+
+    def get_tag_names(self) -> dict[str, str]:
+        with self.db as con:
+            cur = con.execute("select guid, name from tags")
+            return {row[0]: row[1] for row in cur}
+
+    def expunge_tags(self, guids: Iterable[str]) -> None:
+        with self.db as con:
+            con.executemany("delete from tags where guid=?", ((g,) for g in guids))
+
+
+class TasksStorage(SqliteStorage):
+    def add_tasks(self, tasks: Iterable[Task]) -> None:
+        rows = [_get_task_row(task) for task in tasks]
+
+        with self.db as con:
+            con.executemany(
                 "replace into tasks(guid, note_guid, raw_task) values (?, ?, ?)",
-                (task.taskId, task.parentId, task_deflated),
+                rows,
             )
 
+    def add_task(self, task: Task) -> None:
+        self.add_tasks([task])
+
     def iter_tasks(self, note_guid: str) -> Iterator[Task]:
         with self.db as con:
             cur = con.execute(
@@ -714,23 +1412,18 @@ class TasksStorage(SqliteStorage):
 
 class RemindersStorage(SqliteStorage):
     def add_reminders(self, reminders: Iterable[Reminder]) -> None:
-        for reminder in reminders:
-            self.add_reminder(reminder)
-
-    def add_reminder(self, reminder: Reminder) -> None:
-        logger.debug(
-            f"Adding/updating reminder [{reminder.reminderId}] task_id [{reminder.sourceId}]"
-        )
-
-        reminder_deflated = lzma.compress(reminder.to_json().encode("utf-8"))
+        rows = [_get_reminder_row(reminder) for reminder in reminders]
 
         with self.db as con:
-            con.execute(
+            con.executemany(
                 "replace into reminders(guid, task_guid, raw_reminder)"
                 " values (?, ?, ?)",
-                (reminder.reminderId, reminder.sourceId, reminder_deflated),
+                rows,
             )
 
+    def add_reminder(self, reminder: Reminder) -> None:
+        self.add_reminders([reminder])
+
     def iter_reminders(self, task_guid: str) -> Iterator[Reminder]:
         with self.db as con:
             cur = con.execute(
@@ -807,3 +1500,29 @@ class ConfigStorage(SqliteStorage):
 
     def set_blacklist_notebooks(self, values: Iterable[str]) -> None:
         self.set_config_list(self.BLACKLIST_NOTEBOOKS, values)
+
+
+def _get_timestamp() -> int:
+    return int(time.time())
+
+
+def _get_task_row(task: Task) -> tuple[str, str | None, bytes]:
+    logger.debug(f"Adding/updating task [{task.taskId}] note_id [{task.parentId}]")
+
+    return task.taskId, task.parentId, _compress_small_record(task.to_json())
+
+
+def _get_reminder_row(reminder: Reminder) -> tuple[str, str | None, bytes]:
+    logger.debug(
+        f"Adding/updating reminder [{reminder.reminderId}] task_id [{reminder.sourceId}]"
+    )
+
+    return (
+        reminder.reminderId,
+        reminder.sourceId,
+        _compress_small_record(reminder.to_json()),
+    )
+
+
+def _compress_small_record(record_json: str) -> bytes:
+    return lzma.compress(record_json.encode("utf-8"), preset=SMALL_RECORD_LZMA_PRESET)
@@ -1,22 +1,55 @@
+import asyncio
 import logging
+import queue
+import signal
 import threading
-from collections.abc import Iterable
-from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, as_completed, wait
-from typing import Any
+import time
+from collections.abc import Awaitable, Callable, Iterable, Iterator, Sequence
+from concurrent.futures import (
+    FIRST_EXCEPTION,
+    CancelledError,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import AbstractContextManager, nullcontext
+from datetime import datetime, timezone
+from typing import Any, NamedTuple, NoReturn
 
 from click import progressbar
 from evernote.edam.error.ttypes import EDAMErrorCode, EDAMSystemException
 from evernote.edam.notestore.ttypes import SyncChunk
 from evernote.edam.type.ttypes import LinkedNotebook, Note
+from thrift.Thrift import TException
 
-from evernote_backup.cli_app_util import chunks, get_progress_output
+from evernote_backup.cli_app_util import chunks, get_progress_output, iter_chunks
 from evernote_backup.config import SHARED_WITH_ME_NOTEBOOK_GUID
+from evernote_backup.config_defaults import (
+    LINKED_NOTEBOOK_AUTH_SKEW,
+    SYNC_BACKFILL_SIZE_LIMIT,
+    SYNC_DOWNLOAD_ENGINE,
+    SYNC_MAX_BACKFILL_WORKERS,
+    SYNC_MAX_LINKED_SYNC_WORKERS,
+    SYNC_MAX_RATE_LIMIT_WAIT,
+    SYNC_V2_CHECKPOINT_CHUNKS,
+)
 from evernote_backup.errors import (
     NoteDownloadException,
     WorkerStopException,
     WrongAuthUserError,
 )
-from evernote_backup.evernote_client_sync import EvernoteClientSync
+from evernote_backup.evernote_client_api_async import AsyncNoteStoreClient
+from evernote_backup.evernote_client_api_traffic import TrafficRule, traffic_shaper
+from evernote_backup.evernote_client_retry import (
+    CircuitBreaker,
+    ErrorKind,
+    RetryPolicy,
+    classify_error,
+)
+from evernote_backup.evernote_client_sync import EvernoteClientSync, TagNameCache
 from evernote_backup.evernote_client_util import (
     NotebookAuth,
     NoteStoreAccess,
@@ -24,12 +57,38 @@ from evernote_backup.evernote_client_util import (
     thrift_attrs,
 )
 from evernote_backup.evernote_types import EvernoteEntityType, SyncChunkV2
-from evernote_backup.note_storage import NoteForSync, SqliteStorage
+from evernote_backup.log_util import (
+    get_log_label,
+    get_time_from_now_txt,
+    get_time_txt,
+    init_logging,
+    keep_log_label,
+    set_log_label,
+)
+from evernote_backup.note_storage import (
+    ConfigStorage,
+    NoteForSync,
+    RawNote,
+    SqliteStorage,
+    deserialize_note,
+    serialize_note,
+)
+from evernote_backup.token_util import (
+    EvernoteToken,
+    OAuth2TokenBundle,
+    TokenRefresher,
+)
 
 logger = logging.getLogger(__name__)
 
 
 THREAD_CHUNK_SIZE = 1000
+NOTE_DOWNLOAD_RETRY_BUDGETS = {ErrorKind.TRANSIENT: 4, ErrorKind.BAD_PAYLOAD: 4}
+NOTE_DOWNLOAD_RETRY_DELAY = 0.5
+NOTE_DOWNLOAD_RETRY_MAX_DELAY = 10.0
+CHUNKS_QUEUE_TIMEOUT = 0.5
+PIPELINE_CHUNKS_QUEUE_SIZE = 10
+STREAM_CHUNKS_QUEUE_SIZE = 50
 
 
 def get_note_size(note: Note) -> int:
@@ -42,6 +101,14 @@ def get_note_size(note: Note) -> int:
     return int(size)
 
 
+def _get_pending_resources_size(note: Note) -> int:
+    return sum(
+        int(r.data.size or 0)
+        for r in note.resources or []
+        if r.data is not None and r.data.body is None
+    )
+
+
 class NoteClientMemoryManager:
     def __init__(self, download_cache_memory_limit: int) -> None:
         self.memory_limit = download_cache_memory_limit * 1024 * 1024
@@ -53,7 +120,7 @@ class NoteClientMemoryManager:
 
     def wait_till_enough_memory(self) -> None:
         with self.memory_cond:
-            self.memory_cond.wait_for(self._is_enough_memory)
+            self.memory_cond.wait_for(self.is_enough_memory)
 
     def reset_memory(self) -> None:
         with self.memory_lock:
@@ -63,15 +130,21 @@ class NoteClientMemoryManager:
             self.memory_cond.notify_all()
 
     def add_note_size(self, note: Note) -> None:
-        with self.memory_lock:
-            self.memory += get_note_size(note)
+        self.add_size(get_note_size(note))
 
     def sub_note_size(self, note: Note) -> None:
+        self.sub_size(get_note_size(note))
+
+    def add_size(self, size: int) -> None:
         with self.memory_lock:
-            self.memory -= get_note_size(note)
+            self.memory += size
+
+    def sub_size(self, size: int) -> None:
+        with self.memory_lock:
+            self.memory -= size
 
         with self.memory_cond:
-            if self._is_enough_memory():
+            if self.is_enough_memory():
                 self.memory_cond.notify_all()
 
     def report_memory(self) -> None:
@@ -82,11 +155,398 @@ class NoteClientMemoryManager:
 
         logger.debug(f"Memory consumed: {memory_percent}% [LIMIT {memory_total} MB]")
 
-    def _is_enough_memory(self) -> bool:
+    def is_enough_memory(self) -> bool:
         with self.memory_lock:
             return self.memory < self.memory_limit
 
 
+class RateLimitGate:
+    """Pause all downloads while the account is rate limited.
+
+    The first worker to hit the limit closes the gate for the duration
+    reported by the server, others wait for it to open before their next
+    request. Throttled notes are retried afterwards, so queued work is kept.
+    """
+
+    def __init__(self, max_wait: int = SYNC_MAX_RATE_LIMIT_WAIT) -> None:
+        self.max_wait = max_wait
+        self.pause_count = 0
+
+        self._resume_at = 0.0
+        self._is_paused = False
+        self._is_cancelled = False
+        self._cond = threading.Condition()
+
+    def pause_on(self, e: Exception) -> bool:
+        """Close the gate if e is a rate limit error, True if it was."""
+        if not isinstance(e, EDAMSystemException):
+            return False
+
+        exc = thrift_attrs(e)
+        if exc.errorCode != EDAMErrorCode.RATE_LIMIT_REACHED:
+            return False
+
+        duration = require(exc.rateLimitDuration)
+        if self.max_wait and duration > self.max_wait:
+            raise e
+
+        with self._cond:
+            resume_at = time.monotonic() + duration
+            if resume_at <= self._resume_at:
+                return True
+
+            if not self._is_paused:
+                self.pause_count += 1
+                logger.warning(
+                    f"Rate limit reached, downloads paused until"
+                    f" {get_time_from_now_txt(duration)}"
+                    f" (for {get_time_txt(duration)})..."
+                )
+
+            self._resume_at = resume_at
+            self._is_paused = True
+
+        return True
+
+    def wait(self) -> None:
+        with self._cond:
+            while not self._is_cancelled and (left := self._time_left()) > 0:
+                self._cond.wait(left)
+
+            self._resume()
+
+    async def wait_async(self) -> None:
+        while not self._is_cancelled and (left := self._time_left()) > 0:
+            await asyncio.sleep(left)
+
+        with self._cond:
+            self._resume()
+
+    def cancel(self) -> None:
+        with self._cond:
+            self._is_cancelled = True
+            self._cond.notify_all()
+
+    def _time_left(self) -> float:
+        return self._resume_at - time.monotonic()
+
+    def _resume(self) -> None:
+        if self._is_paused and not self._is_cancelled:
+            self._is_paused = False
+            logger.info("Rate limit expired, resuming downloads...")
+
+
+class DownloadSlots:
+    """Limit note downloads in flight, may be shared by several synchronizers.
+
+    Slots are handed out in the order they were asked for, so a sync with
+    a long download queue can't starve the others. Limit 0 means no limit.
+    """
+
+    def __init__(self, limit: int = 0) -> None:
+        self.limit = limit
+
+        self._in_use = 0
+        self._next_ticket = 0
+        self._serving = 0
+        self._is_cancelled = False
+        self._cond = threading.Condition()
+
+    def __enter__(self) -> "DownloadSlots":
+        self.acquire()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.release()
+
+    def acquire(self) -> None:
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+
+            while not self._is_cancelled and not self._is_turn(ticket):
+                self._cond.wait()
+
+            if self._is_cancelled:
+                raise WorkerStopException
+
+            self._serving += 1
+            self._in_use += 1
+
+            # Next in line may fit in too
+            self._cond.notify_all()
+
+    async def acquire_async(self) -> None:
+        if not self.limit:
+            # Never waits without a limit, no need for a thread
+            self.acquire()
+            return
+
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self.acquire))
+
+        try:
+            await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # Slot may still be granted to the waiting thread, give it back
+            acquiring.add_done_callback(self._release_acquired)
+            raise
+
+    def release(self) -> None:
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify_all()
+
+    def cancel(self) -> None:
+        with self._cond:
+            self._is_cancelled = True
+            self._cond.notify_all()
+
+    def _is_turn(self, ticket: int) -> bool:
+        if ticket != self._serving:
+            return False
+
+        return not self.limit or self._in_use < self.limit
+
+    def _release_acquired(self, acquiring: asyncio.Future) -> None:
+        if not acquiring.cancelled() and acquiring.exception() is None:
+            self.release()
+
+
+class StopSignal:
+    """Stop several synchronizers at once, e.g. on Ctrl+C in sync-many."""
+
+    def __init__(self) -> None:
+        self.is_set = False
+
+        self._listeners: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        with self._lock:
+            if not self.is_set:
+                self._listeners.append(listener)
+                return
+
+        listener()
+
+    def remove_listener(self, listener: Callable[[], None]) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def set(self) -> None:
+        with self._lock:
+            self.is_set = True
+            listeners, self._listeners = self._listeners, []
+
+        for listener in listeners:
+            listener()
+
+
+class ChunkStreamReader:
+    """Read a v2 sync chunk stream on a separate thread.
+
+    Chunks are buffered until the thread that owns the database connection
+    takes them, so the stream is read during other work while all writes
+    still happen in one place. The buffer is bounded, reading pauses
+    while it is full.
+    """
+
+    def __init__(self, chunks: Iterable[SyncChunkV2]) -> None:
+        self._chunks = chunks
+        self._buffer: queue.Queue[SyncChunkV2 | None] = queue.Queue(
+            maxsize=STREAM_CHUNKS_QUEUE_SIZE
+        )
+        self._error: BaseException | None = None
+        self._is_drained = False
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=keep_log_label(self._read), daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def pop_ready(self) -> Iterator[SyncChunkV2]:
+        """Chunks read so far, without waiting for more."""
+        while not self._is_drained:
+            try:
+                chunk = self._buffer.get_nowait()
+            except queue.Empty:
+                return
+
+            if chunk is None:
+                self._is_drained = True
+                break
+
+            yield chunk
+
+        if self._error is not None:
+            raise self._error
+
+    def pop_all(self) -> Iterator[SyncChunkV2]:
+        """Remaining chunks until the end of the stream."""
+        while not self._is_drained:
+            try:
+                chunk = self._buffer.get(timeout=CHUNKS_QUEUE_TIMEOUT)
+            except queue.Empty:
+                # Stopped reader may not have room to mark the end of stream
+                if self._stop_event.is_set():
+                    raise WorkerStopException from None
+                continue
+
+            if chunk is None:
+                self._is_drained = True
+                break
+
+            yield chunk
+
+        if self._error is not None:
+            raise self._error
+
+    def _read(self) -> None:
+        try:
+            for chunk in self._chunks:
+                if self._stop_event.is_set():
+                    return
+
+                _put_until_stopped(self._buffer, chunk, self._stop_event)
+        except BaseException as e:
+            self._error = e
+        finally:
+            # None marks the end of the chunk stream
+            _put_until_stopped(self._buffer, None, self._stop_event)
+
+
+class SyncCheckpoint:
+    """Position in a v2 sync stream, stored every few applied chunks.
+
+    Storing it less often saves database writes during large backfills,
+    chunks applied after the last stored position are received again
+    during the next sync.
+    """
+
+    def __init__(self, config: ConfigStorage, name: str, interval: int) -> None:
+        self._config = config
+        self._name = name
+        self._interval = interval
+        self._pending: int | None = None
+        self._pending_count = 0
+
+    def update(self, chunk: SyncChunkV2) -> None:
+        self._pending = chunk.last_timestamp + 1
+        self._pending_count += 1
+
+        if self._pending_count >= self._interval:
+            self.save()
+
+    def save(self) -> None:
+        if self._pending is None:
+            return
+
+        self._config.set_config_value(self._name, str(self._pending))
+
+        self._pending = None
+        self._pending_count = 0
+
+
+def _raise_note_download_error(note_id: str, e: Exception, attempts: int) -> NoReturn:
+    """Raise once downloading the note should not be retried anymore."""
+    kind = classify_error(e)
+
+    if kind is ErrorKind.RATE_LIMIT:
+        raise e
+
+    if isinstance(e, EDAMSystemException):
+        exc = thrift_attrs(e)
+        raise NoteDownloadException(
+            f"Remote server returned system error"
+            f" ({exc.errorCode.name} - {exc.message})"
+            f" while downloading note [{note_id}]"
+        )
+
+    if kind is ErrorKind.PERMANENT:
+        raise NoteDownloadException(
+            f"Remote server returned {type(e).__name__}"
+            f" while downloading note [{note_id}]"
+        )
+
+    raise NoteDownloadException(
+        f"Failed to download note [{note_id}] after {attempts} attempts!"
+    )
+
+
+def _log_note_download_retry(note_id: str, e: Exception) -> None:
+    if logger.getEffectiveLevel() == logging.DEBUG:
+        logger.error(
+            f"Got {classify_error(e).value}"
+            f" while downloading note [{note_id}], retrying...",
+            exc_info=e,
+        )
+
+
+def _put_until_stopped(
+    items: queue.Queue, item: Any, stop_event: threading.Event
+) -> None:
+    while not stop_event.is_set():
+        try:
+            items.put(item, timeout=CHUNKS_QUEUE_TIMEOUT)
+        except queue.Full:
+            continue
+        else:
+            return
+
+
+def _thread_pool(max_workers: int) -> ThreadPoolExecutor:
+    # Pool threads log with the label of the thread that started them
+    return ThreadPoolExecutor(
+        max_workers=max_workers,
+        initializer=set_log_label,
+        initargs=(get_log_label(),),
+    )
+
+
+class _TrafficProgressBar:
+    """Progress bar labeled with traffic limits, updated when they change."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self._bar = progressbar(
+            *args, file=get_progress_output(), label=traffic_shaper.describe(), **kwargs
+        )
+
+    def __enter__(self) -> Any:
+        traffic_shaper.add_listener(self._update_label)
+        return self._bar.__enter__()
+
+    def __exit__(self, *args: Any) -> None:
+        traffic_shaper.remove_listener(self._update_label)
+        self._bar.__exit__(*args)
+
+    def _update_label(self, description: str) -> None:
+        self._bar.label = description
+
+
+def _fit_progressbar(bar: Any, batch_size: int) -> None:
+    """Extend progress bar if the next batch doesn't fit into it."""
+    if bar.pos + batch_size > bar.length:
+        bar.length = bar.pos + batch_size
+        bar.finished = False
+
+
+def _take_download_slot(
+    download_slots: DownloadSlots | None,
+) -> AbstractContextManager[Any]:
+    return download_slots if download_slots is not None else nullcontext()
+
+
+def _get_shard(token: str, auth_data: NotebookAuth | None) -> str:
+    if auth_data is not None and auth_data.shard:
+        return auth_data.shard
+
+    return EvernoteToken.from_string(token).shard
+
+
 class NoteClientWorker:
     def __init__(
         self,
@@ -96,6 +556,13 @@ class NoteClientWorker:
         max_chunk_results: int,
         download_cache_memory_limit: int,
         cafile: str | None,
+        with_resources_data: bool = True,
+        tag_cache: TagNameCache | None = None,
+        http_compression: bool = True,
+        http2: bool = False,
+        rate_limit_gate: RateLimitGate | None = None,
+        retry_policy: RetryPolicy | None = None,
+        download_slots: DownloadSlots | None = None,
     ) -> None:
         self.stop = False
         self.token = token
@@ -103,18 +570,124 @@ class NoteClientWorker:
         self.network_error_retry_count = network_error_retry_count
         self.cafile = cafile
         self.max_chunk_results = max_chunk_results
+        self.with_resources_data = with_resources_data
+        self.tag_cache = tag_cache if tag_cache is not None else TagNameCache()
+        self.http_compression = http_compression
+        self.http2 = http2
+        self.rate_limit_gate = rate_limit_gate
+        self.retry_policy = retry_policy
+        self.download_slots = download_slots
 
         self.memory_manager = NoteClientMemoryManager(download_cache_memory_limit)
 
         self._thread_data = threading.local()
         self._note_client: EvernoteClientSync
 
-    def __call__(self, note_id: str, auth_data: NotebookAuth | None = None) -> Note:
+    def __call__(
+        self,
+        note_id: str,
+        auth_data: NotebookAuth | None = None,
+        known_resource_hashes: frozenset[bytes] = frozenset(),
+        notebook_guid: str | None = None,
+    ) -> Note:
+        self.memory_manager.wait_till_enough_memory()
+
+        if self.stop:
+            raise WorkerStopException
+
+        self.set_note_client(auth_data)
+
+        note = self.download_note(note_id, known_resource_hashes)
+        if notebook_guid is not None:
+            note.notebookGuid = notebook_guid
+
+        self.memory_manager.add_note_size(note)
+        self.memory_manager.report_memory()
+
+        return note
+
+    def release(self, note: Note) -> None:
+        self.memory_manager.sub_note_size(note)
+
+    def backfill_note(self, note: Note, auth_data: NotebookAuth | None = None) -> Note:
         self.memory_manager.wait_till_enough_memory()
 
         if self.stop:
             raise WorkerStopException
 
+        self.set_note_client(auth_data)
+
+        note = self.download_note_resources(note)
+
+        self.memory_manager.add_note_size(note)
+        self.memory_manager.report_memory()
+
+        return note
+
+    def download_note(
+        self,
+        note_id: str,
+        known_resource_hashes: frozenset[bytes] = frozenset(),
+    ) -> Note:
+        def fetch() -> Note:
+            if known_resource_hashes or not self.with_resources_data:
+                return self._note_client.get_note(
+                    note_id,
+                    known_resource_hashes,
+                    with_resources_data=self.with_resources_data,
+                )
+            return self._note_client.get_note(note_id)
+
+        return self._retry_download(note_id, fetch)
+
+    def download_note_resources(self, note: Note) -> Note:
+        def fetch() -> Note:
+            self._note_client.download_resources(note)
+            return note
+
+        return self._retry_download(require(note.guid), fetch)
+
+    def _retry_download(self, note_id: str, fetch: Callable[[], Note]) -> Note:
+        # Worker processes leave retries to the parent process
+        if self.retry_policy is None:
+            return fetch()
+
+        retry = self.retry_policy.start(self._note_client.shard or "")
+
+        while True:
+            self._wait_for_server(retry.breaker)
+
+            try:
+                # Slot is held only for the request, not for waits between retries
+                with _take_download_slot(self.download_slots):
+                    note = fetch()
+            except Exception as e:
+                if self.rate_limit_gate is not None and self.rate_limit_gate.pause_on(
+                    e
+                ):
+                    continue
+
+                delay = retry.on_error(e)
+                if delay is None:
+                    _raise_note_download_error(note_id, e, retry.attempts)
+
+                _log_note_download_retry(note_id, e)
+                self.retry_policy.sleep(delay)
+                continue
+
+            retry.on_success()
+            return note
+
+    def _wait_for_server(self, breaker: CircuitBreaker) -> None:
+        if self.rate_limit_gate is not None:
+            self.rate_limit_gate.wait()
+
+        breaker.wait()
+
+        if self.stop:
+            raise WorkerStopException
+
+    def set_note_client(self, auth_data: NotebookAuth | None) -> None:
         if auth_data is None:
             auth_data = NotebookAuth(
                 token=self.token, shard="", access=NoteStoreAccess.OWN
@@ -131,6 +704,9 @@ class NoteClientWorker:
                 network_error_retry_count=self.network_error_retry_count,
                 cafile=self.cafile,
                 max_chunk_results=self.max_chunk_results,
+                tag_cache=self.tag_cache,
+                http_compression=self.http_compression,
+                http2=self.http2,
             )
 
             if auth_data.shard:
@@ -139,50 +715,413 @@ class NoteClientWorker:
 
             self.clients[client_id] = self._note_client
 
-        note = self.download_note(note_id)
+    @property
+    def clients(self) -> Any:
+        try:
+            return self._thread_data.note_clients
+        except AttributeError:
+            self._thread_data.note_clients = {}
+            return self._thread_data.note_clients
+
+
+class DownloadedNote(NamedTuple):
+    raw_note: RawNote
+    size: int
+    fetched_tags: dict[str, str]
+
+
+class ProcessThriftError(Exception):
+    """Carry a Thrift exception out of a worker process.
+
+    Generated Thrift exceptions are immutable and cannot be unpickled.
+    """
+
+    def __init__(self, exc_type: type[TException], fields: dict[str, Any]) -> None:
+        super().__init__(exc_type, fields)
+        self.exc_type = exc_type
+        self.fields = fields
+
+    def rebuild(self) -> TException:
+        return self.exc_type(**self.fields)
+
+
+_process_note_worker: NoteClientWorker | None = None
+
+
+def _init_process_worker(
+    worker_args: dict[str, Any],
+    tag_names: dict[str, str],
+    traffic_rules: tuple[Sequence[TrafficRule], Sequence[TrafficRule]],
+    traffic_share: float,
+    log_level: str,
+    log_label: str | None,
+) -> None:
+    global _process_note_worker
+
+    # Parent process handles interrupts and stops the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Spawned processes start without the logging config of the parent
+    if not logging.getLogger("evernote_backup").handlers:
+        init_logging(log_level)
+    set_log_label(log_label)
+
+    # Each process gets an equal part of the traffic limits
+    traffic_shaper.configure(*traffic_rules, share=traffic_share)
+
+    tag_cache = TagNameCache()
+    tag_cache.update(tag_names)
+
+    _process_note_worker = NoteClientWorker(**worker_args, tag_cache=tag_cache)
+
+
+def _download_note_in_process(
+    note_id: str,
+    auth_data: NotebookAuth | None,
+    known_resource_hashes: frozenset[bytes],
+    notebook_guid: str | None,
+) -> DownloadedNote:
+    worker = require(_process_note_worker)
+    worker.set_note_client(auth_data)
+
+    try:
+        note = worker.download_note(note_id, known_resource_hashes)
+    except TException as e:
+        raise ProcessThriftError(type(e), vars(e)) from None
+
+    if notebook_guid is not None:
+        note.notebookGuid = notebook_guid
+
+    return DownloadedNote(
+        raw_note=serialize_note(note),
+        size=get_note_size(note),
+        fetched_tags=worker.tag_cache.pop_fetched(),
+    )
+
+
+class NoteProcessWorker:
+    """Download notes in a pool of processes.
+
+    Thrift decoding of large notes is CPU-bound and holds the GIL, so threads
+    stop scaling on fast links. Each process owns its own clients and returns
+    notes already serialized for storage. Calls are made from download threads,
+    which only wait for results, so the memory budget and stop semantics are
+    the same as with NoteClientWorker.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        backend: str,
+        network_error_retry_count: int,
+        max_chunk_results: int,
+        download_cache_memory_limit: int,
+        cafile: str | None,
+        max_workers: int,
+        tag_cache: TagNameCache,
+        with_resources_data: bool = True,
+        http_compression: bool = True,
+        http2: bool = False,
+        rate_limit_gate: RateLimitGate | None = None,
+        retry_policy: RetryPolicy | None = None,
+        download_slots: DownloadSlots | None = None,
+    ) -> None:
+        self.stop = False
+        self.token = token
+        self.max_workers = max_workers
+        self.tag_cache = tag_cache
+        self.rate_limit_gate = rate_limit_gate
+        self.retry_policy = retry_policy
+        self.download_slots = download_slots
+        self.worker_args = {
+            "token": token,
+            "backend": backend,
+            "network_error_retry_count": network_error_retry_count,
+            "max_chunk_results": max_chunk_results,
+            "download_cache_memory_limit": download_cache_memory_limit,
+            "cafile": cafile,
+            "with_resources_data": with_resources_data,
+            "http_compression": http_compression,
+            "http2": http2,
+        }
+
+        self.memory_manager = NoteClientMemoryManager(download_cache_memory_limit)
+
+        self._executor: ProcessPoolExecutor | None = None
+
+    def __enter__(self) -> "NoteProcessWorker":
+        # This process keeps fetching sync chunks, so it counts as one more part
+        traffic_share = traffic_shaper.add_child_processes(self.max_workers)
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_process_worker,
+            initargs=(
+                self.worker_args,
+                self.tag_cache.get_names(),
+                (traffic_shaper.request_rules, traffic_shaper.bandwidth_rules),
+                traffic_share,
+                logging.getLevelName(logger.getEffectiveLevel()),
+                get_log_label(),
+            ),
+        )
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        try:
+            require(self._executor).shutdown(wait=True, cancel_futures=True)
+        finally:
+            self._executor = None
+            traffic_shaper.remove_child_processes(self.max_workers)
+
+    def __call__(
+        self,
+        note_id: str,
+        auth_data: NotebookAuth | None = None,
+        known_resource_hashes: frozenset[bytes] = frozenset(),
+        notebook_guid: str | None = None,
+    ) -> DownloadedNote:
+        self.memory_manager.wait_till_enough_memory()
+
+        if self.stop:
+            raise WorkerStopException
+
+        if auth_data is None:
+            # Sent with each call, so processes pick up refreshed tokens
+            auth_data = NotebookAuth(
+                token=self.token, shard="", access=NoteStoreAccess.OWN
+            )
+
+        retry_policy = require(self.retry_policy)
+        retry = retry_policy.start(_get_shard(self.token, auth_data))
+
+        while True:
+            if self.rate_limit_gate is not None:
+                self.rate_limit_gate.wait()
+
+            retry.breaker.wait()
+
+            if self.stop:
+                raise WorkerStopException
+
+            try:
+                with _take_download_slot(self.download_slots):
+                    downloaded = (
+                        require(self._executor)
+                        .submit(
+                            _download_note_in_process,
+                            note_id,
+                            auth_data,
+                            known_resource_hashes,
+                            notebook_guid,
+                        )
+                        .result()
+                    )
+            except (BrokenProcessPool, CancelledError):
+                raise
+            except ProcessThriftError as e:
+                exc: Exception = e.rebuild()
+            except Exception as e:
+                exc = e
+            else:
+                retry.on_success()
+                break
+
+            if self.rate_limit_gate is not None and self.rate_limit_gate.pause_on(exc):
+                continue
+
+            delay = retry.on_error(exc)
+            if delay is None:
+                _raise_note_download_error(note_id, exc, retry.attempts)
+
+            _log_note_download_retry(note_id, exc)
+            retry_policy.sleep(delay)
+
+        self.memory_manager.add_size(downloaded.size)
+        self.memory_manager.report_memory()
+
+        return downloaded
+
+    def release(self, downloaded: DownloadedNote) -> None:
+        self.memory_manager.sub_size(downloaded.size)
+
+
+class NoteAsyncWorker:
+    """Download notes concurrently on a single event loop.
+
+    Each download in flight holds a pooled HTTP connection instead of a thread,
+    so concurrency is not limited by thread count. Memory budget and stop
+    semantics are the same as with NoteClientWorker.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        backend: str,
+        network_error_retry_count: int,
+        max_chunk_results: int,
+        download_cache_memory_limit: int,
+        cafile: str | None,
+        with_resources_data: bool = True,
+        tag_cache: TagNameCache | None = None,
+        http_compression: bool = True,
+        http2: bool = False,
+        rate_limit_gate: RateLimitGate | None = None,
+        retry_policy: RetryPolicy | None = None,
+        download_slots: DownloadSlots | None = None,
+    ) -> None:
+        self.stop = False
+        self.token = token
+        self.backend = backend
+        self.network_error_retry_count = network_error_retry_count
+        self.cafile = cafile
+        self.max_chunk_results = max_chunk_results
+        self.with_resources_data = with_resources_data
+        self.tag_cache = tag_cache if tag_cache is not None else TagNameCache()
+        self.http_compression = http_compression
+        self.http2 = http2
+        self.rate_limit_gate = rate_limit_gate
+        self.retry_policy = retry_policy
+        self.download_slots = download_slots
+
+        self.memory_manager = NoteClientMemoryManager(download_cache_memory_limit)
+
+        self._memory_cond: asyncio.Condition | None = None
+        self._clients: dict[str, tuple[EvernoteClientSync, AsyncNoteStoreClient]] = {}
+
+    async def __aenter__(self) -> "NoteAsyncWorker":
+        self._memory_cond = asyncio.Condition()
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        clients, self._clients = self._clients, {}
+
+        for _, note_store in clients.values():
+            await note_store.close()
+
+        self._memory_cond = None
+
+    async def __call__(
+        self,
+        note_id: str,
+        auth_data: NotebookAuth | None = None,
+        known_resource_hashes: frozenset[bytes] = frozenset(),
+        notebook_guid: str | None = None,
+    ) -> Note:
+        memory_cond = require(self._memory_cond)
+        async with memory_cond:
+            await memory_cond.wait_for(
+                lambda: self.stop or self.memory_manager.is_enough_memory()
+            )
+
+        if self.stop:
+            raise WorkerStopException
+
+        note_client, note_store = self._get_clients(auth_data)
+
+        note = await self._retry_download(
+            note_id,
+            note_client.shard or "",
+            lambda: note_client.get_note_async(
+                note_store,
+                note_id,
+                known_resource_hashes,
+                with_resources_data=self.with_resources_data,
+            ),
+        )
+        if notebook_guid is not None:
+            note.notebookGuid = notebook_guid
 
         self.memory_manager.add_note_size(note)
         self.memory_manager.report_memory()
 
-        return note
+        return note
+
+    async def release(self, note: Note) -> None:
+        self.memory_manager.sub_note_size(note)
+
+        memory_cond = require(self._memory_cond)
+        async with memory_cond:
+            memory_cond.notify_all()
+
+    async def _retry_download(
+        self, note_id: str, shard: str, fetch: Callable[[], Awaitable[Note]]
+    ) -> Note:
+        retry_policy = require(self.retry_policy)
+        retry = retry_policy.start(shard)
+
+        while True:
+            if self.rate_limit_gate is not None:
+                await self.rate_limit_gate.wait_async()
+
+            await retry.breaker.wait_async()
+
+            if self.stop:
+                raise WorkerStopException
+
+            try:
+                note = await self._fetch(fetch)
+            except Exception as e:
+                if self.rate_limit_gate is not None and self.rate_limit_gate.pause_on(
+                    e
+                ):
+                    continue
+
+                delay = retry.on_error(e)
+                if delay is None:
+                    _raise_note_download_error(note_id, e, retry.attempts)
+
+                _log_note_download_retry(note_id, e)
+                await asyncio.sleep(delay)
+                continue
+
+            retry.on_success()
+            return note
+
+    async def _fetch(self, fetch: Callable[[], Awaitable[Note]]) -> Note:
+        if self.download_slots is None:
+            return await fetch()
+
+        await self.download_slots.acquire_async()
+
+        try:
+            return await fetch()
+        finally:
+            self.download_slots.release()
+
+    def _get_clients(
+        self, auth_data: NotebookAuth | None
+    ) -> tuple[EvernoteClientSync, AsyncNoteStoreClient]:
+        if auth_data is None:
+            auth_data = NotebookAuth(
+                token=self.token, shard="", access=NoteStoreAccess.OWN
+            )
+
+        client_id = f"{auth_data.shard}:{auth_data.token}:{auth_data.access.value}"
 
-    def download_note(self, note_id: str) -> Note:
-        retry_count = 5
+        try:
+            return self._clients[client_id]
+        except KeyError:
+            pass
+
+        note_client = EvernoteClientSync(
+            token=auth_data.token,
+            backend=self.backend,
+            network_error_retry_count=self.network_error_retry_count,
+            cafile=self.cafile,
+            max_chunk_results=self.max_chunk_results,
+            tag_cache=self.tag_cache,
+            http_compression=self.http_compression,
+            http2=self.http2,
+        )
 
-        for _ in range(retry_count):
-            try:
-                return self._note_client.get_note(note_id)
-            except EDAMSystemException as e:
-                exc = thrift_attrs(e)
-                if exc.errorCode == EDAMErrorCode.RATE_LIMIT_REACHED:
-                    raise
-
-                raise NoteDownloadException(
-                    f"Remote server returned system error"
-                    f" ({exc.errorCode.name} - {exc.message})"
-                    f" while downloading note [{note_id}]"
-                )
-            except Exception:
-                # Known errors so far:
-                # EOFError     - thrift.transport.TTransport, empty body from server
-                # struct.error - some of the fields returned wrong type
-                if logger.getEffectiveLevel() == logging.DEBUG:
-                    logger.exception(
-                        f"Remote server returned bad data"
-                        f" while downloading note [{note_id}], retrying..."
-                    )
+        if auth_data.shard:
+            note_client.shard = auth_data.shard
+        note_client.access = auth_data.access
 
-        raise NoteDownloadException(
-            f"Failed to download note [{note_id}] after {retry_count} attempts!"
-        )
+        self._clients[client_id] = (note_client, note_client.get_async_note_store())
 
-    @property
-    def clients(self) -> Any:
-        try:
-            return self._thread_data.note_clients
-        except AttributeError:
-            self._thread_data.note_clients = {}
-            return self._thread_data.note_clients
+        return self._clients[client_id]
 
 
 class NoteSynchronizer:
@@ -193,9 +1132,21 @@ class NoteSynchronizer:
         max_download_workers: int,
         download_cache_memory_limit: int,
         is_v2_api_enabled: bool,
+        is_two_phase: bool = False,
+        is_pipelined: bool = True,
+        max_backfill_workers: int = SYNC_MAX_BACKFILL_WORKERS,
+        max_backfill_size: int = SYNC_BACKFILL_SIZE_LIMIT,
+        max_linked_sync_workers: int = SYNC_MAX_LINKED_SYNC_WORKERS,
+        download_engine: str = SYNC_DOWNLOAD_ENGINE,
+        max_rate_limit_wait: int = SYNC_MAX_RATE_LIMIT_WAIT,
+        v2_checkpoint_chunks: int = SYNC_V2_CHECKPOINT_CHUNKS,
+        token_refresher: TokenRefresher | None = None,
+        download_slots: DownloadSlots | None = None,
+        stop_signal: StopSignal | None = None,
     ) -> None:
         self._count_updated_notebooks = 0
         self._count_updated_notes = 0
+        self._count_backfilled_notes = 0
         self._count_updated_tasks = 0
         self._count_updated_reminders = 0
         self._count_updated_shared_notes = 0
@@ -211,21 +1162,145 @@ class NoteSynchronizer:
         self.storage = note_storage
         self.max_download_workers = max_download_workers
         self.is_v2_api_enabled = is_v2_api_enabled
-
-        self.note_worker = NoteClientWorker(
+        self.is_pipelined = is_pipelined
+        self.v2_checkpoint_chunks = v2_checkpoint_chunks
+
+        self.tag_cache = TagNameCache()
+        self.rate_limit_gate = RateLimitGate(max_rate_limit_wait)
+        self.retry_policy = RetryPolicy(
+            budgets=NOTE_DOWNLOAD_RETRY_BUDGETS,
+            base_delay=NOTE_DOWNLOAD_RETRY_DELAY,
+            max_delay=NOTE_DOWNLOAD_RETRY_MAX_DELAY,
+        )
+        self.note_worker: NoteClientWorker | NoteProcessWorker | NoteAsyncWorker
+        if download_engine == "process":
+            self.note_worker = NoteProcessWorker(
+                token=str(self.note_client.token),
+                backend=self.note_client.backend,
+                network_error_retry_count=self.note_client.network_error_retry_count,
+                cafile=self.note_client.cafile,
+                max_chunk_results=self.note_client.max_chunk_results,
+                download_cache_memory_limit=download_cache_memory_limit,
+                max_workers=max_download_workers,
+                with_resources_data=not is_two_phase,
+                tag_cache=self.tag_cache,
+                http_compression=self.note_client.http_compression,
+                http2=self.note_client.http2,
+                rate_limit_gate=self.rate_limit_gate,
+                retry_policy=self.retry_policy,
+                download_slots=download_slots,
+            )
+        elif download_engine == "async":
+            self.note_worker = NoteAsyncWorker(
+                token=str(self.note_client.token),
+                backend=self.note_client.backend,
+                network_error_retry_count=self.note_client.network_error_retry_count,
+                cafile=self.note_client.cafile,
+                max_chunk_results=self.note_client.max_chunk_results,
+                download_cache_memory_limit=download_cache_memory_limit,
+                with_resources_data=not is_two_phase,
+                tag_cache=self.tag_cache,
+                http_compression=self.note_client.http_compression,
+                http2=self.note_client.http2,
+                rate_limit_gate=self.rate_limit_gate,
+                retry_policy=self.retry_policy,
+                download_slots=download_slots,
+            )
+        else:
+            self.note_worker = NoteClientWorker(
+                token=str(self.note_client.token),
+                backend=self.note_client.backend,
+                network_error_retry_count=self.note_client.network_error_retry_count,
+                cafile=self.note_client.cafile,
+                max_chunk_results=self.note_client.max_chunk_results,
+                download_cache_memory_limit=download_cache_memory_limit,
+                with_resources_data=not is_two_phase,
+                tag_cache=self.tag_cache,
+                http_compression=self.note_client.http_compression,
+                http2=self.note_client.http2,
+                rate_limit_gate=self.rate_limit_gate,
+                retry_policy=self.retry_policy,
+                download_slots=download_slots,
+            )
+        self.max_backfill_workers = max_backfill_workers
+        self.max_backfill_size = max_backfill_size * 1024 * 1024
+        self.backfill_worker = NoteClientWorker(
             token=str(self.note_client.token),
             backend=self.note_client.backend,
             network_error_retry_count=self.note_client.network_error_retry_count,
             cafile=self.note_client.cafile,
             max_chunk_results=self.note_client.max_chunk_results,
             download_cache_memory_limit=download_cache_memory_limit,
+            http_compression=self.note_client.http_compression,
+            http2=self.note_client.http2,
+            rate_limit_gate=self.rate_limit_gate,
+            retry_policy=self.retry_policy,
+            download_slots=download_slots,
         )
+        self.max_linked_sync_workers = max_linked_sync_workers
         self.linked_notebooks_auth: dict[str, NotebookAuth] = {}
         self.shared_notes_auth: dict[str, NotebookAuth] = {}
+        self.resource_hashes: dict[str, frozenset[bytes]] = {}
+        self.tasks_reader: ChunkStreamReader | None = None
+        self.tasks_checkpoint = SyncCheckpoint(
+            self.storage.config, "last_connection_tasks", v2_checkpoint_chunks
+        )
+
+        if token_refresher is not None:
+            token_refresher.add_listener(self._set_auth_token)
+
+        self.stop_signal = stop_signal
+        self.is_cancelled = False
 
     def sync(self) -> None:
+        if self.stop_signal is not None:
+            self.stop_signal.add_listener(self.cancel)
+
+        try:
+            self._sync()
+        finally:
+            if self.stop_signal is not None:
+                self.stop_signal.remove_listener(self.cancel)
+
+    def cancel(self) -> None:
+        """Stop the sync from another thread, sync() raises WorkerStopException."""
+        self.is_cancelled = True
+
+        self.note_worker.stop = True
+        self.backfill_worker.stop = True
+        self.rate_limit_gate.cancel()
+        self.retry_policy.cancel()
+
+        if self.tasks_reader is not None:
+            self.tasks_reader.stop()
+
+    def _sync(self) -> None:
         self._raise_on_wrong_user()
 
+        if self.is_v2_api_enabled:
+            # Tasks don't depend on notes, so their stream is read meanwhile
+            self.tasks_reader = ChunkStreamReader(
+                self.note_client.iter_sync_chunks_v2(
+                    int(self.storage.config.get_config_value("last_connection_tasks")),
+                    entity_filter=[
+                        EvernoteEntityType.TASK,
+                        EvernoteEntityType.REMINDER,
+                    ],
+                )
+            )
+            self.tasks_reader.start()
+
+        try:
+            self._sync_notes()
+        finally:
+            if self.tasks_reader is not None:
+                self.tasks_reader.stop()
+
+            self.tasks_checkpoint.save()
+
+        self._log_report()
+
+    def _sync_notes(self) -> None:
         logger.info("Syncing user notebooks...")
 
         self._sync_chunks()
@@ -233,34 +1308,67 @@ class NoteSynchronizer:
         if self.note_client.linked_notebooks:
             logger.info("Syncing linked notebooks...")
 
-            for l_notebook in self.note_client.linked_notebooks.values():
-                self._sync_linked_notebook(l_notebook)
+            self._sync_linked_notebooks()
 
         # Single-note shares (v2) must run before downloads so new shares are queued.
         if self.is_v2_api_enabled:
             logger.info("Syncing shared notes...")
             self._sync_chunks_v2_shared_notes()
 
-        notes_to_sync = self._filter_blacklisted_notes(
-            self.storage.notes.get_notes_for_sync()
+        blacklisted_notes = self.storage.config.get_blacklist_notes()
+        blacklisted_notebooks = self.storage.config.get_blacklist_notebooks()
+
+        notes_count = self.storage.notes.get_notes_for_sync_count(
+            blacklisted_notes, blacklisted_notebooks
         )
 
-        if notes_to_sync:
-            logger.info(f"{len(notes_to_sync)} note(s) to download...")
+        if blacklisted_notes or blacklisted_notebooks:
+            skipped = self.storage.notes.get_notes_for_sync_count() - notes_count
+            if skipped:
+                logger.info(f"Skipped {skipped} blacklisted note(s).")
+
+        deferred = self.storage.download_failures.get_deferred_count()
+        if deferred:
+            logger.info(
+                f"Skipped {deferred} note(s) that failed to download recently,"
+                " see 'manage failures'."
+            )
 
-            self._authorize_linked_notebooks_for_notes(notes_to_sync)
-            self._prepare_shared_notes_auth(notes_to_sync)
-            self._download_scheduled_notes(notes_to_sync)
+        if notes_count:
+            logger.info(f"{notes_count} note(s) to download...")
+
+            self._download_scheduled_notes(
+                iter_chunks(
+                    self.storage.notes.iter_notes_for_sync(
+                        blacklisted_notes, blacklisted_notebooks, THREAD_CHUNK_SIZE
+                    ),
+                    THREAD_CHUNK_SIZE,
+                ),
+                notes_count,
+            )
 
-            self._count_updated_notes = len(notes_to_sync)
+            self._count_updated_notes += notes_count
 
         if self.is_v2_api_enabled:
             logger.info("Syncing tasks...")
             self._sync_chunks_v2_tasks()
 
-        report = [
+        notes_to_backfill = self.storage.notes.get_notes_for_backfill(
+            blacklisted_notes, blacklisted_notebooks
+        )
+
+        if notes_to_backfill:
+            logger.info(f"{len(notes_to_backfill)} note(s) with missing attachments...")
+
+            self._authorize_linked_notebooks_for_notes(notes_to_backfill)
+            self._prepare_shared_notes_auth(notes_to_backfill)
+            self._backfill_scheduled_notes(notes_to_backfill)
+
+    def get_report(self) -> list[tuple[str, int]]:
+        return [
             ("Updated or added notebooks", self._count_updated_notebooks),
             ("Updated or added notes", self._count_updated_notes),
+            ("Downloaded attachments for notes", self._count_backfilled_notes),
             ("Updated or added shared notes", self._count_updated_shared_notes),
             ("Updated or added tasks", self._count_updated_tasks),
             ("Updated or added reminders", self._count_updated_reminders),
@@ -270,87 +1378,105 @@ class NoteSynchronizer:
             ("Expunged shared notes", self._count_expunged_shared_notes),
             ("Expunged tasks", self._count_expunged_tasks),
             ("Expunged reminders", self._count_expunged_reminders),
+            ("Paused on rate limit", self.rate_limit_gate.pause_count),
+            (
+                "Note download retries after network errors",
+                self.retry_policy.retry_counts[ErrorKind.TRANSIENT],
+            ),
+            (
+                "Note download retries after bad server data",
+                self.retry_policy.retry_counts[ErrorKind.BAD_PAYLOAD],
+            ),
+            ("Failed note downloads", self.retry_policy.failure_counts.total()),
+            ("Shard pauses after network errors", self.retry_policy.breaker_trip_count),
         ]
 
-        for msg, count in report:
+    def _log_report(self) -> None:
+        for msg, count in self.get_report():
             if count > 0:
                 logger.info(f"{msg}: {count}")
 
-    def _filter_blacklisted_notes(
-        self, notes_to_sync: tuple[NoteForSync, ...]
-    ) -> tuple[NoteForSync, ...]:
-        blacklisted_notes = set(self.storage.config.get_blacklist_notes())
-        blacklisted_notebooks = set(self.storage.config.get_blacklist_notebooks())
-
-        if not blacklisted_notes and not blacklisted_notebooks:
-            return notes_to_sync
+    def _authorize_linked_notebooks_for_notes(
+        self, notes_to_sync: Sequence[NoteForSync]
+    ) -> None:
+        linked_notebooks = {
+            n.linked_notebook_guid
+            for n in notes_to_sync
+            if n.linked_notebook_guid
+            and n.linked_notebook_guid not in self.linked_notebooks_auth
+        }
 
-        filtered: list[NoteForSync] = []
-        skipped = 0
+        if not linked_notebooks:
+            return
 
-        for note in notes_to_sync:
-            if note.guid in blacklisted_notes:
-                logger.debug(f"Skipping blacklisted note '{note.title}' [{note.guid}]")
-                skipped += 1
-                continue
+        # Cached tokens must stay valid for the whole download run
+        valid_after = datetime.now(timezone.utc) + LINKED_NOTEBOOK_AUTH_SKEW
+        cached_auth = self.storage.notebooks.get_linked_notebooks_auth(
+            int(valid_after.timestamp() * 1000)
+        )
 
-            if note.notebook_guid and note.notebook_guid in blacklisted_notebooks:
-                logger.debug(
-                    f"Skipping note '{note.title}' [{note.guid}]"
-                    f" from blacklisted notebook [{note.notebook_guid}]"
-                )
-                skipped += 1
-                continue
+        for ln_guid in linked_notebooks & cached_auth.keys():
+            self.linked_notebooks_auth[ln_guid] = cached_auth[ln_guid]
 
-            filtered.append(note)
+        linked_notebooks -= cached_auth.keys()
 
-        if skipped:
-            logger.info(f"Skipped {skipped} blacklisted note(s).")
+        if not linked_notebooks:
+            return
 
-        return tuple(filtered)
+        logger.info(
+            f"Requesting access to {len(linked_notebooks)} linked notebook(s)..."
+        )
 
-    def _authorize_linked_notebooks_for_notes(
-        self, notes_to_sync: tuple[NoteForSync, ...]
-    ) -> None:
-        linked_notebooks = {
-            n.linked_notebook_guid for n in notes_to_sync if n.linked_notebook_guid
+        notebook_guids = {
+            ln_guid: require(
+                self.storage.notebooks.get_notebook_by_linked_guid(ln_guid).guid
+            )
+            for ln_guid in linked_notebooks
         }
 
-        if linked_notebooks:
-            logger.info(
-                f"Requesting access to {len(linked_notebooks)} linked notebook(s)..."
+        with _thread_pool(self.max_linked_sync_workers) as executor:
+            new_auth = dict(
+                zip(
+                    notebook_guids,
+                    executor.map(
+                        self.note_client.auth_linked_notebook,
+                        notebook_guids,
+                        notebook_guids.values(),
+                    ),
+                    strict=True,
+                )
             )
 
-            for ln_guid in linked_notebooks:
-                nb = self.storage.notebooks.get_notebook_by_linked_guid(ln_guid)
-                auth_token = self.note_client.auth_linked_notebook(
-                    ln_guid, require(nb.guid)
-                )
+        self.linked_notebooks_auth.update(new_auth)
 
-                self.linked_notebooks_auth[ln_guid] = auth_token
+        # Public notebooks are accessed with the user token, no need to keep it
+        self.storage.notebooks.add_linked_notebooks_auth(
+            {g: a for g, a in new_auth.items() if a.expiration is not None}
+        )
 
-    def _prepare_shared_notes_auth(
-        self, notes_to_sync: tuple[NoteForSync, ...]
-    ) -> None:
+    def _prepare_shared_notes_auth(self, notes_to_sync: Sequence[NoteForSync]) -> None:
         """Build shard-scoped auth for single-note shares (same user token)."""
         user_token = str(self.note_client.token)
 
-        for note in notes_to_sync:
-            if note.linked_notebook_guid:
-                continue
-            if not note.shard_id:
-                continue
-            self.shared_notes_auth[note.guid] = NotebookAuth(
+        self.shared_notes_auth = {
+            note.guid: NotebookAuth(
                 token=user_token,
                 shard=note.shard_id,
                 access=NoteStoreAccess.SINGLE_NOTE_SHARE,
             )
+            for note in notes_to_sync
+            if not note.linked_notebook_guid and note.shard_id
+        }
 
     def _auth_for_note(self, note: NoteForSync) -> NotebookAuth | None:
         if note.linked_notebook_guid:
             return self.linked_notebooks_auth.get(note.linked_notebook_guid)
         return self.shared_notes_auth.get(note.guid)
 
+    def _raise_on_cancel(self) -> None:
+        if self.is_cancelled:
+            raise WorkerStopException
+
     def _raise_on_wrong_user(self) -> None:
         remote_user = self.note_client.user
         local_user = self.storage.config.get_config_value("user")
@@ -366,11 +1492,14 @@ class NoteSynchronizer:
             logger.info("User notebooks are up to date, nothing to sync!")
             return
 
+        if self.is_pipelined:
+            self._sync_chunks_pipelined(current_usn)
+            return
+
         last_usn = current_usn
-        with progressbar(
+        with _TrafficProgressBar(
             length=remote_usn - current_usn,
             show_pos=True,
-            file=get_progress_output(),
         ) as chunks_bar:
             for chunk in self.note_client.iter_sync_chunks(current_usn):
                 self._process_chunk(chunk)
@@ -381,31 +1510,198 @@ class NoteSynchronizer:
                 chunks_bar.update(chunk_usn - last_usn)
                 last_usn = chunk_usn
 
-    def _sync_linked_notebook(self, l_notebook: LinkedNotebook) -> None:
-        ln_guid = require(l_notebook.guid)
-        current_usn = self.storage.notebooks.get_linked_notebook_usn(ln_guid)
+    def _sync_chunks_pipelined(self, current_usn: int) -> None:
+        """Apply sync chunks and download notes they schedule at the same time.
+
+        Chunks are fetched by a separate thread and applied here as they
+        arrive. Notes scheduled by applied chunks are downloaded in batches,
+        while the next chunks are being fetched. USN is stored after every
+        applied chunk as in a sequential sync: scheduled notes are in the
+        database by then, so interrupted downloads are resumed next time.
+        """
+        sync_chunks: queue.Queue[SyncChunk | None] = queue.Queue(
+            maxsize=PIPELINE_CHUNKS_QUEUE_SIZE
+        )
+        stop_event = threading.Event()
+
+        blacklisted_notes = self.storage.config.get_blacklist_notes()
+        blacklisted_notebooks = self.storage.config.get_blacklist_notebooks()
+
+        def fetch_chunks() -> None:
+            try:
+                for chunk in self.note_client.iter_sync_chunks(current_usn):
+                    if stop_event.is_set():
+                        return
+
+                    _put_until_stopped(sync_chunks, chunk, stop_event)
+            finally:
+                # None marks the end of the chunk stream
+                _put_until_stopped(sync_chunks, None, stop_event)
+
+        def iter_note_batches() -> Iterator[tuple[NoteForSync, ...]]:
+            scheduled: list[str] = []
+
+            while True:
+                chunk = sync_chunks.get()
+
+                if chunk is not None:
+                    self._process_chunk(chunk)
+
+                    if chunk.tags:
+                        self.tag_cache.update(
+                            {require(t.guid): require(t.name) for t in chunk.tags}
+                        )
+
+                    chunk_usn = require(chunk.chunkHighUSN)
+                    self.storage.config.set_config_value("USN", str(chunk_usn))
+
+                    scheduled.extend(require(n.guid) for n in chunk.notes or [])
+
+                # Don't let downloads idle while waiting for a full batch
+                is_batch_ready = (
+                    chunk is None
+                    or len(scheduled) >= THREAD_CHUNK_SIZE
+                    or sync_chunks.empty()
+                )
+
+                if scheduled and is_batch_ready:
+                    # Notes may be expunged or blacklisted since scheduled
+                    notes_batch = self.storage.notes.get_notes_for_sync_by_guid(
+                        scheduled, blacklisted_notes, blacklisted_notebooks
+                    )
+                    scheduled = []
+
+                    if notes_batch:
+                        self._count_updated_notes += len(notes_batch)
+
+                        yield notes_batch
+
+                if chunk is None:
+                    return
 
-        l_notebook_chunks = self.note_client.iter_linked_notebook_sync_chunks(
-            l_notebook, current_usn
+        logger.info("Downloading notes while syncing...")
+
+        count_before = self._count_updated_notes
+
+        with _thread_pool(1) as executor:
+            fetch_f = executor.submit(fetch_chunks)
+
+            try:
+                self._download_scheduled_notes(iter_note_batches(), 0)
+            finally:
+                stop_event.set()
+
+        fetch_f.result()
+
+        notes_count = self._count_updated_notes - count_before
+        if notes_count:
+            logger.info(f"{notes_count} note(s) downloaded while syncing.")
+
+    def _sync_linked_notebooks(self) -> None:
+        """Fetch linked notebook chunks concurrently, apply them in this thread.
+
+        Every notebook has its own chunk stream, possibly on another shard,
+        so streams are fetched by a pool of threads. Chunks are passed
+        through a bounded queue and stored one by one here, keeping
+        per-notebook USN checkpoints the same as in a sequential sync.
+        """
+        current_usns = {
+            ln_guid: self.storage.notebooks.get_linked_notebook_usn(ln_guid)
+            for ln_guid in self.note_client.linked_notebooks
+        }
+
+        logger.debug(f"Linked notebook sync threads: {self.max_linked_sync_workers}")
+
+        l_notebooks = self._get_changed_linked_notebooks(current_usns)
+
+        if not l_notebooks:
+            logger.info("Linked notebooks are up to date, nothing to sync!")
+            return
+
+        logger.info(f"{len(l_notebooks)} linked notebook(s) to sync...")
+
+        linked_chunks: queue.Queue[tuple[LinkedNotebook, SyncChunk | None]] = (
+            queue.Queue(maxsize=self.max_linked_sync_workers)
         )
+        stop_event = threading.Event()
+
+        def fetch_chunks(l_notebook: LinkedNotebook) -> None:
+            try:
+                for chunk in self.note_client.iter_linked_notebook_sync_chunks(
+                    l_notebook, current_usns[require(l_notebook.guid)]
+                ):
+                    if stop_event.is_set():
+                        return
+
+                    _put_until_stopped(linked_chunks, (l_notebook, chunk), stop_event)
+            finally:
+                # None marks the end of the notebook stream
+                _put_until_stopped(linked_chunks, (l_notebook, None), stop_event)
+
+        with _thread_pool(self.max_linked_sync_workers) as executor:
+            futures = [executor.submit(fetch_chunks, ln) for ln in l_notebooks]
+
+            try:
+                pending_notebooks = len(futures)
+                while pending_notebooks:
+                    l_notebook, chunk = linked_chunks.get()
+
+                    if chunk is None:
+                        pending_notebooks -= 1
+                        continue
+
+                    self._process_linked_notebook_chunk(l_notebook, chunk)
+            finally:
+                stop_event.set()
 
-        for chunk in l_notebook_chunks:
-            for notebook in chunk.notebooks or []:
-                # Correct stack info is in LinkedNotebook
-                notebook.stack = l_notebook.stack
-                self.storage.notebooks.add_linked_notebook(l_notebook, notebook)
+        for f in futures:
+            f.result()
 
-            self._process_chunk(chunk)
+    def _get_changed_linked_notebooks(
+        self, current_usns: dict[str, int]
+    ) -> list[LinkedNotebook]:
+        """Check sync state of all linked notebooks concurrently.
 
-            self.storage.notebooks.set_linked_notebook_usn(
-                ln_guid, require(chunk.chunkHighUSN)
+        Sync state is much cheaper to get than a sync chunk, so notebooks
+        without changes since the last sync are skipped entirely.
+        """
+        l_notebooks = list(self.note_client.linked_notebooks.values())
+
+        with _thread_pool(self.max_linked_sync_workers) as executor:
+            remote_usns = executor.map(
+                self.note_client.get_linked_notebook_remote_usn, l_notebooks
             )
 
+            return [
+                ln
+                for ln, remote_usn in zip(l_notebooks, remote_usns, strict=True)
+                if remote_usn != current_usns[require(ln.guid)]
+            ]
+
+    def _process_linked_notebook_chunk(
+        self, l_notebook: LinkedNotebook, chunk: SyncChunk
+    ) -> None:
+        self._raise_on_cancel()
+
+        for notebook in chunk.notebooks or []:
+            # Correct stack info is in LinkedNotebook
+            notebook.stack = l_notebook.stack
+            self.storage.notebooks.add_linked_notebook(l_notebook, notebook)
+
+        self._process_chunk(chunk)
+
+        self.storage.notebooks.set_linked_notebook_usn(
+            require(l_notebook.guid), require(chunk.chunkHighUSN)
+        )
+
     def _process_chunk(self, chunk: SyncChunk) -> None:
+        self._raise_on_cancel()
+
         self._expunge(
             expunged_notebooks=chunk.expungedNotebooks,
             expunged_notes=chunk.expungedNotes,
             expunged_linked_notebooks=chunk.expungedLinkedNotebooks,
+            expunged_tags=chunk.expungedTags,
         )
 
         if chunk.notebooks:
@@ -413,9 +1709,14 @@ class NoteSynchronizer:
 
             self._count_updated_notebooks += len(chunk.notebooks)
 
+        if chunk.tags:
+            self.storage.tags.add_tags(chunk.tags)
+
         if chunk.notes:
             self.storage.notes.add_notes_for_sync(chunk.notes)
 
+        self._apply_ready_tasks_chunks()
+
     def _expunge(
         self,
         expunged_notebooks: list[str] | None = None,
@@ -423,6 +1724,7 @@ class NoteSynchronizer:
         expunged_linked_notebooks: list[str] | None = None,
         expunged_tasks: list[str] | None = None,
         expunged_reminders: list[str] | None = None,
+        expunged_tags: list[str] | None = None,
     ) -> None:
         if expunged_notebooks:
             self.storage.notebooks.expunge_notebooks(expunged_notebooks)
@@ -434,6 +1736,9 @@ class NoteSynchronizer:
 
             self._count_expunged_notes += len(expunged_notes)
 
+        if expunged_tags:
+            self.storage.tags.expunge_tags(expunged_tags)
+
         if expunged_tasks:
             self.storage.tasks.expunge_tasks(expunged_tasks)
 
@@ -478,100 +1783,367 @@ class NoteSynchronizer:
 
         self.storage.notebooks.expunge_notebooks((notebook_guid,))
 
-    def _download_scheduled_notes(self, notes_to_sync: tuple[NoteForSync, ...]) -> None:
-        logger.info(f"Downloading {len(notes_to_sync)} note(s)...")
+    def _download_scheduled_notes(
+        self, note_batches: Iterable[Sequence[NoteForSync]], notes_count: int
+    ) -> None:
+        """Download notes batch by batch.
+
+        Progress bar length grows if batches bring more notes than expected,
+        so batches may be produced while downloading.
+        """
         logger.debug(f"Sync worker threads: {self.max_download_workers}")
 
-        with ThreadPoolExecutor(max_workers=self.max_download_workers) as executor:
-            with progressbar(
-                length=len(notes_to_sync),
+        self.tag_cache.update(self.storage.tags.get_tag_names())
+
+        if isinstance(self.note_worker, NoteAsyncWorker):
+            logger.debug("Sync worker event loop enabled")
+            asyncio.run(
+                self._download_scheduled_notes_async(
+                    self.note_worker, note_batches, notes_count
+                )
+            )
+            return
+
+        worker_pool: AbstractContextManager[Any] = nullcontext()
+        if isinstance(self.note_worker, NoteProcessWorker):
+            logger.debug("Sync worker processes enabled")
+            worker_pool = self.note_worker
+
+        # Worker processes are stopped only after download threads are done
+        with (
+            worker_pool,
+            _thread_pool(self.max_download_workers) as executor,
+        ):
+            with _TrafficProgressBar(
+                length=notes_count,
                 show_pos=True,
-                file=get_progress_output(),
             ) as notes_bar:
-                for notes_to_sync_chunk in chunks(notes_to_sync, THREAD_CHUNK_SIZE):
-                    self._process_download_chunk(
-                        executor, notes_bar, notes_to_sync_chunk
-                    )
+                for notes_chunk in note_batches:
+                    _fit_progressbar(notes_bar, len(notes_chunk))
+
+                    self._process_download_chunk(executor, notes_bar, notes_chunk)
+
+                    self._apply_ready_tasks_chunks()
 
     def _process_download_chunk(
         self,
         executor: Any,
         notes_bar: Any,
-        notes_chunk: Iterable[NoteForSync],
+        notes_chunk: Sequence[NoteForSync],
     ) -> None:
+        self._authorize_linked_notebooks_for_notes(notes_chunk)
+        self._prepare_shared_notes_auth(notes_chunk)
+        self._load_resource_hashes(notes_chunk)
+
         note_futures = {
             executor.submit(
                 self.note_worker,
                 n.guid,
                 self._auth_for_note(n),
-            ): n.title
+                self.resource_hashes.get(n.guid, frozenset()),
+                self._get_note_placement(n),
+            ): n
             for n in notes_chunk
         }
 
+        store_note: Callable[[Any], None] = self._store_downloaded_note
+        if isinstance(self.note_worker, NoteProcessWorker):
+            store_note = self._store_downloaded_raw_note
+
+        self._process_note_futures(
+            self.note_worker, notes_bar, note_futures, store_note
+        )
+
+    async def _download_scheduled_notes_async(
+        self,
+        worker: NoteAsyncWorker,
+        note_batches: Iterable[Sequence[NoteForSync]],
+        notes_count: int,
+    ) -> None:
+        download_slots = asyncio.Semaphore(self.max_download_workers)
+
+        async with worker:
+            with _TrafficProgressBar(
+                length=notes_count,
+                show_pos=True,
+            ) as notes_bar:
+                for notes_chunk in note_batches:
+                    _fit_progressbar(notes_bar, len(notes_chunk))
+
+                    self._authorize_linked_notebooks_for_notes(notes_chunk)
+                    self._prepare_shared_notes_auth(notes_chunk)
+                    self._load_resource_hashes(notes_chunk)
+
+                    note_tasks = {
+                        asyncio.ensure_future(
+                            self._download_note_async(worker, download_slots, n)
+                        ): n
+                        for n in notes_chunk
+                    }
+
+                    await self._process_note_tasks(worker, notes_bar, note_tasks)
+
+                    self._apply_ready_tasks_chunks()
+
+    async def _download_note_async(
+        self,
+        worker: NoteAsyncWorker,
+        download_slots: asyncio.Semaphore,
+        note: NoteForSync,
+    ) -> Note:
+        async with download_slots:
+            return await worker(
+                note.guid,
+                self._auth_for_note(note),
+                self.resource_hashes.get(note.guid, frozenset()),
+                self._get_note_placement(note),
+            )
+
+    def _load_resource_hashes(self, notes_chunk: Sequence[NoteForSync]) -> None:
+        # Stashed versions are decoded only for notes about to be downloaded
+        self.resource_hashes = self.storage.resources.get_resource_hashes_by_guid(
+            n.guid for n in notes_chunk
+        )
+
+    def _get_note_placement(self, note: NoteForSync) -> str | None:
+        # Placement is decided up front, so storing notes needs no lookups.
+        # Single-note shares go under the synthetic local notebook.
+        if note.is_shared and not note.is_linked:
+            return SHARED_WITH_ME_NOTEBOOK_GUID
+        return None
+
+    def _store_downloaded_raw_note(self, downloaded: DownloadedNote) -> None:
+        if downloaded.fetched_tags:
+            self.tag_cache.update(downloaded.fetched_tags)
+            self.storage.tags.add_tag_names(downloaded.fetched_tags)
+
+        raw_note = downloaded.raw_note
+
+        # Stashed resource bodies have to be put back into the note itself
+        if raw_note.guid in self.resource_hashes:
+            self._store_downloaded_note(deserialize_note(raw_note.raw_note))
+            return
+
+        self.storage.notes.add_raw_note(raw_note)
+
+    def _store_downloaded_note(self, note: Note) -> None:
+        if note.guid in self.resource_hashes:
+            restored = self.storage.resources.restore_note_resources(note)
+            logger.debug(f"Reused {restored} stored resource(s) for note [{note.guid}]")
+
+        fetched_tags = self.tag_cache.pop_fetched()
+        if fetched_tags:
+            self.storage.tags.add_tag_names(fetched_tags)
+
+        self.storage.notes.add_note(note)
+
+    def _backfill_scheduled_notes(
+        self, notes_to_backfill: tuple[NoteForSync, ...]
+    ) -> None:
+        logger.info(f"Downloading attachments for {len(notes_to_backfill)} note(s)...")
+        logger.debug(f"Backfill worker threads: {self.max_backfill_workers}")
+
+        backfill_size = 0
+
+        with _thread_pool(self.max_backfill_workers) as executor:
+            with _TrafficProgressBar(
+                length=len(notes_to_backfill),
+                show_pos=True,
+            ) as notes_bar:
+                for notes_chunk in chunks(notes_to_backfill, THREAD_CHUNK_SIZE):
+                    note_futures = {}
+
+                    for n in notes_chunk:
+                        note = self.storage.notes.get_note(n.guid)
+                        if note is None:
+                            notes_bar.update(1)
+                            continue
+
+                        backfill_size += _get_pending_resources_size(note)
+
+                        note_futures[
+                            executor.submit(
+                                self.backfill_worker.backfill_note,
+                                note,
+                                self._auth_for_note(n),
+                            )
+                        ] = n
+
+                        if self._is_backfill_limit_reached(backfill_size):
+                            break
+
+                    self._process_note_futures(
+                        self.backfill_worker,
+                        notes_bar,
+                        note_futures,
+                        self._store_backfilled_note,
+                    )
+
+                    if self._is_backfill_limit_reached(backfill_size):
+                        logger.info(
+                            "Attachments download limit reached,"
+                            " remaining attachments will be downloaded"
+                            " during the next sync."
+                        )
+                        return
+
+    def _is_backfill_limit_reached(self, backfill_size: int) -> bool:
+        return bool(self.max_backfill_size) and backfill_size >= self.max_backfill_size
+
+    def _store_backfilled_note(self, note: Note) -> None:
+        self.storage.notes.add_note(note)
+
+        self._count_backfilled_notes += 1
+
+    def _process_note_futures(
+        self,
+        worker: NoteClientWorker | NoteProcessWorker,
+        notes_bar: Any,
+        note_futures: dict[Future, NoteForSync],
+        store_note: Callable[[Any], None],
+    ) -> None:
         try:
             for note_f in as_completed(note_futures):
+                self._raise_on_cancel()
+
                 f_exc = note_f.exception()
                 if f_exc is not None:
-                    if isinstance(f_exc, NoteDownloadException):
-                        logger.error(f_exc)
-                        logger.warning(
-                            f"Note '{note_futures[note_f]}' will be skipped for this run"
-                            " and retried during the next sync."
-                        )
-                        notes_bar.update(1)
-                        continue
-                    elif isinstance(f_exc, EDAMSystemException):
-                        # Only for rate limit error
-                        raise f_exc
-                    else:
-                        logger.critical(
-                            f"Unknown exception caught while downloading note"
-                            f" '{note_futures[note_f]}'!"
-                        )
-
-                        raise f_exc
+                    self._skip_failed_note(f_exc, note_futures[note_f], notes_bar)
+                    continue
 
                 note = note_f.result(timeout=120)
 
-                # Place single-note shares under the synthetic local notebook.
-                if self.storage.shared_notes.is_shared_note(note.guid):
-                    if not self.storage.notes.is_note_in_linked_notebook(note.guid):
-                        note.notebookGuid = SHARED_WITH_ME_NOTEBOOK_GUID
+                store_note(note)
 
-                self.storage.notes.add_note(note)
-
-                self.note_worker.memory_manager.sub_note_size(note)
+                worker.release(note)
 
                 notes_bar.update(1, note)
 
         except (KeyboardInterrupt, Exception):
             logger.warning("Aborting, please wait...")
 
-            self.note_worker.stop = True
-            self.note_worker.memory_manager.reset_memory()
+            worker.stop = True
+            worker.memory_manager.reset_memory()
+            self.rate_limit_gate.cancel()
+            self.retry_policy.cancel()
 
             wait(note_futures, timeout=30, return_when=FIRST_EXCEPTION)
 
             raise
 
-    def _sync_chunks_v2_tasks(self) -> None:
-        last_connection_tasks = int(
-            self.storage.config.get_config_value("last_connection_tasks")
-        )
+    async def _process_note_tasks(
+        self,
+        worker: NoteAsyncWorker,
+        notes_bar: Any,
+        note_tasks: dict[asyncio.Future, NoteForSync],
+    ) -> None:
+        pending = set(note_tasks)
 
-        chunk_iter = self.note_client.iter_sync_chunks_v2(
-            last_connection_tasks,
-            entity_filter=[EvernoteEntityType.TASK, EvernoteEntityType.REMINDER],
-        )
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                self._raise_on_cancel()
+
+                for note_task in done:
+                    t_exc = note_task.exception()
+                    if t_exc is not None:
+                        self._skip_failed_note(t_exc, note_tasks[note_task], notes_bar)
+                        continue
+
+                    note = note_task.result()
+
+                    self._store_downloaded_note(note)
+
+                    await worker.release(note)
+
+                    notes_bar.update(1, note)
+
+        except (KeyboardInterrupt, asyncio.CancelledError, Exception):
+            logger.warning("Aborting, please wait...")
+
+            worker.stop = True
+            worker.memory_manager.reset_memory()
+            self.rate_limit_gate.cancel()
+            self.retry_policy.cancel()
+
+            for note_task in pending:
+                note_task.cancel()
+
+            await asyncio.wait(note_tasks, timeout=30)
 
-        with progressbar(
-            chunk_iter, show_pos=True, file=get_progress_output()
+            # Mark errors of stopped downloads as seen to keep the log clean
+            for note_task in note_tasks:
+                if note_task.done() and not note_task.cancelled():
+                    note_task.exception()
+
+            raise
+
+    def _skip_failed_note(
+        self, exc: BaseException, note: NoteForSync, notes_bar: Any
+    ) -> None:
+        if isinstance(exc, NoteDownloadException):
+            next_attempt = self.storage.download_failures.add_failure(
+                note.guid, str(exc)
+            )
+            next_attempt_txt = datetime.fromtimestamp(next_attempt, timezone.utc)
+
+            logger.error(exc)
+            logger.warning(
+                f"Note '{note.title}' will be skipped until"
+                f" {next_attempt_txt.astimezone():%Y-%m-%d %H:%M:%S}."
+            )
+            notes_bar.update(1)
+            return
+
+        if not isinstance(exc, (EDAMSystemException, WorkerStopException)):
+            logger.critical(
+                f"Unknown exception caught while downloading note '{note.title}'!"
+            )
+
+        # EDAMSystemException is only raised for rate limit error,
+        # WorkerStopException when shared download slots are cancelled
+        raise exc
+
+    def _sync_chunks_v2_tasks(self) -> None:
+        tasks_reader = require(self.tasks_reader)
+
+        with _TrafficProgressBar(
+            tasks_reader.pop_all(),
+            show_pos=True,
         ) as chunks_bar:
             for chunk in chunks_bar:
-                self._process_chunk_v2(chunk)
-                self.storage.config.set_config_value(
-                    "last_connection_tasks", str(chunk.last_timestamp + 1)
-                )
+                self._apply_tasks_chunk(chunk)
+
+    def _set_auth_token(self, bundle: OAuth2TokenBundle) -> None:
+        """Hand refreshed tokens to clients, runs on the token refresh thread."""
+        token = bundle.monolith_token
+
+        self.note_client.set_token(token, bundle.access_token)
+        self.note_worker.token = token
+        self.backfill_worker.token = token
+
+        # Public linked notebooks are accessed with the old user token
+        for ln_guid, auth in list(self.linked_notebooks_auth.items()):
+            if not auth.expiration:
+                self.linked_notebooks_auth.pop(ln_guid, None)
+
+    def _apply_ready_tasks_chunks(self) -> None:
+        """Store tasks read so far, so the stream never waits for a full buffer.
+
+        Called for every applied note chunk and download batch.
+        """
+        if self.tasks_reader is None:
+            return
+
+        for chunk in self.tasks_reader.pop_ready():
+            self._apply_tasks_chunk(chunk)
+
+    def _apply_tasks_chunk(self, chunk: SyncChunkV2) -> None:
+        self._process_chunk_v2(chunk)
+        self.tasks_checkpoint.update(chunk)
 
     def _sync_chunks_v2_shared_notes(self) -> None:
         self.storage.notebooks.ensure_shared_with_me_notebook()
@@ -585,17 +2157,29 @@ class NoteSynchronizer:
             entity_filter=[EvernoteEntityType.NOTE],
         )
 
-        with progressbar(
-            chunk_iter, show_pos=True, file=get_progress_output()
+        checkpoint = SyncCheckpoint(
+            self.storage.config,
+            "last_connection_shared_notes",
+            self.v2_checkpoint_chunks,
+        )
+
+        with _TrafficProgressBar(
+            chunk_iter,
+            show_pos=True,
         ) as chunks_bar:
-            for chunk in chunks_bar:
-                self._process_shared_notes_chunk_v2(chunk)
-                self.storage.config.set_config_value(
-                    "last_connection_shared_notes",
-                    str(chunk.last_timestamp + 1),
-                )
+            try:
+                for chunk in chunks_bar:
+                    self._raise_on_cancel()
+                    self._process_shared_notes_chunk_v2(chunk)
+                    checkpoint.update(chunk)
+
+                    self._apply_ready_tasks_chunks()
+            finally:
+                checkpoint.save()
 
     def _process_chunk_v2(self, chunk: SyncChunkV2) -> None:
+        self._raise_on_cancel()
+
         self._expunge(
             expunged_tasks=chunk.expunged_tasks,
             expunged_reminders=chunk.expunged_reminders,
@@ -612,64 +2196,8 @@ class NoteSynchronizer:
             self._count_updated_reminders += len(chunk.reminders)
 
     def _process_shared_notes_chunk_v2(self, chunk: SyncChunkV2) -> None:
-        # New / updated EXPLICIT single-note memberships.
-        for membership in chunk.shared_note_memberships:
-            self.storage.shared_notes.add_shared_note(
-                note_guid=membership.note_guid,
-                shard_id=membership.shard_id,
-                owner_id=membership.owner_id,
-            )
-
-            notebook_guid = SHARED_WITH_ME_NOTEBOOK_GUID
-
-            # If the note already lives in a linked notebook, keep that placement.
-            if self.storage.notes.is_note_in_linked_notebook(membership.note_guid):
-                existing_nb = self.storage.notes.get_note_notebook_guid(
-                    membership.note_guid
-                )
-                if existing_nb:
-                    notebook_guid = existing_nb
-
-            if not self.storage.notes.note_exists(membership.note_guid):
-                # Title is a placeholder until getNote fills in the real metadata.
-                self.storage.notes.add_notes_for_sync(
-                    [
-                        Note(
-                            guid=membership.note_guid,
-                            title="(Shared note)",
-                            notebookGuid=notebook_guid,
-                        )
-                    ]
-                )
-
-            self._count_updated_shared_notes += 1
-
-        # NOTE entity updates: redownload only notes we track as shared.
-        known_shared = self.storage.shared_notes.get_shared_note_guids()
-        to_redownload = [guid for guid in chunk.notes_to_sync if guid in known_shared]
-        if to_redownload:
-            self.storage.notes.mark_notes_for_redownload(to_redownload)
-
-        # NOTE entity expunges for tracked shared notes.
-        expunged_notes = [g for g in chunk.expunged_notes if g in known_shared]
-        if expunged_notes:
-            self.storage.notes.expunge_notes(expunged_notes)
-            self.storage.shared_notes.remove_shared_notes(expunged_notes)
-            self._count_expunged_notes += len(expunged_notes)
-            self._count_expunged_shared_notes += len(expunged_notes)
-
-        # Membership removals: drop share tracking; expunge only if no linked path.
-        for note_guid in chunk.expunged_shared_note_memberships:
-            self.storage.shared_notes.remove_shared_notes([note_guid])
-
-            if self.storage.notes.is_note_in_linked_notebook(note_guid):
-                logger.debug(
-                    f"Shared note [{note_guid}] unshared but still in linked notebook,"
-                    " keeping local copy"
-                )
-                continue
+        expunged_count = self.storage.shared_notes.apply_sync_chunk(chunk)
 
-            if self.storage.notes.note_exists(note_guid):
-                self.storage.notes.expunge_notes([note_guid])
-                self._count_expunged_notes += 1
-                self._count_expunged_shared_notes += 1
+        self._count_updated_shared_notes += len(chunk.shared_note_memberships)
+        self._count_expunged_notes += expunged_count
+        self._count_expunged_shared_notes += expunged_count
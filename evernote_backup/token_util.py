@@ -1,5 +1,7 @@
 import json
 import logging
+import threading
+from collections.abc import Callable
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Any
@@ -17,9 +19,14 @@ from evernote_backup.config_defaults import (
     TOKEN_REFRESH_SKEW,
 )
 from evernote_backup.errors import OAuthTokenRefreshError, ProgramTerminatedError
+from evernote_backup.log_util import keep_log_label
 
 logger = logging.getLogger(__name__)
 
+# Don't refresh in a loop if the server hands out tokens shorter than the skew
+TOKEN_REFRESH_MIN_DELAY = 60.0
+TOKEN_REFRESH_RETRY_DELAY = 60.0
+
 
 @dataclass
 class EvernoteToken:
@@ -203,6 +210,78 @@ class ResolvedAuth:
     jwt_token: str | None
     auth_for_storage: str
     updated: bool
+    bundle: OAuth2TokenBundle | None = None
+
+
+class TokenRefresher:
+    """
+    Refresh OAuth2 tokens in the background before they expire
+
+    Listeners get the new bundle on the refresh thread, so they should only
+    swap tokens in place or use their own database connection. The bundle
+    itself is only used by the refresh thread.
+    """
+
+    def __init__(self, bundle: OAuth2TokenBundle) -> None:
+        self.bundle = bundle
+
+        self._listeners: list[Callable[[OAuth2TokenBundle], None]] = []
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=keep_log_label(self._run), daemon=True)
+
+    def add_listener(self, listener: Callable[[OAuth2TokenBundle], None]) -> None:
+        self._listeners.append(listener)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def get_refresh_delay(self) -> float:
+        """Seconds until either token gets within TOKEN_REFRESH_SKEW of expiring."""
+        expiration = min(self.bundle.access_expiration, self.bundle.monolith_expiration)
+        refresh_time = expiration - TOKEN_REFRESH_SKEW
+
+        delay = (refresh_time - datetime.now(timezone.utc)).total_seconds()
+
+        return max(delay, TOKEN_REFRESH_MIN_DELAY)
+
+    def refresh(self) -> None:
+        bundle = refresh_oauth_token(self.bundle.refresh_token)
+
+        self.bundle = bundle
+
+        # One failed listener must not keep the token from the others
+        for listener in self._listeners:
+            try:
+                listener(bundle)
+            except Exception:
+                logger.exception("Failed to apply refreshed OAuth2 token")
+
+        logger.info("OAuth2 access token refreshed during sync.")
+
+    def _run(self) -> None:
+        delay = self.get_refresh_delay()
+
+        while not self._stop_event.wait(delay):
+            if self.bundle.is_refresh_expired:
+                logger.warning(
+                    "OAuth2 refresh token is expired,"
+                    " access token will not be refreshed anymore during this sync."
+                )
+                return
+
+            try:
+                self.refresh()
+            except OAuthTokenRefreshError as e:
+                logger.warning(
+                    f"{e}, retrying in {TOKEN_REFRESH_RETRY_DELAY:.0f} seconds..."
+                )
+                delay = TOKEN_REFRESH_RETRY_DELAY
+                continue
+
+            delay = self.get_refresh_delay()
 
 
 def decode_jwt(token: str) -> dict[str, Any]:
@@ -243,6 +322,7 @@ def resolve_auth_token(auth_token: str) -> ResolvedAuth:
                 jwt_token=bundle.access_token,
                 auth_for_storage=bundle.to_json(),
                 updated=True,
+                bundle=bundle,
             )
 
         # Legacy monolith token
@@ -291,6 +371,7 @@ def _resolve_oauth_bundle(bundle: OAuth2TokenBundle) -> ResolvedAuth:
         jwt_token=bundle.access_token,
         auth_for_storage=bundle.to_json(),
         updated=is_updated,
+        bundle=bundle,
     )
 
 
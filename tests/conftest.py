@@ -1,3 +1,4 @@
+import copy
 import json
 import sqlite3
 import time
@@ -16,12 +17,19 @@ from evernote.edam.error.ttypes import (
     EDAMSystemException,
     EDAMUserException,
 )
+from evernote.edam.notestore.ttypes import SyncChunk
+from evernote.edam.type.ttypes import Data, Note, Resource
 from evernote.edam.userstore.ttypes import AuthenticationParameters
 from oauthlib.oauth2 import OAuth2Error
 from requests_sse import MessageEvent
 
 import evernote_backup
-from evernote_backup import cli_app, note_storage
+from evernote_backup import (
+    cli_app,
+    evernote_client_retry,
+    note_storage,
+    note_synchronizer,
+)
 from evernote_backup.cli import cli
 from evernote_backup.evernote_client_api_http import RetryableMixin
 from evernote_backup.token_util import EvernoteToken, OAuth2TokenBundle
@@ -35,6 +43,7 @@ class FakeEvernoteValues:
         self.fake_user = "fake_user"
 
         self.fake_tags = []
+        self.fake_expunged_tags = []
         self.fake_notebooks = []
         self.fake_linked_notebooks = []
         self.fake_notes = []
@@ -63,6 +72,7 @@ class FakeEvernoteValues:
 
         self.fake_auth_token = None
         self.fake_linked_notebook_auth_token = None
+        self.fake_linked_notebook_auth_expiration = 4102444800000  # 2100-01-01
         self.fake_twofactor_req = False
         self.fake_twofactor_hint = None
 
@@ -78,6 +88,7 @@ class FakeEvernoteValues:
 
         self.last_maxEntries = None
         self.fake_network_counter = 0
+        self.fake_resource_data_requests = []
 
         self.fake_updates = []
 
@@ -92,6 +103,8 @@ class FakeEvernoteUserStore:
         user_agent: str,
         headers=None,
         cafile=None,
+        http_compression=True,
+        http2=False,
     ):
         self.auth_token = auth_token
 
@@ -182,6 +195,8 @@ class FakeEvernoteNoteStore:
         user_agent: str,
         headers=None,
         cafile=None,
+        http_compression=True,
+        http2=False,
     ):
         self.auth_token = auth_token
         self.shard = store_url[store_url.rfind("/") + 1 :]
@@ -202,6 +217,28 @@ class FakeEvernoteNoteStore:
         withResourcesRecognition,
         withResourcesAlternateData,
     ):
+        note = self._find_note(guid)
+
+        if withResourcesData or not note.resources:
+            return note
+
+        note = copy.deepcopy(note)
+        for resource in note.resources:
+            resource.data.body = None
+
+        return note
+
+    def getResourceData(self, guid):
+        self.fake_values.fake_resource_data_requests.append(guid)
+
+        for note in self.fake_values.fake_notes + self.fake_values.fake_l_notes:
+            for resource in note.resources or []:
+                if resource.guid == guid:
+                    return resource.data.body
+
+        raise EDAMNotFoundException
+
+    def _find_note(self, guid):
         # Foreign shard: linked-notebook notes or single-note shares
         token_shard = EvernoteToken.from_string(self.auth_token).shard
         if token_shard != self.shard:
@@ -222,6 +259,8 @@ class FakeEvernoteNoteStore:
 
         fake_chunk.notebooks = self.fake_values.fake_notebooks
         fake_chunk.notes = self.fake_values.fake_notes
+        fake_chunk.tags = self.fake_values.fake_tags
+        fake_chunk.expungedTags = self.fake_values.fake_expunged_tags
         fake_chunk.expungedNotebooks = self.fake_values.fake_expunged_notebooks
         fake_chunk.expungedLinkedNotebooks = (
             self.fake_values.fake_expunged_linked_notebooks
@@ -246,6 +285,8 @@ class FakeEvernoteNoteStore:
 
         fake_chunk.notebooks = self.fake_values.fake_l_notebooks
         fake_chunk.notes = self.fake_values.fake_l_notes
+        fake_chunk.tags = self.fake_values.fake_l_tags
+        fake_chunk.expungedTags = []
         fake_chunk.expungedNotebooks = self.fake_values.fake_l_expunged_notebooks
         fake_chunk.expungedLinkedNotebooks = []
         fake_chunk.expungedNotes = self.fake_values.fake_l_expunged_notes
@@ -256,12 +297,19 @@ class FakeEvernoteNoteStore:
 
         return fake_chunk
 
+    def getLinkedNotebookSyncState(self, linkedNotebook):
+        if self.fake_values.fake_auth_linked_notebook_error:
+            raise EDAMNotFoundException
+
+        return MagicMock(updateCount=self.fake_values.fake_l_usn)
+
     def listLinkedNotebooks(self):
         return self.fake_values.fake_linked_notebooks
 
     def authenticateToSharedNotebook(self, shareKeyOrGlobalId):
         return MagicMock(
             authenticationToken=self.fake_values.fake_linked_notebook_auth_token,
+            expiration=self.fake_values.fake_linked_notebook_auth_expiration,
         )
 
     def listTagsByNotebook(self, notebookGuid):
@@ -328,6 +376,55 @@ class FakeSyncEventSource(MagicMock):
         return False  # Don't suppress exceptions
 
 
+class FakeAsyncNoteStoreClient(FakeEvernoteNoteStore):
+    def __init__(self, *args, retry_max=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    async def getNote(self, *args):
+        return super().getNote(*args)
+
+    async def getResourceData(self, guid):
+        return super().getResourceData(guid)
+
+    async def close(self):
+        pass
+
+
+class FakeNoteStoreHandler:
+    def __init__(self):
+        self.calls = []
+
+    def getNote(
+        self,
+        authenticationToken,
+        guid,
+        withContent,
+        withResourcesData,
+        withResourcesRecognition,
+        withResourcesAlternateData,
+    ):
+        self.calls.append(("getNote", authenticationToken, guid))
+
+        if guid == "rate-limit":
+            raise EDAMSystemException(
+                errorCode=EDAMErrorCode.RATE_LIMIT_REACHED, rateLimitDuration=10
+            )
+
+        return Note(
+            guid=guid,
+            title="test",
+            resources=[Resource(guid="r1", data=Data(bodyHash=b"h1", size=3))],
+        )
+
+    def getResourceData(self, authenticationToken, guid):
+        self.calls.append(("getResourceData", authenticationToken, guid))
+        return b"abc"
+
+    def getFilteredSyncChunk(self, authenticationToken, afterUSN, maxEntries, filter):
+        self.calls.append(("getFilteredSyncChunk", authenticationToken, afterUSN))
+        return SyncChunk(currentTime=1, chunkHighUSN=afterUSN + 1, updateCount=10)
+
+
 @pytest.fixture
 def mock_evernote_client(mocker):
     fake_values = FakeEvernoteValues()
@@ -352,8 +449,19 @@ def mock_evernote_client(mocker):
         new=FakeNoteStoreClientRetryable,
     )
 
+    mocker.patch(
+        "evernote_backup.evernote_client.AsyncNoteStoreClient",
+        new=FakeAsyncNoteStoreClient,
+    )
+
     mocker.patch("evernote_backup.evernote_client.EventSource", new=FakeSyncEventSource)
 
+    # Keep retry backoff without real waiting
+    mocker.patch.object(note_synchronizer, "NOTE_DOWNLOAD_RETRY_DELAY", 0)
+    mocker.patch.object(note_synchronizer, "NOTE_DOWNLOAD_RETRY_MAX_DELAY", 0)
+    mocker.patch.object(evernote_client_retry, "CIRCUIT_BREAKER_TIMEOUT", 0.01)
+    mocker.patch.object(evernote_client_retry, "CIRCUIT_BREAKER_MAX_TIMEOUT", 0.01)
+
     return fake_values
 
 
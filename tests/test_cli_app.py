@@ -68,8 +68,12 @@ def test_cli_log_file(cli_invoker, tmp_path):
 @pytest.mark.parametrize(
     "is_tty,log_format,expected_error",
     [
-        (False, "%(asctime)s | %(levelname)s | %(message)s", "CRITICAL | test error"),
-        (True, "%(message)s", "CRITICAL: test error"),
+        (
+            False,
+            "%(asctime)s | %(levelname)s | %(log_label)s%(message)s",
+            "CRITICAL | test error",
+        ),
+        (True, "%(log_label)s%(message)s", "CRITICAL: test error"),
     ],
 )
 def test_cli_test_tty(
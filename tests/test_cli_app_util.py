@@ -71,6 +71,11 @@ def test_unscrambler():
     assert result_data == expected
 
 
+def test_iter_chunks():
+    assert list(cli_app_util.iter_chunks(iter(range(5)), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(cli_app_util.iter_chunks(iter([]), 2)) == []
+
+
 def test_parse_guid_valid():
     assert (
         cli_app_util.parse_guid("01234567-89AB-CDEF-0123-456789ABCDEF")
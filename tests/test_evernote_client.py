@@ -1,9 +1,9 @@
 """Unit tests for EvernoteClient / EvernoteClientBase."""
 
 import pytest
-from requests_sse import MessageEvent
+from requests_sse import MessageEvent, ReadyState
 
-from evernote_backup.errors import EvernoteAuthError
+from evernote_backup.errors import EvernoteAuthError, SyncStreamInterruptedError
 from evernote_backup.evernote_client import EvernoteClient, EvernoteClientBase
 from evernote_backup.evernote_types import EvernoteEntityType
 
@@ -81,10 +81,11 @@ def test_client_iter_sync_events_builds_url_and_headers(mocker, mock_evernote_cl
     captured = {}
 
     class FakeES:
-        def __init__(self, url, timeout=None, headers=None):
+        def __init__(self, url, timeout=None, headers=None, **kwargs):
             captured["url"] = url
             captured["headers"] = headers
             captured["timeout"] = timeout
+            captured["max_connect_retry"] = kwargs.get("max_connect_retry")
 
         def __enter__(self):
             return [
@@ -125,6 +126,45 @@ def test_client_iter_sync_events_builds_url_and_headers(mocker, mock_evernote_cl
     assert captured["headers"]["Authorization"] == "Bearer jwt-abc"
     assert captured["headers"]["x-feature-version"] == "4"
     assert captured["timeout"] == 30
+    assert captured["max_connect_retry"] == 0
+
+
+def test_client_iter_sync_events_raises_on_dropped_stream(mocker, mock_evernote_client):
+    class FakeES:
+        def __init__(self, url, on_error=None, **kwargs):
+            self.on_error = on_error
+            self.ready_state = ReadyState.OPEN
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            return False
+
+        def __iter__(self):
+            yield MessageEvent(
+                last_event_id="1",
+                origin="https://api.evernote.com",
+                type="sync",
+                data="[]",
+            )
+
+            # Connection dropped, EventSource is about to reconnect
+            self.ready_state = ReadyState.CONNECTING
+            self.on_error()
+
+    mocker.patch("evernote_backup.evernote_client.EventSource", FakeES)
+
+    client = EvernoteClient(backend="evernote", token=FAKE_TOKEN, jwt_token="jwt")
+
+    events = client.iter_sync_events(
+        last_connection=0, entity_filter=[EvernoteEntityType.TASK]
+    )
+
+    assert next(events).type == "sync"
+
+    with pytest.raises(SyncStreamInterruptedError):
+        next(events)
 
 
 def test_client_note_store_without_token(mock_evernote_client):
@@ -1,7 +1,31 @@
+import gzip
+import zlib
+from http.client import HTTPException
+from io import BytesIO
+
 import pytest
+from evernote.edam.error.ttypes import EDAMErrorCode, EDAMSystemException
+from evernote.edam.notestore.NoteStore import getNote_result
+from evernote.edam.type.ttypes import (
+    Contact,
+    ContactType,
+    Data,
+    Identity,
+    Note,
+    Resource,
+    SharedNote,
+    SharedNotePrivilegeLevel,
+)
+from thrift.protocol.TBinaryProtocol import TBinaryProtocol
+from thrift.transport.TTransport import TMemoryBuffer
 
+from evernote_backup import evernote_client_api_http
 from evernote_backup.evernote_client_api_http import (
+    HTTPConnectionHotfix,
     NoteStoreClientRetryable,
+    TBinaryProtocolAcceleratedHotfix,
+    THttpClientHotfix,
+    TransferStats,
     UserStoreClientRetryable,
 )
 from evernote_backup.evernote_client_util_ssl import get_cafile_path
@@ -22,6 +46,7 @@ def test_user_store_client_init():
     expected_headers = {
         "User-Agent": "test-agent",
         "accept": "application/x-thrift",
+        "accept-encoding": "gzip, deflate",
         "cache-control": "no-cache",
         "test-header": "test-header-value",
         "x-feature-version": "3",
@@ -58,6 +83,7 @@ def test_note_store_client_init():
     expected_headers = {
         "User-Agent": "test-agent",
         "accept": "application/x-thrift",
+        "accept-encoding": "gzip, deflate",
         "cache-control": "no-cache",
         "test-header": "test-header-value",
         "x-feature-version": "3",
@@ -81,7 +107,7 @@ def test_note_store_client_init():
 
 def test_note_store_client_bad_init(mocker):
     mock_tbin = mocker.patch(
-        "evernote_backup.evernote_client_api_http.TBinaryProtocolHotfix"
+        "evernote_backup.evernote_client_api_http.TBinaryProtocolAcceleratedHotfix"
     )
     mock_tbin.side_effect = RuntimeError("test")
 
@@ -110,3 +136,232 @@ def test_note_store_client_init_system_ca(mocker):
     )
 
     assert client._base_client.protocol.trans.context is None
+
+
+def _encode_message(result):
+    buf = TMemoryBuffer()
+    result.write(TBinaryProtocol(buf))
+    return buf.getvalue()
+
+
+def _decode_message(message):
+    result = getNote_result()
+    result.read(TBinaryProtocolAcceleratedHotfix(TMemoryBuffer(message)))
+    return result
+
+
+def test_accelerated_protocol_keeps_enums():
+    test_note = Note(
+        guid="id1",
+        title="test",
+        sharedNotes=[
+            SharedNote(
+                sharerUserID=1,
+                privilege=SharedNotePrivilegeLevel.FULL_ACCESS,
+                recipientIdentity=Identity(
+                    id=2, contact=Contact(type=ContactType.EMAIL)
+                ),
+            )
+        ],
+    )
+
+    result = _decode_message(_encode_message(getNote_result(success=test_note)))
+
+    shared_note = result.success.sharedNotes[0]
+
+    assert result.success == test_note
+    assert shared_note.privilege is SharedNotePrivilegeLevel.FULL_ACCESS
+    assert shared_note.recipientIdentity.contact.type is ContactType.EMAIL
+
+
+def test_accelerated_protocol_exception():
+    test_exception = EDAMSystemException(
+        errorCode=EDAMErrorCode.RATE_LIMIT_REACHED, rateLimitDuration=10
+    )
+
+    result = _decode_message(
+        _encode_message(getNote_result(systemException=test_exception))
+    )
+
+    assert result.systemException.errorCode is EDAMErrorCode.RATE_LIMIT_REACHED
+    assert result.systemException.rateLimitDuration == 10
+
+
+def test_accelerated_protocol_bad_string():
+    message = _encode_message(getNote_result(success=Note(guid="id1", title="ab")))
+
+    result = _decode_message(message.replace(b"ab", b"a\xff"))
+
+    assert result.success.title == "a\ufffd"
+
+
+def test_accelerated_protocol_fallback(mocker):
+    mock_fastbinary = mocker.patch(
+        "evernote_backup.evernote_client_api_http.fastbinary"
+    )
+    mock_fastbinary.decode_binary.side_effect = ValueError("test")
+
+    test_note = Note(guid="id1", title="test")
+
+    result = _decode_message(_encode_message(getNote_result(success=test_note)))
+
+    assert result.success == test_note
+    mock_fastbinary.decode_binary.assert_called_once()
+
+
+class FakeHttpResponse(BytesIO):
+    def __init__(self, body, headers=None):
+        super().__init__(body)
+        self.headers = headers or {}
+
+    def getheader(self, name):
+        return self.headers.get(name)
+
+
+def _flush_response(mocker, response):
+    mocker.patch("thrift.transport.THttpClient.THttpClient.flush")
+
+    client = THttpClientHotfix("https://test.com")
+    client._THttpClient__http_response = response
+    client.flush()
+
+    return client
+
+
+def test_http_client_streams_response(mocker):
+    mocker.patch.object(evernote_client_api_http, "RESPONSE_READ_SIZE", 4)
+
+    client = _flush_response(mocker, FakeHttpResponse(b"test_response_data"))
+
+    assert client.cstringio_buf.getvalue() == b"test"
+    assert client.read(10) == b"test"
+    assert client.read(2) == b"_r"
+
+    refill_buf = client.cstringio_refill(b"es", 8)
+
+    assert refill_buf is client.cstringio_buf
+    assert client.read(10) == b"esponse_"
+    assert client.readAll(4) == b"data"
+    with pytest.raises(EOFError):
+        client.cstringio_refill(b"", 1)
+
+
+@pytest.mark.parametrize(
+    ("content_encoding", "compress"),
+    [
+        ("gzip", gzip.compress),
+        ("deflate", zlib.compress),
+    ],
+)
+def test_http_client_compressed_response(mocker, content_encoding, compress):
+    mocker.patch.object(evernote_client_api_http, "RESPONSE_READ_SIZE", 10)
+    test_stats = mocker.patch.object(
+        evernote_client_api_http, "transfer_stats", TransferStats()
+    )
+
+    test_body = b"test_response" * 100
+    compressed_body = compress(test_body)
+
+    client = _flush_response(
+        mocker,
+        FakeHttpResponse(compressed_body, {"Content-Encoding": content_encoding}),
+    )
+
+    assert 0 < len(client.cstringio_buf.getvalue()) <= 10
+    assert client.readAll(len(test_body)) == test_body
+    assert client.read(1) == b""
+    assert test_stats.received == len(compressed_body)
+    assert test_stats.decoded == len(test_body)
+
+
+@pytest.mark.parametrize("content_encoding", [None, "gzip"])
+def test_http_client_traffic_shaping(mocker, content_encoding):
+    mocker.patch.object(evernote_client_api_http, "RESPONSE_READ_SIZE", 10)
+    test_shaper = mocker.patch.object(evernote_client_api_http, "traffic_shaper")
+
+    test_body = b"test_response" * 100
+    response_body = gzip.compress(test_body) if content_encoding else test_body
+
+    client = _flush_response(
+        mocker,
+        FakeHttpResponse(response_body, {"Content-Encoding": content_encoding}),
+    )
+
+    assert client.readAll(len(test_body)) == test_body
+    assert client.read(1) == b""
+
+    test_shaper.wait_for_request.assert_called_once_with()
+    assert sum(c.args[0] for c in test_shaper.wait_for_received.call_args_list) == len(
+        response_body
+    )
+
+
+@pytest.mark.parametrize("content_encoding", [None, "gzip"])
+def test_http_client_decodes_large_note(mocker, content_encoding):
+    test_note = Note(
+        guid="id1",
+        title="test",
+        resources=[
+            Resource(guid="r1", data=Data(body=bytes(range(256)) * 4096)),
+        ],
+    )
+    message = _encode_message(getNote_result(success=test_note))
+    if content_encoding:
+        message = gzip.compress(message)
+
+    client = _flush_response(
+        mocker,
+        FakeHttpResponse(message, {"Content-Encoding": content_encoding}),
+    )
+    refill_spy = mocker.spy(client, "cstringio_refill")
+    protocol = TBinaryProtocolAcceleratedHotfix(client)
+
+    result = getNote_result()
+    result.read(protocol)
+    protocol.readMessageEnd()
+
+    assert result.success == test_note
+    # Large binary field is read in one go, not through the read-ahead window
+    assert 256 * 4096 in {c.args[1] for c in refill_spy.call_args_list}
+    assert client.cstringio_buf.getvalue() == b""
+
+
+def test_accelerated_protocol_no_fallback_when_streamed(mocker):
+    mocker.patch.object(evernote_client_api_http, "RESPONSE_READ_SIZE", 10)
+    mock_fastbinary = mocker.patch(
+        "evernote_backup.evernote_client_api_http.fastbinary"
+    )
+
+    def fake_decode(obj, iprot, spec):
+        iprot.trans.cstringio_refill(b"", 2)
+        raise ValueError("test")
+
+    mock_fastbinary.decode_binary.side_effect = fake_decode
+
+    message = _encode_message(getNote_result(success=Note(guid="id1", title="t")))
+    client = _flush_response(mocker, FakeHttpResponse(message))
+
+    with pytest.raises(ValueError, match="test"):
+        getNote_result().read(TBinaryProtocolAcceleratedHotfix(client))
+
+
+def test_http_client_unknown_encoding(mocker):
+    with pytest.raises(HTTPException, match="br"):
+        _flush_response(mocker, FakeHttpResponse(b"test", {"Content-Encoding": "br"}))
+
+
+def test_http_compression_disabled():
+    client = NoteStoreClientRetryable(
+        auth_token="test-token",
+        store_url="https://test.com",
+        http_compression=False,
+    )
+
+    assert client._base_client._default_headers["accept-encoding"] == "identity"
+
+
+def test_http_connection_no_default_accept_encoding():
+    connection = HTTPConnectionHotfix("test.com")
+    connection.putrequest("POST", "/")
+
+    assert b"Accept-Encoding" not in b"".join(connection._buffer)
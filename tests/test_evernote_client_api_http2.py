@@ -0,0 +1,225 @@
+import gzip
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPException
+
+import h2.config
+import h2.connection
+import h2.events
+import pytest
+from evernote.edam.notestore import NoteStore
+from thrift.protocol.TBinaryProtocol import TBinaryProtocol
+from thrift.transport.TTransport import TMemoryBuffer
+
+from evernote_backup.evernote_client_api_http import (
+    NoteStoreClientRetryable,
+    close_http2_connections,
+)
+from tests.conftest import FakeNoteStoreHandler
+
+
+class FakeHttp2Server:
+    """Minimal HTTP/2 server (prior knowledge, no TLS) in front of a NoteStore."""
+
+    def __init__(self, handler, status=200, gzip=False, close_after=None):
+        self.processor = NoteStore.Processor(handler)
+        self.status = status
+        self.gzip = gzip
+        self.close_after = close_after
+        self.connections = 0
+        self.requests = []
+
+        self._sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self._sock.getsockname()[1]
+
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def close(self):
+        self._sock.close()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self._sock.accept()
+            except OSError:
+                return
+
+            self.connections += 1
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def _serve(self, sock):
+        conn = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=False, header_encoding="utf-8")
+        )
+        conn.initiate_connection()
+        sock.sendall(conn.data_to_send())
+
+        headers = {}
+        bodies = {}
+        pending = {}
+        served = 0
+
+        with sock:
+            while data := sock.recv(65535):
+                for event in conn.receive_data(data):
+                    if isinstance(event, h2.events.RequestReceived):
+                        headers[event.stream_id] = dict(event.headers)
+                        bodies[event.stream_id] = b""
+                    elif isinstance(event, h2.events.DataReceived):
+                        bodies[event.stream_id] += event.data
+                        conn.acknowledge_received_data(
+                            event.flow_controlled_length, event.stream_id
+                        )
+                    elif isinstance(event, h2.events.StreamEnded):
+                        pending[event.stream_id] = self._respond(
+                            conn,
+                            event.stream_id,
+                            headers.pop(event.stream_id),
+                            bodies.pop(event.stream_id),
+                        )
+
+                for stream_id, response in list(pending.items()):
+                    pending[stream_id] = self._send_data(conn, stream_id, response)
+                    if pending[stream_id] is None:
+                        del pending[stream_id]
+                        served += 1
+
+                sock.sendall(conn.data_to_send())
+
+                if self.close_after and served >= self.close_after:
+                    return
+
+    def _respond(self, conn, stream_id, headers, body):
+        self.requests.append(headers)
+
+        out_buf = TMemoryBuffer()
+        self.processor.process(
+            TBinaryProtocol(TMemoryBuffer(body)), TBinaryProtocol(out_buf)
+        )
+        response = out_buf.getvalue()
+
+        response_headers = [
+            (":status", str(self.status)),
+            ("content-type", "application/x-thrift"),
+        ]
+
+        if self.gzip and "gzip" in headers.get("accept-encoding", ""):
+            response = gzip.compress(response)
+            response_headers.append(("content-encoding", "gzip"))
+
+        conn.send_headers(stream_id, response_headers)
+
+        return response
+
+    def _send_data(self, conn, stream_id, response):
+        while response:
+            window = min(
+                conn.local_flow_control_window(stream_id),
+                conn.max_outbound_frame_size,
+            )
+            if window <= 0:
+                return response
+
+            conn.send_data(stream_id, response[:window])
+            response = response[window:]
+
+        conn.end_stream(stream_id)
+        return None
+
+
+class FakeLargeNoteHandler(FakeNoteStoreHandler):
+    def getNote(self, authenticationToken, guid, *args):
+        note = super().getNote(authenticationToken, guid, *args)
+        note.resources[0].data.body = bytes(range(256)) * 12 * 1024
+        return note
+
+
+@pytest.fixture
+def fake_server_factory():
+    servers = []
+
+    def factory(*args, **kwargs):
+        server = FakeHttp2Server(*args, **kwargs)
+        servers.append(server)
+        return server
+
+    yield factory
+
+    close_http2_connections()
+    for server in servers:
+        server.close()
+
+
+def get_client(server):
+    return NoteStoreClientRetryable(
+        auth_token="test-token",
+        store_url=f"http://127.0.0.1:{server.port}/edam/note/s1",
+        user_agent="test-agent",
+        http2=True,
+        retry_max=1,
+        retry_delay=0,
+    )
+
+
+def test_http2_get_note(fake_server_factory):
+    handler = FakeNoteStoreHandler()
+    server = fake_server_factory(handler)
+
+    note = get_client(server).getNote("id1", True, True, False, False)
+
+    headers = server.requests[0]
+
+    assert note.guid == "id1"
+    assert handler.calls == [("getNote", "test-token", "id1")]
+    assert headers[":method"] == "POST"
+    assert headers[":path"] == "/edam/note/s1"
+    assert headers["content-type"] == "application/x-thrift"
+    assert headers["accept-encoding"] == "gzip, deflate"
+    assert headers["user-agent"] == "test-agent"
+
+
+def test_http2_multiplexes_threads(fake_server_factory):
+    server = fake_server_factory(FakeNoteStoreHandler())
+
+    def get_note(note_id):
+        return get_client(server).getNote(note_id, True, True, False, False)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        notes = list(executor.map(get_note, [f"id{i}" for i in range(40)]))
+
+    assert [n.guid for n in notes] == [f"id{i}" for i in range(40)]
+    assert server.connections == 1
+    assert len(server.requests) == 40
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_http2_large_response(fake_server_factory, compressed):
+    server = fake_server_factory(FakeLargeNoteHandler(), gzip=compressed)
+    client = get_client(server)
+
+    notes = [client.getNote(f"id{i}", True, True, False, False) for i in range(3)]
+
+    for note in notes:
+        assert note.resources[0].data.body == bytes(range(256)) * 12 * 1024
+    assert server.connections == 1
+
+
+def test_http2_http_error(fake_server_factory):
+    handler = FakeNoteStoreHandler()
+    server = fake_server_factory(handler, status=503)
+
+    with pytest.raises(HTTPException, match="503"):
+        get_client(server).getNote("id1", True, True, False, False)
+
+    assert len(handler.calls) == 2
+
+
+def test_http2_reconnects(fake_server_factory):
+    server = fake_server_factory(FakeNoteStoreHandler(), close_after=1)
+    client = get_client(server)
+
+    notes = [client.getNote(f"id{i}", True, True, False, False) for i in range(3)]
+
+    assert [n.guid for n in notes] == ["id0", "id1", "id2"]
+    assert server.connections == 3
@@ -0,0 +1,181 @@
+import asyncio
+import datetime as dt
+
+import pytest
+
+from evernote_backup.evernote_client_api_traffic import (
+    TokenBucket,
+    TrafficRule,
+    TrafficShaper,
+    get_active_limit,
+    parse_traffic_rule,
+)
+
+
+def test_parse_traffic_rule():
+    assert parse_traffic_rule("300") == TrafficRule(300)
+    assert parse_traffic_rule("1.5@09:00-18:30") == TrafficRule(
+        1.5, dt.time(9, 0), dt.time(18, 30)
+    )
+
+
+@pytest.mark.parametrize(
+    "value",
+    ["abc", "-1", "10@09:00", "10@9-18", "10@09:00-25:00"],
+)
+def test_parse_traffic_rule_invalid(value):
+    with pytest.raises(ValueError):
+        parse_traffic_rule(value)
+
+
+def test_get_active_limit():
+    rules = [
+        TrafficRule(100),
+        TrafficRule(10, dt.time(9, 0), dt.time(18, 0)),
+        TrafficRule(1000, dt.time(22, 0), dt.time(6, 0)),
+    ]
+
+    assert get_active_limit(rules, dt.time(12, 0)) == 10
+    assert get_active_limit(rules, dt.time(18, 0)) == 100
+    assert get_active_limit(rules, dt.time(23, 0)) == 1000
+    assert get_active_limit(rules, dt.time(3, 0)) == 1000
+    assert get_active_limit(rules[1:], dt.time(20, 0)) == 0
+    assert get_active_limit([], dt.time(12, 0)) == 0
+
+
+def test_token_bucket_no_limit():
+    bucket = TokenBucket()
+
+    assert all(bucket.reserve(1000) == 0 for _ in range(100))
+
+
+def test_token_bucket_burst_then_rate(mocker):
+    mock_time = mocker.patch(
+        "evernote_backup.evernote_client_api_traffic.time.monotonic"
+    )
+    mock_time.return_value = 100.0
+
+    bucket = TokenBucket(rate=10)
+
+    assert [bucket.reserve(1) for _ in range(10)] == [0] * 10
+    assert bucket.reserve(1) == pytest.approx(0.1)
+    assert bucket.reserve(1) == pytest.approx(0.2)
+
+    mock_time.return_value = 101.0
+
+    assert bucket.reserve(1) == 0
+
+
+def test_token_bucket_large_reservation(mocker):
+    mock_time = mocker.patch(
+        "evernote_backup.evernote_client_api_traffic.time.monotonic"
+    )
+    mock_time.return_value = 100.0
+
+    bucket = TokenBucket(rate=1000)
+
+    assert bucket.reserve(3000) == pytest.approx(2.0)
+
+
+def test_traffic_shaper_time_of_day():
+    now = dt.datetime(2024, 1, 1, 12, 0, tzinfo=dt.timezone.utc)
+
+    shaper = TrafficShaper(clock=lambda: now)
+    shaper.configure(
+        request_rules=[TrafficRule(600), TrafficRule(60, dt.time(9), dt.time(18))],
+        bandwidth_rules=[TrafficRule(2)],
+    )
+
+    assert shaper.describe() == "[60 req/min, 2 MB/s]"
+    assert shaper._requests.rate == 1
+    assert shaper._bandwidth.rate == 2 * 1024 * 1024
+
+    now = dt.datetime(2024, 1, 1, 20, 0, tzinfo=dt.timezone.utc)
+
+    assert shaper.describe() == "[600 req/min, 2 MB/s]"
+    assert shaper._requests.rate == 10
+
+
+def test_traffic_shaper_change_listener():
+    now = dt.datetime(2024, 1, 1, 12, 0, tzinfo=dt.timezone.utc)
+
+    shaper = TrafficShaper(clock=lambda: now)
+    shaper.configure(
+        request_rules=[TrafficRule(600), TrafficRule(60, dt.time(9), dt.time(18))]
+    )
+
+    descriptions = []
+    shaper.add_listener(descriptions.append)
+
+    shaper.wait_for_request()
+    now = dt.datetime(2024, 1, 1, 20, 0, tzinfo=dt.timezone.utc)
+    shaper.wait_for_request()
+
+    shaper.remove_listener(descriptions.append)
+    now = dt.datetime(2024, 1, 1, 12, 0, tzinfo=dt.timezone.utc)
+    shaper.wait_for_request()
+
+    assert descriptions == ["[600 req/min]"]
+
+
+def test_traffic_shaper_share():
+    shaper = TrafficShaper()
+    shaper.configure(request_rules=[TrafficRule(600)], share=0.5)
+
+    assert shaper.describe() == "[600 req/min]"
+    assert shaper._requests.rate == 5
+
+
+def test_traffic_shaper_child_processes():
+    shaper = TrafficShaper()
+    shaper.configure(request_rules=[TrafficRule(600)])
+
+    # Parent process keeps a part equal to each child's
+    assert shaper.add_child_processes(4) == 0.2
+    assert shaper._requests.rate == pytest.approx(2)
+
+    shaper.remove_child_processes(4)
+
+    assert shaper._requests.rate == 10
+
+
+def test_traffic_shaper_no_limit():
+    shaper = TrafficShaper()
+    shaper.configure()
+
+    shaper.wait_for_request()
+    shaper.wait_for_received(1024 * 1024 * 1024)
+
+    assert shaper.describe() == ""
+    assert shaper.throttled_seconds == 0
+
+
+def test_traffic_shaper_throttles(mocker):
+    mock_sleep = mocker.patch("evernote_backup.evernote_client_api_traffic.time.sleep")
+
+    shaper = TrafficShaper()
+    shaper.configure(bandwidth_rules=[TrafficRule(1)])
+
+    shaper.wait_for_received(3 * 1024 * 1024)
+
+    mock_sleep.assert_called_once()
+    assert mock_sleep.call_args.args[0] == pytest.approx(2.0, abs=0.1)
+    assert shaper.throttled_seconds == mock_sleep.call_args.args[0]
+
+
+def test_traffic_shaper_throttles_async(mocker):
+    mock_sleep = mocker.patch(
+        "evernote_backup.evernote_client_api_traffic.asyncio.sleep"
+    )
+
+    shaper = TrafficShaper()
+    shaper.configure(request_rules=[TrafficRule(60)])
+
+    async def run():
+        await shaper.wait_for_request_async()
+        await shaper.wait_for_request_async()
+
+    asyncio.run(run())
+
+    mock_sleep.assert_called_once()
+    assert mock_sleep.call_args.args[0] == pytest.approx(1.0, abs=0.1)
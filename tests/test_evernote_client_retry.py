@@ -0,0 +1,157 @@
+import struct
+import threading
+from http.client import HTTPException
+
+import pytest
+from evernote.edam.error.ttypes import (
+    EDAMErrorCode,
+    EDAMNotFoundException,
+    EDAMSystemException,
+    EDAMUserException,
+)
+from thrift.transport.TTransport import TTransportException
+
+from evernote_backup.evernote_client_retry import (
+    CircuitBreaker,
+    ErrorKind,
+    RetryPolicy,
+    classify_error,
+    get_backoff_delay,
+)
+
+
+@pytest.mark.parametrize(
+    ("error", "kind"),
+    [
+        (ConnectionError(), ErrorKind.TRANSIENT),
+        (TimeoutError(), ErrorKind.TRANSIENT),
+        (HTTPException(), ErrorKind.TRANSIENT),
+        (TTransportException(), ErrorKind.TRANSIENT),
+        (EOFError(), ErrorKind.BAD_PAYLOAD),
+        (struct.error(), ErrorKind.BAD_PAYLOAD),
+        (EDAMNotFoundException(), ErrorKind.PERMANENT),
+        (
+            EDAMUserException(errorCode=EDAMErrorCode.PERMISSION_DENIED),
+            ErrorKind.PERMANENT,
+        ),
+        (
+            EDAMSystemException(errorCode=EDAMErrorCode.INTERNAL_ERROR),
+            ErrorKind.PERMANENT,
+        ),
+        (
+            EDAMSystemException(
+                errorCode=EDAMErrorCode.RATE_LIMIT_REACHED, rateLimitDuration=10
+            ),
+            ErrorKind.RATE_LIMIT,
+        ),
+    ],
+)
+def test_classify_error(error, kind):
+    assert classify_error(error) is kind
+
+
+def test_backoff_delay_bounds():
+    delays = [get_backoff_delay(4, 1, 10) for _ in range(100)]
+
+    assert all(1 <= d <= 10 for d in delays)
+    assert len(set(delays)) > 1
+
+
+def test_backoff_delay_cap():
+    assert get_backoff_delay(100, 1, 10) <= 10
+    assert get_backoff_delay(0, 0, 10) == 0
+
+
+def test_retry_policy_budgets():
+    policy = RetryPolicy(
+        budgets={ErrorKind.TRANSIENT: 2, ErrorKind.BAD_PAYLOAD: 1},
+        base_delay=0,
+        max_delay=0,
+    )
+
+    retry = policy.start("s1")
+
+    assert retry.on_error(ConnectionError()) == 0
+    assert retry.on_error(EOFError()) == 0
+    assert retry.on_error(ConnectionError()) == 0
+    assert retry.on_error(EOFError()) is None
+    assert retry.attempts == 4
+
+    assert policy.retry_counts == {ErrorKind.TRANSIENT: 2, ErrorKind.BAD_PAYLOAD: 1}
+    assert policy.failure_counts == {ErrorKind.BAD_PAYLOAD: 1}
+
+
+def test_retry_policy_permanent_not_retried():
+    policy = RetryPolicy(budgets={ErrorKind.TRANSIENT: 2}, base_delay=0, max_delay=0)
+
+    retry = policy.start("s1")
+
+    assert retry.on_error(EDAMNotFoundException()) is None
+    assert policy.failure_counts == {ErrorKind.PERMANENT: 1}
+
+
+def test_retry_policy_breaker_per_shard():
+    policy = RetryPolicy(budgets={}, base_delay=0, max_delay=0)
+
+    assert policy.start("s1").breaker is policy.start("s1").breaker
+    assert policy.start("s1").breaker is not policy.start("s2").breaker
+
+
+def test_circuit_breaker_trips(mocker):
+    mock_time = mocker.patch("evernote_backup.evernote_client_retry.time.monotonic")
+    mock_time.return_value = 100.0
+
+    breaker = CircuitBreaker("s1", threshold=3, timeout=5, max_timeout=8)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.is_open
+
+    breaker.record_failure()
+    assert breaker.is_open
+    assert breaker.trip_count == 1
+
+    # Probe after the timeout fails, breaker opens again for longer
+    mock_time.return_value = 106.0
+    assert not breaker.is_open
+
+    breaker.record_failure()
+    assert breaker.is_open
+    assert breaker._open_until == 114.0
+    assert breaker.trip_count == 2
+
+    mock_time.return_value = 120.0
+    breaker.record_failure()
+    assert breaker._open_until == 128.0
+
+    # Success closes it and resets the timeout
+    mock_time.return_value = 130.0
+    breaker.record_success()
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker._open_until == 135.0
+
+
+def test_circuit_breaker_cancel():
+    breaker = CircuitBreaker("s1", threshold=1, timeout=60, max_timeout=60)
+    breaker.record_failure()
+
+    waiter = threading.Thread(target=breaker.wait)
+    waiter.start()
+
+    breaker.cancel()
+    waiter.join(timeout=5)
+
+    assert not waiter.is_alive()
+
+
+def test_retry_policy_cancel_interrupts_sleep():
+    policy = RetryPolicy(budgets={}, base_delay=0, max_delay=0)
+
+    sleeper = threading.Thread(target=policy.sleep, args=(60,))
+    sleeper.start()
+
+    policy.cancel()
+    sleeper.join(timeout=5)
+
+    assert not sleeper.is_alive()
@@ -1,14 +1,21 @@
 """Unit tests for EvernoteClientSync."""
 
+import json
 import logging
+import threading
 
 import pytest
-from evernote.edam.type.ttypes import LinkedNotebook, Note, Tag
+import requests
+from evernote.edam.type.ttypes import Data, LinkedNotebook, Note, Resource, Tag
 from requests_sse import MessageEvent
 
+from evernote_backup.errors import SyncStreamInterruptedError
 from evernote_backup.evernote_client_sync import (
     EvernoteClientSync,
+    TagNameCache,
     _parse_sync_event_data,
+    get_json_backend,
+    load_json,
 )
 from evernote_backup.evernote_client_util import NoteStoreAccess
 from evernote_backup.evernote_types import (
@@ -90,6 +97,75 @@ def test_get_note_resolves_personal_tags(sync_client, mock_evernote_client):
     assert note.tagNames == ["Work"]
 
 
+def test_get_note_tags_from_shared_cache(mock_evernote_client):
+    mock_evernote_client.fake_user = "testuser"
+    mock_evernote_client.fake_tags = [Tag(guid="tg2", name="Fetched")]
+    mock_evernote_client.fake_notes = [
+        Note(guid="n1", title="t", content="c", tagGuids=["tg1"], active=True),
+        Note(guid="n2", title="t", content="c", tagGuids=["tg2"], active=True),
+    ]
+    tag_cache = TagNameCache()
+    tag_cache.update({"tg1": "Cached"})
+
+    clients = [
+        EvernoteClientSync(
+            backend="evernote",
+            token=FAKE_TOKEN,
+            network_error_retry_count=3,
+            max_chunk_results=50,
+            cafile=None,
+            tag_cache=tag_cache,
+        )
+        for _ in range(2)
+    ]
+
+    assert clients[0].get_note("n1").tagNames == ["Cached"]
+    assert clients[0].get_note("n2").tagNames == ["Fetched"]
+
+    mock_evernote_client.fake_tags = []  # second client should not re-fetch
+    assert clients[1].get_note("n2").tagNames == ["Fetched"]
+
+    assert tag_cache.pop_fetched() == {"tg2": "Fetched"}
+    assert tag_cache.pop_fetched() == {}
+
+
+def test_tag_cache_fetches_outside_lock():
+    tag_cache = TagNameCache()
+    tag_cache.update({"tg1": "Cached"})
+
+    fetch_started = threading.Event()
+    fetch_release = threading.Event()
+    fetch_calls = []
+
+    def slow_fetch():
+        fetch_calls.append("nb1")
+        fetch_started.set()
+        fetch_release.wait(timeout=5)
+        return {"tg2": "Slow"}
+
+    results = []
+
+    def resolve_slow():
+        results.append(tag_cache.resolve(["tg2"], slow_fetch, "nb1"))
+
+    fetchers = [threading.Thread(target=resolve_slow) for _ in range(2)]
+    fetchers[0].start()
+    fetch_started.wait(timeout=5)
+    fetchers[1].start()
+
+    # Cached tags and other notebooks don't wait for the slow fetch
+    assert tag_cache.lookup(["tg1"]) == ["Cached"]
+    assert tag_cache.resolve(["tg3"], lambda: {"tg3": "Other"}, "nb2") == ["Other"]
+
+    fetch_release.set()
+    for fetcher in fetchers:
+        fetcher.join(timeout=5)
+
+    assert results == [["Slow"], ["Slow"]]
+    assert fetch_calls == ["nb1"]
+    assert tag_cache.pop_fetched() == {"tg2": "Slow", "tg3": "Other"}
+
+
 def test_get_note_linked_mode_resolves_notebook_tags(sync_client, mock_evernote_client):
     mock_evernote_client.fake_l_tags = [
         Tag(guid="tg1", name="SharedTag"),
@@ -164,6 +240,28 @@ def test_get_note_single_share_skips_tag_resolution(
     list_nb_tags.assert_not_called()
 
 
+def test_get_note_downloads_only_new_resources(sync_client, mock_evernote_client):
+    mock_evernote_client.fake_notes = [
+        Note(
+            guid="n1",
+            title="t",
+            content="c",
+            notebookGuid="nb",
+            active=True,
+            resources=[
+                Resource(guid="r1", data=Data(bodyHash=b"h1", size=3, body=b"old")),
+                Resource(guid="r2", data=Data(bodyHash=b"h2", size=3, body=b"new")),
+            ],
+        )
+    ]
+
+    note = sync_client.get_note("n1", known_resource_hashes={b"h1"})
+
+    assert mock_evernote_client.fake_resource_data_requests == ["r2"]
+    assert note.resources[0].data.body is None
+    assert note.resources[1].data.body == b"new"
+
+
 def test_iter_sync_chunks_single_page(sync_client, mock_evernote_client):
     mock_evernote_client.fake_usn = 10
     mock_evernote_client.fake_notes = [
@@ -201,6 +299,22 @@ def test_iter_linked_notebook_sync_chunks_not_accessible(
     assert "not accessible" in caplog.text
 
 
+def test_get_linked_notebook_remote_usn(sync_client, mock_evernote_client):
+    mock_evernote_client.fake_l_usn = 42
+    l_nb = LinkedNotebook(guid="lnb", shardId="s100", shareName="Shared")
+
+    assert sync_client.get_linked_notebook_remote_usn(l_nb) == 42
+
+
+def test_get_linked_notebook_remote_usn_not_accessible(
+    sync_client, mock_evernote_client
+):
+    mock_evernote_client.fake_auth_linked_notebook_error = True
+    l_nb = LinkedNotebook(guid="lnb", shardId="s100", shareName="Gone")
+
+    assert sync_client.get_linked_notebook_remote_usn(l_nb) is None
+
+
 def test_iter_linked_notebook_already_up_to_date(sync_client, mock_evernote_client):
     mock_evernote_client.fake_l_usn = 50
     l_nb = LinkedNotebook(guid="lnb", shardId="s100", shareName="Shared")
@@ -489,3 +603,118 @@ def test_auth_linked_notebook_falls_back_to_user_shard(
     assert auth.token == "shared-token"
     assert auth.shard == "s100"
     assert auth.access is NoteStoreAccess.LINKED_NOTEBOOK
+
+
+def _sync_event(updated):
+    data = json.dumps(
+        [
+            {
+                "instance": {
+                    "ref": {"id": f"task{updated}", "type": EvernoteEntityType.TASK},
+                    "type": 1,
+                    "parentEntity": {"id": "note1", "type": EvernoteEntityType.NOTE},
+                    "label": "L",
+                    "created": 1,
+                    "updated": 1,
+                    "ownerId": 1,
+                },
+                "operation": 2,
+                "updated": updated,
+            }
+        ]
+    )
+
+    return MessageEvent(last_event_id="1", origin="o", type="sync", data=data)
+
+
+def test_iter_sync_chunks_v2_resumes_after_drop(sync_client, mocker, caplog):
+    mock_sleep = mocker.patch("evernote_backup.evernote_client_sync.time.sleep")
+
+    sessions = [
+        [_sync_event(10), _sync_event(20), None],
+        [None],
+        [_sync_event(30), MessageEvent("1", "o", "close", "{}")],
+    ]
+    urls = []
+
+    class FakeES:
+        def __init__(self, url, on_error=None, **kwargs):
+            urls.append(url)
+            self.events = sessions.pop(0)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *a):
+            return False
+
+        def __iter__(self):
+            for event in self.events:
+                if event is None:
+                    raise SyncStreamInterruptedError("Sync stream interrupted")
+                yield event
+
+    mocker.patch("evernote_backup.evernote_client.EventSource", FakeES)
+
+    with caplog.at_level(logging.WARNING):
+        chunks = list(
+            sync_client.iter_sync_chunks_v2(5, entity_filter=[EvernoteEntityType.TASK])
+        )
+
+    assert [c.last_timestamp for c in chunks] == [10, 20, 30]
+    assert "lastConnection=5&" in urls[0]
+    assert "lastConnection=21&" in urls[1]
+    assert "lastConnection=21&" in urls[2]
+    assert mock_sleep.call_count == 2
+    assert "Sync stream interrupted, reconnecting" in caplog.text
+
+
+def test_iter_sync_chunks_v2_gives_up_after_retries(sync_client, mocker):
+    mocker.patch("evernote_backup.evernote_client_sync.time.sleep")
+
+    fake_es = mocker.patch("evernote_backup.evernote_client.EventSource")
+    fake_es.return_value.__enter__.side_effect = requests.ConnectionError
+
+    with pytest.raises(requests.ConnectionError):
+        list(
+            sync_client.iter_sync_chunks_v2(0, entity_filter=[EvernoteEntityType.TASK])
+        )
+
+    # First attempt and network_error_retry_count retries
+    assert fake_es.call_count == 4
+
+
+def test_parse_sync_event_data_skips_malformed_items():
+    sync_data = [
+        {"updated": 5},
+        {"operation": 99, "updated": 30},
+        {"operation": [2], "updated": 10},
+        {"operation": 2, "instance": {"type": 99}, "updated": 20},
+        {
+            "operation": 2,
+            "instance": {
+                "ref": {"id": "r1", "type": EvernoteEntityType.REMINDER},
+                "type": EvernoteSyncInstanceType.ENTITY,
+                "parentEntity": {"id": "t1", "type": EvernoteEntityType.TASK},
+                "reminderDate": 100,
+            },
+            "updated": 15,
+        },
+    ]
+
+    chunk = _parse_sync_event_data(sync_data, current_user_id=1)
+
+    assert chunk.last_timestamp == 30
+    assert len(chunk.reminders) == 1
+    assert chunk.reminders[0].sourceType is EvernoteEntityType.TASK
+    assert chunk.reminders[0].reminderDate == 100
+
+
+def test_load_json_without_orjson(mocker):
+    mocker.patch("evernote_backup.evernote_client_sync.orjson", None)
+
+    assert get_json_backend() == "json"
+    assert load_json('[{"a": 1}]') == [{"a": 1}]
+
+    with pytest.raises(ValueError):
+        load_json("not-json")
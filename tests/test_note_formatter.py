@@ -152,6 +152,26 @@ def test_formatter_empty_note():
     assert formatted_note == expected_empty_note
 
 
+def test_formatter_skips_pending_resources():
+    formatter = NoteFormatter()
+
+    test_pending_note = Note(
+        title="test",
+        resources=[
+            Resource(
+                mime="image/png",
+                data=Data(bodyHash=b"1234", size=58387),
+                attributes=ResourceAttributes(fileName="test.png"),
+            )
+        ],
+    )
+    expected_pending_note = "  <note>\n    <title>test</title>\n  </note>\n"
+
+    formatted_note = formatter.format_note(test_pending_note, "", [])
+
+    assert formatted_note == expected_pending_note
+
+
 def test_formatter_xml_note():
     formatter = NoteFormatter()
 
@@ -1,16 +1,37 @@
 import logging
+import lzma
 from pathlib import Path
 
 import pytest
-from evernote.edam.type.ttypes import LinkedNotebook, Note, Notebook
+from evernote.edam.type.ttypes import (
+    Data,
+    LinkedNotebook,
+    Note,
+    Notebook,
+    Resource,
+    Tag,
+)
 
 from evernote_backup.config import (
     CURRENT_DB_VERSION,
     SHARED_WITH_ME_NOTEBOOK_GUID,
     SHARED_WITH_ME_NOTEBOOK_NAME,
 )
-from evernote_backup.evernote_types import Reminder, Task
-from evernote_backup.note_storage import NoteForSync, SqliteStorage, initialize_db
+from evernote_backup.evernote_client_util import NotebookAuth, NoteStoreAccess
+from evernote_backup.evernote_types import (
+    Reminder,
+    SharedNoteMembership,
+    SyncChunkV2,
+    Task,
+)
+from evernote_backup.note_storage import (
+    DownloadFailure,
+    NoteForSync,
+    SqliteStorage,
+    deserialize_note,
+    initialize_db,
+    serialize_note,
+)
 
 
 def test_database_file_missing():
@@ -420,7 +441,7 @@ def test_notes_corrupt(fake_storage, caplog):
     with caplog.at_level(logging.DEBUG, logger="evernote_backup"):
         result_notes = list(fake_storage.notes.iter_notes("notebook1"))
 
-    result_notes_for_sync = fake_storage.notes.get_notes_for_sync()
+    result_notes_for_sync = tuple(fake_storage.notes.iter_notes_for_sync())
 
     assert result_notes == expected_notes
     assert len(result_notes_for_sync) == 0
@@ -508,7 +529,24 @@ def test_reminder_corrupt(fake_storage, caplog):
     assert "Reminder [id3] is corrupt" in caplog.text
 
 
-def test_get_notes_for_sync(fake_storage):
+def test_task_stored_with_default_preset(fake_storage):
+    old_task = Task(taskId="id1", parentId="nid1", label="old")
+
+    with fake_storage.db as con:
+        con.execute(
+            "insert into tasks(guid, note_guid, raw_task) values (?, ?, ?)",
+            ("id1", "nid1", lzma.compress(old_task.to_json().encode("utf-8"))),
+        )
+
+    assert list(fake_storage.tasks.iter_tasks("nid1")) == [old_task]
+
+    new_task = Task(taskId="id1", parentId="nid1", label="new")
+    fake_storage.tasks.add_tasks([new_task])
+
+    assert list(fake_storage.tasks.iter_tasks("nid1")) == [new_task]
+
+
+def test_iter_notes_for_sync_all(fake_storage):
     test_notes = [
         Note(
             guid="id1",
@@ -536,7 +574,7 @@ def test_get_notes_for_sync(fake_storage):
         )
         for n in test_notes
     )
-    result = fake_storage.notes.get_notes_for_sync()
+    result = tuple(fake_storage.notes.iter_notes_for_sync())
 
     assert expected == result
 
@@ -718,18 +756,129 @@ def test_shared_notes_storage_crud(fake_storage):
     assert fake_storage.shared_notes.is_shared_note("n2")
 
 
-def test_get_notes_for_sync_includes_shard_id(fake_storage):
+def test_iter_notes_for_sync_includes_shard_id(fake_storage):
     fake_storage.notes.add_notes_for_sync(
         [Note(guid="shared1", title="s", notebookGuid="nb")]
     )
     fake_storage.shared_notes.add_shared_note("shared1", "s532", owner_id=1)
 
-    result = fake_storage.notes.get_notes_for_sync()
+    result = tuple(fake_storage.notes.iter_notes_for_sync())
 
     assert len(result) == 1
     assert result[0].guid == "shared1"
     assert result[0].shard_id == "s532"
     assert result[0].linked_notebook_guid is None
+    assert result[0].is_shared is True
+    assert result[0].is_linked is False
+
+
+def test_iter_notes_for_sync(fake_storage):
+    fake_storage.notes.add_notes_for_sync(
+        [
+            Note(guid=f"id{i}", title=f"t{i}", notebookGuid="nb1" if i < 5 else "nb2")
+            for i in range(7)
+        ]
+    )
+
+    notes_iter = fake_storage.notes.iter_notes_for_sync(
+        exclude_notes=["id1"], exclude_notebooks=["nb2"], page_size=2
+    )
+
+    result = [next(notes_iter), next(notes_iter)]
+
+    # Notes stored during iteration must not shift the following pages
+    for note in result:
+        fake_storage.notes.add_note(
+            Note(guid=note.guid, title="t", notebookGuid="nb1", active=True)
+        )
+
+    result.extend(notes_iter)
+
+    assert [n.guid for n in result] == ["id0", "id2", "id3", "id4"]
+    assert fake_storage.notes.get_notes_for_sync_count() == 5
+    assert fake_storage.notes.get_notes_for_sync_count(["id1"], ["nb2"]) == 2
+
+
+def test_iter_notes_for_sync_includes_linked(fake_storage):
+    nb = Notebook(guid="nb-linked", name="LN")
+    fake_storage.notebooks.add_notebooks([nb])
+    fake_storage.notebooks.add_linked_notebook(LinkedNotebook(guid="ln1"), nb)
+    fake_storage.notes.add_notes_for_sync(
+        [Note(guid="n1", title="t", notebookGuid="nb-linked")]
+    )
+
+    result = tuple(fake_storage.notes.iter_notes_for_sync())
+
+    assert result == (
+        NoteForSync(
+            guid="n1",
+            title="t",
+            notebook_guid="nb-linked",
+            linked_notebook_guid="ln1",
+            shard_id=None,
+            is_shared=False,
+            is_linked=True,
+        ),
+    )
+
+
+def test_shared_notes_apply_sync_chunk(fake_storage, caplog):
+    nb = Notebook(guid="nb-linked", name="LN")
+    fake_storage.notebooks.add_notebooks([nb])
+    fake_storage.notebooks.add_linked_notebook(LinkedNotebook(guid="ln1"), nb)
+
+    for guid, notebook_guid in (
+        ("updated", SHARED_WITH_ME_NOTEBOOK_GUID),
+        ("expunged", SHARED_WITH_ME_NOTEBOOK_GUID),
+        ("unshared", SHARED_WITH_ME_NOTEBOOK_GUID),
+        ("unshared-linked", "nb-linked"),
+        ("own", "nb-own"),
+    ):
+        fake_storage.notes.add_note(
+            Note(
+                guid=guid,
+                title=guid,
+                content="c",
+                notebookGuid=notebook_guid,
+                active=True,
+            )
+        )
+    for guid in ("updated", "expunged", "unshared", "unshared-linked"):
+        fake_storage.shared_notes.add_shared_note(guid, "s1")
+
+    chunk = SyncChunkV2(
+        last_timestamp=1,
+        shared_note_memberships=[
+            SharedNoteMembership(note_guid="new", shard_id="s2", owner_id=2),
+            SharedNoteMembership(note_guid="own", shard_id="s1", owner_id=1),
+        ],
+        notes_to_sync=["updated", "not-shared"],
+        expunged_notes=["expunged", "not-shared"],
+        expunged_shared_note_memberships=["unshared", "unshared-linked"],
+    )
+
+    with caplog.at_level(logging.DEBUG, logger="evernote_backup"):
+        expunged_count = fake_storage.shared_notes.apply_sync_chunk(chunk)
+
+    assert expunged_count == 2
+    assert "Shared note [unshared-linked] unshared but still in linked" in caplog.text
+    assert "Shared note [unshared] unshared" not in caplog.text
+    assert fake_storage.shared_notes.get_shared_note_guids() == {
+        "new",
+        "own",
+        "updated",
+    }
+    assert fake_storage.notes.get_note_notebook_guid("new") == (
+        SHARED_WITH_ME_NOTEBOOK_GUID
+    )
+    assert fake_storage.notes.get_note_notebook_guid("own") == "nb-own"
+    assert {n.guid for n in tuple(fake_storage.notes.iter_notes_for_sync())} == {
+        "new",
+        "updated",
+    }
+    assert not fake_storage.notes.note_exists("expunged")
+    assert not fake_storage.notes.note_exists("unshared")
+    assert fake_storage.notes.note_exists("unshared-linked")
 
 
 def test_is_note_in_linked_notebook(fake_storage):
@@ -785,15 +934,165 @@ def test_mark_notes_for_redownload(fake_storage):
         active=True,
     )
     fake_storage.notes.add_note(note)
-    assert fake_storage.notes.get_notes_for_sync() == ()
+    assert tuple(fake_storage.notes.iter_notes_for_sync()) == ()
 
     fake_storage.notes.mark_notes_for_redownload(["id1"])
 
-    pending = fake_storage.notes.get_notes_for_sync()
+    pending = tuple(fake_storage.notes.iter_notes_for_sync())
     assert len(pending) == 1
     assert pending[0].guid == "id1"
 
 
+def test_resources_stashed_on_reschedule(fake_storage):
+    fake_storage.notes.add_note(
+        Note(
+            guid="id1",
+            title="t",
+            content="body",
+            notebookGuid="nb",
+            active=True,
+            resources=[
+                Resource(guid="r1", data=Data(bodyHash=b"h1", size=3, body=b"aaa")),
+                Resource(guid="r2", data=Data(bodyHash=b"h2", size=3, body=b"bbb")),
+            ],
+        )
+    )
+
+    # Any iterable, not only lists
+    fake_storage.notes.add_notes_for_sync(
+        n for n in [Note(guid="id1", title="t", notebookGuid="nb")]
+    )
+
+    assert [n.guid for n in fake_storage.notes.iter_notes_for_sync()] == ["id1"]
+
+    assert fake_storage.resources.get_resource_hashes_by_guid(["id1", "id2"]) == {
+        "id1": frozenset({b"h1", b"h2"})
+    }
+    assert fake_storage.resources.get_resource_hashes_by_guid(["id2"]) == {}
+
+    new_note = Note(
+        guid="id1",
+        title="t",
+        content="body2",
+        notebookGuid="nb",
+        active=True,
+        resources=[
+            Resource(guid="r1", data=Data(bodyHash=b"h1", size=3)),
+            Resource(guid="r3", data=Data(bodyHash=b"h3", size=3, body=b"ccc")),
+        ],
+    )
+
+    assert fake_storage.resources.restore_note_resources(new_note) == 1
+    assert new_note.resources[0].data.body == b"aaa"
+    assert new_note.resources[1].data.body == b"ccc"
+
+    fake_storage.notes.add_note(new_note)
+
+    assert fake_storage.resources.get_resource_hashes_by_guid(["id1"]) == {}
+
+
+def test_add_raw_note(fake_storage):
+    test_note = Note(
+        guid="id1",
+        title="title1",
+        content="body1",
+        notebookGuid="nb1",
+        active=True,
+        resources=[Resource(guid="r1", data=Data(bodyHash=b"h1", size=3))],
+    )
+
+    raw_note = serialize_note(test_note)
+
+    assert raw_note.guid == "id1"
+    assert raw_note.title == "title1"
+    assert raw_note.notebook_guid == "nb1"
+    assert raw_note.is_active
+    assert raw_note.resources_pending
+    assert deserialize_note(raw_note.raw_note) == test_note
+
+    fake_storage.notes.add_raw_note(raw_note)
+
+    assert list(fake_storage.notes.iter_notes("nb1")) == [test_note]
+
+
+def test_resources_stash_expunged_with_note(fake_storage):
+    fake_storage.notes.add_note(
+        Note(
+            guid="id1",
+            title="t",
+            content="body",
+            notebookGuid="nb",
+            active=True,
+            resources=[
+                Resource(guid="r1", data=Data(bodyHash=b"h1", size=3, body=b"aaa")),
+            ],
+        )
+    )
+
+    fake_storage.notes.mark_notes_for_redownload(["id1"])
+    assert fake_storage.resources.get_resource_hashes_by_guid(["id1"]) == {
+        "id1": frozenset({b"h1"})
+    }
+
+    fake_storage.notes.expunge_notes(["id1"])
+    assert fake_storage.resources.get_resource_hashes_by_guid(["id1"]) == {}
+
+
+def test_get_notes_for_backfill(fake_storage):
+    fake_storage.notes.add_note(
+        Note(
+            guid="pending",
+            title="t1",
+            content="body",
+            notebookGuid="nb",
+            active=True,
+            resources=[Resource(guid="r1", data=Data(bodyHash=b"h1", size=3))],
+        )
+    )
+    fake_storage.notes.add_note(
+        Note(
+            guid="complete",
+            title="t2",
+            content="body",
+            notebookGuid="nb",
+            active=True,
+            resources=[
+                Resource(guid="r2", data=Data(bodyHash=b"h2", size=3, body=b"bbb"))
+            ],
+        )
+    )
+
+    pending = fake_storage.notes.get_notes_for_backfill()
+
+    assert [n.guid for n in pending] == ["pending"]
+    assert tuple(fake_storage.notes.iter_notes_for_sync()) == ()
+
+    note = fake_storage.notes.get_note("pending")
+    note.resources[0].data.body = b"aaa"
+    fake_storage.notes.add_note(note)
+
+    assert fake_storage.notes.get_notes_for_backfill() == ()
+    assert fake_storage.notes.get_note("missing") is None
+
+
+def test_get_notes_for_backfill_excludes_blacklisted(fake_storage):
+    for guid, notebook_guid in (("id1", "nb1"), ("id2", "nb1"), ("id3", "nb2")):
+        fake_storage.notes.add_note(
+            Note(
+                guid=guid,
+                title=guid,
+                content="body",
+                notebookGuid=notebook_guid,
+                active=True,
+                resources=[Resource(guid="r1", data=Data(bodyHash=b"h1", size=3))],
+            )
+        )
+
+    pending = fake_storage.notes.get_notes_for_backfill(["id1"], ["nb2"])
+
+    assert [n.guid for n in pending] == ["id2"]
+
+
 def test_note_exists_and_get_notebook_guid(fake_storage):
     assert fake_storage.notes.note_exists("x") is False
     assert fake_storage.notes.get_note_notebook_guid("x") is None
@@ -832,6 +1131,222 @@ def test_upgrade_db_v6_to_v7_shared_notes(fake_storage):
     assert SHARED_WITH_ME_NOTEBOOK_NAME in names
 
 
+def test_upgrade_db_v7_to_v8_resource_bodies(fake_storage):
+    with fake_storage.db as con:
+        con.execute("DROP TABLE IF EXISTS resource_bodies")
+    fake_storage.config.set_config_value("DB_VERSION", "7")
+
+    fake_storage.check_version()
+
+    assert fake_storage.config.get_config_value("DB_VERSION") == str(CURRENT_DB_VERSION)
+    assert fake_storage.resources.get_resource_hashes_by_guid(["id1"]) == {}
+
+
+def test_upgrade_db_v8_to_v9_resources_pending(fake_storage):
+    with fake_storage.db as con:
+        con.execute("DROP TABLE notes")
+        con.execute(
+            "CREATE TABLE notes("
+            " guid TEXT PRIMARY KEY,"
+            " title TEXT,"
+            " notebook_guid TEXT,"
+            " is_active BOOLEAN,"
+            " raw_note BLOB"
+            " );"
+        )
+    fake_storage.config.set_config_value("DB_VERSION", "8")
+
+    fake_storage.check_version()
+
+    assert fake_storage.config.get_config_value("DB_VERSION") == str(CURRENT_DB_VERSION)
+
+    fake_storage.notes.add_note(
+        Note(guid="id1", title="t", content="c", notebookGuid="nb", active=True)
+    )
+    assert fake_storage.notes.get_notes_for_backfill() == ()
+
+
+def test_tags(fake_storage):
+    fake_storage.tags.add_tags([Tag(guid="t1", name="tag1"), Tag(guid="t2", name="x")])
+    fake_storage.tags.add_tag_names({"t2": "tag2", "t3": "tag3"})
+
+    assert fake_storage.tags.get_tag_names() == {
+        "t1": "tag1",
+        "t2": "tag2",
+        "t3": "tag3",
+    }
+
+    fake_storage.tags.expunge_tags(["t1", "t3"])
+
+    assert fake_storage.tags.get_tag_names() == {"t2": "tag2"}
+
+
+def test_upgrade_db_v9_to_v10_tags(fake_storage):
+    with fake_storage.db as con:
+        con.execute("DROP TABLE tags")
+    fake_storage.config.set_config_value("DB_VERSION", "9")
+
+    fake_storage.check_version()
+
+    assert fake_storage.config.get_config_value("DB_VERSION") == str(CURRENT_DB_VERSION)
+
+    fake_storage.tags.add_tag_names({"t1": "tag1"})
+    assert fake_storage.tags.get_tag_names() == {"t1": "tag1"}
+
+
+def test_linked_notebooks_auth(fake_storage):
+    auth1 = NotebookAuth(
+        token="t1", shard="s1", access=NoteStoreAccess.LINKED_NOTEBOOK, expiration=100
+    )
+    auth2 = NotebookAuth(
+        token="t2", shard="s2", access=NoteStoreAccess.LINKED_NOTEBOOK, expiration=200
+    )
+
+    fake_storage.notebooks.add_linked_notebooks_auth({"ln1": auth1, "ln2": auth2})
+
+    assert fake_storage.notebooks.get_linked_notebooks_auth(50) == {
+        "ln1": auth1,
+        "ln2": auth2,
+    }
+    assert fake_storage.notebooks.get_linked_notebooks_auth(150) == {"ln2": auth2}
+
+    fake_storage.notebooks.expunge_linked_notebooks(["ln2"])
+
+    assert fake_storage.notebooks.get_linked_notebooks_auth(50) == {"ln1": auth1}
+
+    fake_storage.notebooks.clear_linked_notebooks_auth()
+
+    assert fake_storage.notebooks.get_linked_notebooks_auth(50) == {}
+
+
+def test_upgrade_db_v10_to_v11_linked_notebooks_auth(fake_storage):
+    with fake_storage.db as con:
+        con.execute("DROP TABLE notebooks_linked_auth")
+    fake_storage.config.set_config_value("DB_VERSION", "10")
+
+    fake_storage.check_version()
+
+    assert fake_storage.config.get_config_value("DB_VERSION") == str(CURRENT_DB_VERSION)
+    assert fake_storage.notebooks.get_linked_notebooks_auth(0) == {}
+
+
+def test_upgrade_db_v11_to_v12_download_failures(fake_storage):
+    with fake_storage.db as con:
+        con.execute("DROP TABLE download_failures")
+    fake_storage.config.set_config_value("DB_VERSION", "11")
+
+    fake_storage.check_version()
+
+    assert fake_storage.config.get_config_value("DB_VERSION") == str(CURRENT_DB_VERSION)
+    assert list(fake_storage.download_failures.iter_failures()) == []
+
+
+def test_upgrade_db_v12_to_v13_stashed_notes(fake_storage):
+    with fake_storage.db as con:
+        con.execute("DROP TABLE stashed_notes")
+        con.execute(
+            "CREATE TABLE resource_bodies("
+            " note_guid TEXT, body_hash BLOB, body BLOB,"
+            " PRIMARY KEY (note_guid, body_hash))"
+        )
+    fake_storage.config.set_config_value("DB_VERSION", "12")
+
+    fake_storage.check_version()
+
+    assert fake_storage.config.get_config_value("DB_VERSION") == str(CURRENT_DB_VERSION)
+    assert fake_storage.resources.get_resource_hashes_by_guid(["id1"]) == {}
+
+    with fake_storage.db as con:
+        cur = con.execute(
+            "select name from sqlite_master where type='table' and name=?",
+            ("resource_bodies",),
+        )
+        assert cur.fetchone() is None
+
+
+def test_download_failures_cooldown(fake_storage, mocker):
+    mock_time = mocker.patch("evernote_backup.note_storage.time.time")
+    mock_time.return_value = 1000
+
+    fake_storage.notes.add_notes_for_sync(
+        [
+            Note(guid="id1", title="test1", notebookGuid="nb"),
+            Note(guid="id2", title="test2", notebookGuid="nb"),
+        ]
+    )
+
+    hour = 60 * 60
+
+    assert fake_storage.download_failures.add_failure("id1", "error 1") == (
+        1000 + 6 * hour
+    )
+    assert fake_storage.download_failures.add_failure("id1", "error 2") == (
+        1000 + 12 * hour
+    )
+
+    assert [n.guid for n in tuple(fake_storage.notes.iter_notes_for_sync())] == ["id2"]
+    assert [n.guid for n in fake_storage.notes.iter_notes_for_sync()] == ["id2"]
+    assert fake_storage.notes.get_notes_for_sync_count() == 1
+    assert fake_storage.download_failures.get_deferred_count() == 1
+
+    assert list(fake_storage.download_failures.iter_failures()) == [
+        DownloadFailure(
+            guid="id1",
+            title="test1",
+            attempts=2,
+            last_error="error 2",
+            next_attempt=1000 + 12 * hour,
+        )
+    ]
+
+    # Cool-down is over, note is downloaded again
+    mock_time.return_value = 1000 + 12 * hour
+
+    assert fake_storage.notes.get_notes_for_sync_count() == 2
+    assert fake_storage.download_failures.get_deferred_count() == 0
+
+
+def test_download_failures_max_cooldown(fake_storage, mocker):
+    mocker.patch("evernote_backup.note_storage.time.time", return_value=0)
+
+    for _ in range(20):
+        next_attempt = fake_storage.download_failures.add_failure("id1", "error")
+
+    assert next_attempt == 30 * 24 * 60 * 60
+
+
+def test_download_failures_reset(fake_storage):
+    fake_storage.notes.add_notes_for_sync(
+        [
+            Note(guid="id1", title="test1", notebookGuid="nb"),
+            Note(guid="id2", title="test2", notebookGuid="nb"),
+            Note(guid="id3", title="test3", notebookGuid="nb"),
+        ]
+    )
+
+    for guid in ("id1", "id2", "id3"):
+        fake_storage.download_failures.add_failure(guid, "error")
+
+    assert tuple(fake_storage.notes.iter_notes_for_sync()) == ()
+
+    # Stored, expunged or updated on the server notes drop their failures
+    fake_storage.notes.add_note(
+        Note(guid="id1", title="test1", notebookGuid="nb", active=True)
+    )
+    fake_storage.notes.expunge_notes(["id2"])
+    fake_storage.notes.add_notes_for_sync(
+        [Note(guid="id3", title="test3", notebookGuid="nb")]
+    )
+
+    assert list(fake_storage.download_failures.iter_failures()) == []
+    assert [n.guid for n in tuple(fake_storage.notes.iter_notes_for_sync())] == ["id3"]
+
+    fake_storage.download_failures.add_failure("id3", "error")
+    fake_storage.download_failures.clear_failures()
+
+    assert [n.guid for n in tuple(fake_storage.notes.iter_notes_for_sync())] == ["id3"]
+
+
 def test_note_count(fake_storage):
     test_notes = [
         Note(
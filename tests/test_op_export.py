@@ -1,5 +1,5 @@
 import pytest
-from evernote.edam.type.ttypes import Note, Notebook
+from evernote.edam.type.ttypes import Note, Notebook, Tag
 
 from evernote_backup.config import CURRENT_DB_VERSION
 from evernote_backup.evernote_types import Reminder, Task
@@ -280,6 +280,40 @@ def test_export_tag(cli_invoker, fake_storage, tmp_path):
     assert not note6_path.exists()
 
 
+@pytest.mark.usefixtures("fake_init_db")
+def test_export_tag_renamed(cli_invoker, fake_storage, tmp_path):
+    test_out_path = tmp_path / "test_out"
+
+    fake_storage.notebooks.add_notebooks([Notebook(guid="nbid1", name="name1")])
+    fake_storage.tags.add_tags([Tag(guid="tid1", name="renamed")])
+    fake_storage.notes.add_note(
+        Note(
+            guid="id1",
+            title="title1",
+            content="test",
+            notebookGuid="nbid1",
+            active=True,
+            tagGuids=["tid1"],
+            tagNames=["old"],
+        )
+    )
+
+    result = cli_invoker(
+        "export",
+        "--database",
+        "fake_db",
+        "--tag",
+        "renamed",
+        "--single-notes",
+        str(test_out_path),
+    )
+
+    note1_path = test_out_path / "name1" / "title1.enex"
+
+    assert result.exit_code == 0
+    assert "<tag>renamed</tag>" in note1_path.read_text(encoding="utf-8")
+
+
 @pytest.mark.usefixtures("fake_init_db")
 def test_export_tag_with_trash(cli_invoker, fake_storage, tmp_path):
     test_out_path = tmp_path / "test_out"
@@ -223,8 +223,15 @@ def test_manage_blacklist_list_notebooks_only(cli_invoker, fake_storage):
 
 
 @pytest.mark.usefixtures("fake_init_db")
+@pytest.mark.parametrize(
+    ("sync_args", "download_message"),
+    [
+        ((), "2 note(s) downloaded while syncing."),
+        (("--no-pipeline",), "2 note(s) to download..."),
+    ],
+)
 def test_sync_skips_blacklisted_note(
-    cli_invoker, mock_evernote_client, fake_storage, mocker
+    cli_invoker, mock_evernote_client, fake_storage, mocker, sync_args, download_message
 ):
     mock_evernote_client.fake_notebooks.append(
         Notebook(guid="nbid1", name="name1", stack="stack1", serviceUpdated=1000)
@@ -252,19 +259,27 @@ def test_sync_skips_blacklisted_note(
         active=True,
     )
 
-    result = cli_invoker("sync", "--database", "fake_db")
+    result = cli_invoker("sync", "--database", "fake_db", *sync_args)
 
     assert result.exit_code == 0
     assert "Skipped 1 blacklisted note(s)." in result.output
-    assert "2 note(s) to download..." in result.output
+    assert download_message in result.output
+    assert "Updated or added notes: 2" in result.output
 
     downloaded_guids = {call.args[0] for call in mock_get_note.call_args_list}
     assert downloaded_guids == {"id1", "id3"}
 
 
 @pytest.mark.usefixtures("fake_init_db")
+@pytest.mark.parametrize(
+    ("sync_args", "download_message"),
+    [
+        ((), "1 note(s) downloaded while syncing."),
+        (("--no-pipeline",), "1 note(s) to download..."),
+    ],
+)
 def test_sync_skips_notes_from_blacklisted_notebook(
-    cli_invoker, mock_evernote_client, fake_storage, mocker
+    cli_invoker, mock_evernote_client, fake_storage, mocker, sync_args, download_message
 ):
     mock_evernote_client.fake_notebooks.extend(
         [
@@ -295,11 +310,12 @@ def test_sync_skips_notes_from_blacklisted_notebook(
         active=True,
     )
 
-    result = cli_invoker("sync", "--database", "fake_db")
+    result = cli_invoker("sync", "--database", "fake_db", *sync_args)
 
     assert result.exit_code == 0
     assert "Skipped 2 blacklisted note(s)." in result.output
-    assert "1 note(s) to download..." in result.output
+    assert download_message in result.output
+    assert "Updated or added notes: 1" in result.output
 
     downloaded_guids = {call.args[0] for call in mock_get_note.call_args_list}
     assert downloaded_guids == {"id1"}
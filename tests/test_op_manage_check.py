@@ -113,7 +113,7 @@ def test_manage_check_corrupt(cli_invoker, fake_storage):
 
     result = cli_invoker("-v", "manage", "check", "--database", "fake_db")
 
-    result_notes_for_sync = fake_storage.notes.get_notes_for_sync()
+    result_notes_for_sync = tuple(fake_storage.notes.iter_notes_for_sync())
 
     assert result.exit_code == 0
     assert len(result_notes_for_sync) == 0
@@ -154,7 +154,7 @@ def test_manage_check_corrupt_mark(cli_invoker, fake_storage):
         "-v", "manage", "check", "--database", "fake_db", "--mark-corrupted"
     )
 
-    result_notes_for_sync = fake_storage.notes.get_notes_for_sync()
+    result_notes_for_sync = tuple(fake_storage.notes.iter_notes_for_sync())
 
     assert result.exit_code == 0
     assert len(result_notes_for_sync) == 1
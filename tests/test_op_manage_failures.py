@@ -0,0 +1,81 @@
+import pytest
+from evernote.edam.type.ttypes import Note
+
+NOTE_1 = "01234567-89ab-cdef-0123-456789abcdef"
+NOTE_2 = "11234567-89ab-cdef-0123-456789abcdef"
+
+
+@pytest.fixture
+def failed_notes(fake_storage):
+    fake_storage.notes.add_notes_for_sync(
+        [
+            Note(guid=NOTE_1, title="test1", notebookGuid="nb"),
+            Note(guid=NOTE_2, title="test2", notebookGuid="nb"),
+        ]
+    )
+
+    fake_storage.download_failures.add_failure(NOTE_1, "Test error 1")
+    fake_storage.download_failures.add_failure(NOTE_2, "Test error 2")
+    fake_storage.download_failures.add_failure(NOTE_2, "Test error 3")
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_manage_failures_list_empty(cli_invoker):
+    result = cli_invoker("manage", "failures")
+
+    assert result.exit_code == 0
+    assert "No failed note downloads." in result.output
+
+
+@pytest.mark.usefixtures("fake_init_db", "failed_notes")
+def test_manage_failures_list(cli_invoker):
+    result = cli_invoker("manage", "failures")
+
+    assert result.exit_code == 0
+    assert "Failed note downloads:" in result.output
+    assert f"- 'test1' [{NOTE_1}], failed 1 time(s)" in result.output
+    assert f"- 'test2' [{NOTE_2}], failed 2 time(s)" in result.output
+    assert "Test error 1" in result.output
+    assert "Test error 3" in result.output
+
+
+@pytest.mark.usefixtures("fake_init_db", "failed_notes")
+def test_manage_failures_del_note(cli_invoker, fake_storage):
+    result = cli_invoker(
+        "manage",
+        "failures",
+        "--del-note-id",
+        NOTE_1.upper(),
+        "--del-note-id",
+        "21234567-89ab-cdef-0123-456789abcdef",
+    )
+
+    assert result.exit_code == 0
+    assert f"Reset failed downloads of note [{NOTE_1}]." in result.output
+    assert (
+        "Note [21234567-89ab-cdef-0123-456789abcdef] has no failed downloads."
+        in result.output
+    )
+
+    failures = fake_storage.download_failures.iter_failures()
+    assert [f.guid for f in failures] == [NOTE_2]
+    assert [n.guid for n in tuple(fake_storage.notes.iter_notes_for_sync())] == [NOTE_1]
+
+
+@pytest.mark.usefixtures("fake_init_db", "failed_notes")
+def test_manage_failures_reset_notes(cli_invoker, fake_storage):
+    result = cli_invoker("manage", "failures", "--reset-notes")
+
+    assert result.exit_code == 0
+    assert "Cleared all failed note downloads." in result.output
+
+    assert list(fake_storage.download_failures.iter_failures()) == []
+    assert len(tuple(fake_storage.notes.iter_notes_for_sync())) == 2
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_manage_failures_invalid_guid(cli_invoker):
+    result = cli_invoker("manage", "failures", "--del-note-id", "not-a-real-guid")
+
+    assert result.exit_code == 1
+    assert "Invalid GUID 'not-a-real-guid'" in result.output
@@ -1,6 +1,7 @@
 import pytest
 
 from evernote_backup.desktop_session import DesktopSession
+from evernote_backup.evernote_client_util import NotebookAuth
 from evernote_backup.token_util import OAuth2TokenBundle
 
 
@@ -24,6 +25,20 @@ def test_token_refresh(fake_storage, cli_invoker):
     assert fake_storage.config.get_config_value("auth_token") == fake_token
 
 
+@pytest.mark.usefixtures("mock_evernote_client")
+@pytest.mark.usefixtures("fake_init_db")
+def test_token_refresh_clears_linked_notebooks_auth(fake_storage, cli_invoker):
+    fake_token = "S=s1:U=ff:E=fff:C=ff:P=1:A=test222:V=2:H=ff"
+    fake_storage.notebooks.add_linked_notebooks_auth(
+        {"ln1": NotebookAuth(token="t1", shard="s1", expiration=4102444800000)}
+    )
+
+    result = cli_invoker("reauth", "--database", "fake_db", "--token", fake_token)
+
+    assert result.exit_code == 0
+    assert fake_storage.notebooks.get_linked_notebooks_auth(0) == {}
+
+
 @pytest.mark.usefixtures("mock_evernote_client")
 @pytest.mark.usefixtures("fake_init_db")
 def test_token_refresh_jwt(
@@ -1,9 +1,17 @@
+import datetime as dt
+import logging
 import struct
+import threading
 import time
 from hashlib import md5
 
 import pytest
-from evernote.edam.error.ttypes import EDAMErrorCode, EDAMSystemException
+from evernote.edam.error.ttypes import (
+    EDAMErrorCode,
+    EDAMNotFoundException,
+    EDAMSystemException,
+)
+from evernote.edam.notestore.ttypes import SyncChunk
 from evernote.edam.type.ttypes import (
     Data,
     LinkedNotebook,
@@ -15,8 +23,20 @@ from evernote.edam.type.ttypes import (
 
 from evernote_backup import note_synchronizer
 from evernote_backup.config import SHARED_WITH_ME_NOTEBOOK_GUID
-from evernote_backup.evernote_types import Reminder, Task
-from evernote_backup.token_util import OAuth2TokenBundle
+from evernote_backup.errors import WorkerStopException
+from evernote_backup.evernote_client_api_traffic import TrafficRule, traffic_shaper
+from evernote_backup.evernote_client_sync import EvernoteClientSync
+from evernote_backup.evernote_client_util import NotebookAuth
+from evernote_backup.evernote_types import (
+    EvernoteEntityType,
+    Reminder,
+    SyncChunkV2,
+    Task,
+)
+from evernote_backup.log_util import get_log_label, set_log_label
+from evernote_backup.note_storage import ConfigStorage, SqliteStorage
+from evernote_backup.token_util import OAuth2TokenBundle, TokenRefresher
+from tests.conftest import FakeAsyncNoteStoreClient, FakeEvernoteNoteStore
 
 
 def _user_notebooks(storage):
@@ -114,6 +134,195 @@ def test_sync_add_note_with_res(cli_invoker, mock_evernote_client, fake_storage)
     assert result_notes == [test_note]
 
 
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_update_note_reuses_stored_resources(
+    cli_invoker, mock_evernote_client, fake_storage
+):
+    mock_evernote_client.fake_notebooks.append(
+        Notebook(
+            guid="nbid1",
+            name="name1",
+            stack="stack1",
+            serviceUpdated=1000,
+        ),
+    )
+
+    old_resource = Resource(
+        guid="rid1",
+        noteGuid="id1",
+        data=Data(bodyHash=md5(b"000").digest(), size=3, body=b"000"),
+    )
+
+    mock_evernote_client.fake_notes.append(
+        Note(
+            guid="id1",
+            title="title1",
+            content="body1",
+            notebookGuid="nbid1",
+            active=True,
+            contentLength=100,
+            resources=[old_resource],
+        )
+    )
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    assert result.exit_code == 0
+    assert mock_evernote_client.fake_resource_data_requests == []
+
+    updated_note = Note(
+        guid="id1",
+        title="title1",
+        content="body2",
+        notebookGuid="nbid1",
+        active=True,
+        contentLength=100,
+        resources=[
+            old_resource,
+            Resource(
+                guid="rid2",
+                noteGuid="id1",
+                data=Data(bodyHash=md5(b"111").digest(), size=3, body=b"111"),
+            ),
+        ],
+    )
+
+    mock_evernote_client.fake_notes = [updated_note]
+    mock_evernote_client.fake_usn = 101
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    result_notes = list(fake_storage.notes.iter_notes("nbid1"))
+
+    assert result.exit_code == 0
+    assert mock_evernote_client.fake_resource_data_requests == ["rid2"]
+    assert result_notes == [updated_note]
+
+
+def _note_with_resources(guid, bodies):
+    return Note(
+        guid=guid,
+        title=f"title-{guid}",
+        content="body1",
+        notebookGuid="nbid1",
+        active=True,
+        contentLength=100,
+        resources=[
+            Resource(
+                guid=f"{guid}-r{i}",
+                noteGuid=guid,
+                data=Data(bodyHash=md5(body).digest(), size=len(body), body=body),
+            )
+            for i, body in enumerate(bodies)
+        ],
+    )
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_two_phase(cli_invoker, mock_evernote_client, fake_storage):
+    mock_evernote_client.fake_notebooks.append(
+        Notebook(guid="nbid1", name="name1"),
+    )
+
+    test_notes = [
+        _note_with_resources("id1", [b"000", b"111"]),
+        _note_with_resources("id2", [b"222"]),
+    ]
+    mock_evernote_client.fake_notes.extend(test_notes)
+
+    result = cli_invoker("sync", "--database", "fake_db", "--two-phase")
+
+    result_notes = sorted(fake_storage.notes.iter_notes("nbid1"), key=lambda n: n.guid)
+
+    assert result.exit_code == 0
+    assert sorted(mock_evernote_client.fake_resource_data_requests) == [
+        "id1-r0",
+        "id1-r1",
+        "id2-r0",
+    ]
+    assert result_notes == test_notes
+    assert fake_storage.notes.get_notes_for_backfill() == ()
+    assert "Downloaded attachments for notes: 2" in result.output
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_two_phase_backfill_resumes(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    mock_evernote_client.fake_notebooks.append(
+        Notebook(guid="nbid1", name="name1"),
+    )
+
+    test_note = _note_with_resources("id1", [b"000"])
+    mock_evernote_client.fake_notes.append(test_note)
+
+    mock_download = mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync.download_resources",
+        side_effect=struct.error,
+    )
+
+    result = cli_invoker("sync", "--database", "fake_db", "--two-phase")
+
+    assert result.exit_code == 0
+    assert "Failed to download note [id1] after 5 attempts" in result.output
+
+    # Text part is usable before attachments are downloaded
+    stored_note = fake_storage.notes.get_note("id1")
+    assert stored_note.content == "body1"
+    assert stored_note.resources[0].data.body is None
+
+    # Failed backfill cools down before the next attempt
+    assert fake_storage.notes.get_notes_for_backfill() == ()
+    assert fake_storage.download_failures.get_deferred_count() == 1
+
+    mocker.stop(mock_download)
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    assert "Skipped 1 note(s) that failed to download recently" in result.output
+    assert fake_storage.download_failures.get_deferred_count() == 1
+
+    fake_storage.download_failures.clear_failures()
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    assert result.exit_code == 0
+    assert list(fake_storage.notes.iter_notes("nbid1")) == [test_note]
+    assert fake_storage.notes.get_notes_for_backfill() == ()
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_two_phase_backfill_size_limit(
+    cli_invoker, mock_evernote_client, fake_storage
+):
+    mock_evernote_client.fake_notebooks.append(
+        Notebook(guid="nbid1", name="name1"),
+    )
+
+    big_body = b"0" * (1024 * 1024)
+    mock_evernote_client.fake_notes.extend(
+        [
+            _note_with_resources("id1", [big_body]),
+            _note_with_resources("id2", [big_body]),
+        ]
+    )
+
+    result = cli_invoker(
+        "sync",
+        "--database",
+        "fake_db",
+        "--two-phase",
+        "--max-backfill-workers",
+        1,
+        "--max-backfill-size",
+        1,
+    )
+
+    assert result.exit_code == 0
+    assert "Attachments download limit reached" in result.output
+    assert len(fake_storage.notes.get_notes_for_backfill()) == 1
+
+
 @pytest.mark.usefixtures("fake_init_db")
 def test_sync_add_note_with_tags(cli_invoker, mock_evernote_client, fake_storage):
     mock_evernote_client.fake_tags = [
@@ -186,6 +395,69 @@ def test_sync_add_linked_notebook(cli_invoker, mock_evernote_client, fake_storag
     assert result_l_notebooks_usn == mock_evernote_client.fake_l_usn
 
 
+def _linked_notebook_chunks(l_notebook, after_usn):
+    # Two chunks per linked notebook, each adding a notebook
+    for usn in (after_usn + 1, after_usn + 2):
+        yield SyncChunk(
+            chunkHighUSN=usn,
+            updateCount=after_usn + 2,
+            notebooks=[Notebook(guid=f"{l_notebook.guid}-nb{usn}", name=f"{usn}")],
+        )
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_linked_notebooks_concurrent(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync."
+        "iter_linked_notebook_sync_chunks",
+        side_effect=_linked_notebook_chunks,
+    )
+
+    l_notebook_guids = [f"ln{i}" for i in range(5)]
+    for guid in l_notebook_guids:
+        mock_evernote_client.fake_linked_notebooks.append(LinkedNotebook(guid=guid))
+
+    result = cli_invoker(
+        "sync", "--database", "fake_db", "--max-linked-sync-workers", "2"
+    )
+
+    result_notebooks = {nb.guid for nb in _user_notebooks(fake_storage)}
+
+    assert result.exit_code == 0
+    assert result_notebooks == {
+        f"{guid}-nb{usn}" for guid in l_notebook_guids for usn in (1, 2)
+    }
+    for guid in l_notebook_guids:
+        assert fake_storage.notebooks.get_linked_notebook_usn(guid) == 2
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_linked_notebooks_concurrent_error(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    def chunks_or_error(l_notebook, after_usn):
+        if l_notebook.guid == "ln_bad":
+            raise ConnectionError("fake error")
+        yield from _linked_notebook_chunks(l_notebook, after_usn)
+
+    mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync."
+        "iter_linked_notebook_sync_chunks",
+        side_effect=chunks_or_error,
+    )
+
+    mock_evernote_client.fake_linked_notebooks.extend(
+        [LinkedNotebook(guid="ln_bad"), LinkedNotebook(guid="ln_good")]
+    )
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    assert result.exit_code != 0
+    assert fake_storage.notebooks.get_linked_notebook_usn("ln_good") == 2
+
+
 @pytest.mark.usefixtures("fake_init_db")
 def test_sync_add_linked_notebook_nothing_to_sync(
     cli_invoker, mock_evernote_client, fake_storage
@@ -216,6 +488,29 @@ def test_sync_add_linked_notebook_nothing_to_sync(
     assert "nothing to sync" in result.output
 
 
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_linked_notebook_unchanged_skipped(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    mock_evernote_client.fake_l_notebooks.append(Notebook(guid="nbid1", name="name1"))
+    mock_evernote_client.fake_linked_notebooks.append(LinkedNotebook(guid="id3"))
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    assert result.exit_code == 0
+
+    mock_iter_chunks = mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync."
+        "iter_linked_notebook_sync_chunks",
+    )
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    assert result.exit_code == 0
+    assert "Linked notebooks are up to date" in result.output
+    mock_iter_chunks.assert_not_called()
+
+
 @pytest.mark.usefixtures("fake_init_db")
 def test_sync_add_linked_notebook_stack(
     cli_invoker, mock_evernote_client, fake_storage
@@ -285,6 +580,57 @@ def test_sync_add_linked_notebook_note(cli_invoker, mock_evernote_client, fake_s
     assert result_notes == mock_evernote_client.fake_l_notes
 
 
+@pytest.mark.usefixtures("fake_init_db")
+@pytest.mark.parametrize(
+    ("auth_expiration", "is_auth_cached"),
+    [
+        (4102444800000, True),
+        (1000, False),
+    ],
+)
+def test_sync_linked_notebook_auth_cached(
+    cli_invoker,
+    mock_evernote_client,
+    fake_storage,
+    mocker,
+    auth_expiration,
+    is_auth_cached,
+):
+    mock_evernote_client.fake_l_notebooks.append(Notebook(guid="nbid1", name="name1"))
+    mock_evernote_client.fake_l_notes.append(
+        Note(
+            guid="id1",
+            title="title1",
+            content="body1",
+            notebookGuid="nbid1",
+            contentLength=100,
+            active=True,
+        )
+    )
+    mock_evernote_client.fake_linked_notebooks.append(
+        LinkedNotebook(guid="id3", shardId="s100")
+    )
+    mock_evernote_client.fake_linked_notebook_auth_token = (
+        "S=s200:U=ff:E=fff:C=ff:P=1:A=test222:V=2:H=ff"
+    )
+    mock_evernote_client.fake_linked_notebook_auth_expiration = auth_expiration
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    assert result.exit_code == 0
+
+    fake_storage.notes.mark_notes_for_redownload(["id1"])
+    spy_auth = mocker.spy(note_synchronizer.EvernoteClientSync, "auth_linked_notebook")
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    assert result.exit_code == 0
+    assert spy_auth.called is not is_auth_cached
+    assert list(fake_storage.notes.iter_notes("nbid1")) == (
+        mock_evernote_client.fake_l_notes
+    )
+
+
 @pytest.mark.usefixtures("fake_init_db")
 def test_sync_add_linked_notebook_note_public(
     cli_invoker, mock_evernote_client, fake_storage
@@ -713,10 +1059,7 @@ def test_sync_edam_exception_while_download(
         "Remote server returned system error (INTERNAL_ERROR - Test error) while downloading note [id3]"
         in result.output
     )
-    assert (
-        "Note 'test' will be skipped for this run and retried during the next sync"
-        in result.output
-    )
+    assert "Note 'test' will be skipped until" in result.output
 
 
 @pytest.mark.usefixtures("fake_init_db")
@@ -749,13 +1092,54 @@ def test_sync_edam_rate_limit_exception_while_download(
     )
     mock_get_note.side_effect = fake_get_note
 
-    result = cli_invoker("sync", "--database", "fake_db")
+    result = cli_invoker("sync", "--database", "fake_db", "--max-rate-limit-wait", "5")
 
     assert result.exit_code == 1
     assert "Rate limit reached. Restart program at" in result.output
     assert "(in 0:10)" in result.output
 
 
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_edam_rate_limit_pause_while_download(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    test_notes = [Note(guid=f"id{i}", title="test") for i in range(10)]
+
+    mock_evernote_client.fake_notes.extend(test_notes)
+
+    rate_limited = []
+
+    def fake_get_note(note_guid):
+        if note_guid == "id3" and not rate_limited:
+            rate_limited.append(note_guid)
+            raise EDAMSystemException(
+                errorCode=EDAMErrorCode.RATE_LIMIT_REACHED,
+                message="Test rate limit",
+                rateLimitDuration=1,
+            )
+
+        return Note(
+            guid=note_guid,
+            title="test",
+            content="test",
+            notebookGuid="test",
+            contentLength=100,
+            active=True,
+        )
+
+    mock_get_note = mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync.get_note"
+    )
+    mock_get_note.side_effect = fake_get_note
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    assert result.exit_code == 0
+    assert "Rate limit reached, downloads paused until" in result.output
+    assert "Paused on rate limit: 1" in result.output
+    assert len(list(fake_storage.notes.iter_notes("test"))) == 10
+
+
 @pytest.mark.usefixtures("fake_init_db")
 def test_sync_exception_while_download_retry_fail(
     cli_invoker, mock_evernote_client, fake_storage, mocker
@@ -787,10 +1171,19 @@ def test_sync_exception_while_download_retry_fail(
     assert result.exit_code == 0
 
     assert "Failed to download note [id3] after 5 attempts" in result.output
-    assert (
-        "Note 'test' will be skipped for this run and retried during the next sync"
-        in result.output
-    )
+    assert "Note 'test' will be skipped until" in result.output
+
+    failures = list(fake_storage.download_failures.iter_failures())
+    assert [(f.guid, f.attempts) for f in failures] == [("id3", 1)]
+    assert "after 5 attempts" in failures[0].last_error
+
+    mock_get_note.reset_mock()
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    assert result.exit_code == 0
+    assert "Skipped 1 note(s) that failed to download recently" in result.output
+    mock_get_note.assert_not_called()
 
 
 @pytest.mark.usefixtures("fake_init_db")
@@ -848,17 +1241,98 @@ def test_sync_exception_while_download_retry(
 
     assert result.exit_code == 0
     assert result_notes == test_notes
+    assert "Note download retries after bad server data: 3" in result.output
 
 
-@pytest.mark.usefixtures("mock_evernote_client")
 @pytest.mark.usefixtures("fake_init_db")
-def test_old_db_error(cli_invoker, mock_evernote_client, fake_storage):
-    fake_storage.config.set_config_value("DB_VERSION", "0")
+def test_sync_exception_while_download_permanent(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    mock_evernote_client.fake_notes.append(Note(guid="id1", title="test"))
+
+    mock_get_note = mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync.get_note"
+    )
+    mock_get_note.side_effect = EDAMNotFoundException(identifier="Note.guid")
 
     result = cli_invoker("sync", "--database", "fake_db")
 
-    assert result.exit_code == 1
-    assert "Full resync is required" in result.output
+    assert result.exit_code == 0
+    assert mock_get_note.call_count == 1
+    assert (
+        "Remote server returned EDAMNotFoundException while downloading note [id1]"
+        in result.output
+    )
+    assert "Failed note downloads: 1" in result.output
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_exception_while_download_network_retry(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    mock_evernote_client.fake_notes.extend(
+        Note(guid=f"id{i}", title="test") for i in range(3)
+    )
+
+    mock_get_note = mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync.get_note"
+    )
+    mock_get_note.side_effect = ConnectionError
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    assert result.exit_code == 0
+    assert mock_get_note.call_count == 15
+    assert "Failed to download note [id0] after 5 attempts" in result.output
+    assert "Note download retries after network errors: 12" in result.output
+    assert "Failed note downloads: 3" in result.output
+    assert "Too many network errors on shard [s1]" in result.output
+    assert "Shard pauses after network errors:" in result.output
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_download_engine_process_retry(
+    cli_invoker, mock_evernote_client, fake_storage, mocker, tmp_path
+):
+    mock_evernote_client.fake_notes.append(Note(guid="id1", title="test"))
+
+    # Notes are downloaded in child processes, so count calls on disk
+    calls_log = tmp_path / "calls"
+    calls_log.touch()
+
+    def fake_get_note(note_guid):
+        with calls_log.open("a") as f:
+            f.write("call\n")
+
+        if len(calls_log.read_text().splitlines()) < 3:
+            raise struct.error
+
+        return Note(guid=note_guid, title="test", notebookGuid="test", active=True)
+
+    mock_get_note = mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync.get_note"
+    )
+    mock_get_note.side_effect = fake_get_note
+
+    result = cli_invoker(
+        "sync", "--database", "fake_db", "--download-engine", "process"
+    )
+
+    assert result.exit_code == 0
+    assert len(calls_log.read_text().splitlines()) == 3
+    assert "Note download retries after bad server data: 2" in result.output
+    assert len(list(fake_storage.notes.iter_notes("test"))) == 1
+
+
+@pytest.mark.usefixtures("mock_evernote_client")
+@pytest.mark.usefixtures("fake_init_db")
+def test_old_db_error(cli_invoker, mock_evernote_client, fake_storage):
+    fake_storage.config.set_config_value("DB_VERSION", "0")
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    assert result.exit_code == 1
+    assert "Full resync is required" in result.output
 
 
 @pytest.mark.usefixtures("fake_init_db")
@@ -934,7 +1408,236 @@ def test_sync_custom_max_download_workers(
 
     assert result.exit_code == 0
     assert result_notes == [test_note]
-    thread_pool_spy.assert_called_once_with(max_workers=test_max_download_workers)
+    thread_pool_spy.assert_any_call(
+        max_workers=test_max_download_workers,
+        initializer=note_synchronizer.set_log_label,
+        initargs=(None,),
+    )
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_download_engine_process(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    mock_evernote_client.fake_notebooks.append(
+        Notebook(
+            guid="nbid1",
+            name="name1",
+            stack="stack1",
+            serviceUpdated=1000,
+        ),
+    )
+
+    test_notes = [
+        Note(
+            guid=f"id{i}",
+            title=f"title{i}",
+            content="body1",
+            notebookGuid="nbid1",
+            contentLength=100,
+            active=True,
+        )
+        for i in range(3)
+    ]
+
+    mock_evernote_client.fake_notes.extend(test_notes)
+
+    process_pool_spy = mocker.spy(note_synchronizer, "ProcessPoolExecutor")
+
+    result = cli_invoker(
+        "sync",
+        "--database",
+        "fake_db",
+        "--max-download-workers",
+        "2",
+        "--download-engine",
+        "process",
+    )
+
+    result_notes = sorted(fake_storage.notes.iter_notes("nbid1"), key=lambda n: n.guid)
+
+    assert result.exit_code == 0
+    assert result_notes == test_notes
+    assert process_pool_spy.call_args.kwargs["max_workers"] == 2
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_download_engine_process_rate_limit(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    mock_evernote_client.fake_notes.append(Note(guid="id1", title="test"))
+
+    mock_get_note = mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync.get_note"
+    )
+    mock_get_note.side_effect = EDAMSystemException(
+        errorCode=EDAMErrorCode.RATE_LIMIT_REACHED,
+        message="Test rate limit",
+        rateLimitDuration=10,
+    )
+
+    result = cli_invoker(
+        "sync",
+        "--database",
+        "fake_db",
+        "--download-engine",
+        "process",
+        "--max-rate-limit-wait",
+        "5",
+    )
+
+    assert result.exit_code == 1
+    assert "Rate limit reached. Restart program at" in result.output
+    assert "(in 0:10)" in result.output
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_download_engine_process_rate_limit_pause(
+    cli_invoker, mock_evernote_client, fake_storage, mocker, tmp_path
+):
+    mock_evernote_client.fake_notes.append(Note(guid="id1", title="test"))
+
+    # Notes are downloaded in child processes, so remember the first call on disk
+    rate_limited_marker = tmp_path / "rate_limited"
+
+    def fake_get_note(note_guid):
+        if not rate_limited_marker.exists():
+            rate_limited_marker.touch()
+            raise EDAMSystemException(
+                errorCode=EDAMErrorCode.RATE_LIMIT_REACHED,
+                message="Test rate limit",
+                rateLimitDuration=1,
+            )
+
+        return Note(guid=note_guid, title="test", notebookGuid="test", active=True)
+
+    mock_get_note = mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync.get_note"
+    )
+    mock_get_note.side_effect = fake_get_note
+
+    result = cli_invoker(
+        "sync", "--database", "fake_db", "--download-engine", "process"
+    )
+
+    assert result.exit_code == 0
+    assert "Rate limit reached, downloads paused until" in result.output
+    assert len(list(fake_storage.notes.iter_notes("test"))) == 1
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_download_engine_async(cli_invoker, mock_evernote_client, fake_storage):
+    mock_evernote_client.fake_notebooks.append(
+        Notebook(
+            guid="nbid1",
+            name="name1",
+            stack="stack1",
+            serviceUpdated=1000,
+        ),
+    )
+
+    test_notes = [
+        Note(
+            guid=f"id{i}",
+            title=f"title{i}",
+            content="body1",
+            notebookGuid="nbid1",
+            contentLength=100,
+            active=True,
+            tagGuids=["tag1"],
+        )
+        for i in range(3)
+    ]
+
+    mock_evernote_client.fake_notes.extend(test_notes)
+    mock_evernote_client.fake_tags.append(Tag(guid="tag1", name="tag1"))
+
+    result = cli_invoker(
+        "sync",
+        "--database",
+        "fake_db",
+        "--max-download-workers",
+        "2",
+        "--download-engine",
+        "async",
+    )
+
+    result_notes = sorted(fake_storage.notes.iter_notes("nbid1"), key=lambda n: n.guid)
+
+    assert result.exit_code == 0
+    assert result_notes == test_notes
+    assert all(n.tagNames == ["tag1"] for n in result_notes)
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_download_engine_async_rate_limit(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    mock_evernote_client.fake_notes.extend(
+        Note(guid=f"id{i}", title="test") for i in range(10)
+    )
+
+    async def fake_get_note(note_guid, *args):
+        raise EDAMSystemException(
+            errorCode=EDAMErrorCode.RATE_LIMIT_REACHED,
+            message="Test rate limit",
+            rateLimitDuration=10,
+        )
+
+    mocker.patch.object(FakeAsyncNoteStoreClient, "getNote", fake_get_note)
+
+    result = cli_invoker(
+        "sync",
+        "--database",
+        "fake_db",
+        "--download-engine",
+        "async",
+        "--max-rate-limit-wait",
+        "5",
+    )
+
+    assert result.exit_code == 1
+    assert "Rate limit reached. Restart program at" in result.output
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_download_engine_async_rate_limit_pause(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    mock_evernote_client.fake_notes.extend(
+        Note(guid=f"id{i}", title="test") for i in range(10)
+    )
+
+    rate_limited = []
+
+    async def fake_get_note(note_store, note_guid, *args):
+        if not rate_limited:
+            rate_limited.append(note_guid)
+            raise EDAMSystemException(
+                errorCode=EDAMErrorCode.RATE_LIMIT_REACHED,
+                message="Test rate limit",
+                rateLimitDuration=1,
+            )
+
+        return Note(guid=note_guid, title="test", notebookGuid="test", active=True)
+
+    mocker.patch.object(FakeAsyncNoteStoreClient, "getNote", fake_get_note)
+
+    result = cli_invoker("sync", "--database", "fake_db", "--download-engine", "async")
+
+    assert result.exit_code == 0
+    assert "Rate limit reached, downloads paused until" in result.output
+    assert len(list(fake_storage.notes.iter_notes("test"))) == 10
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_async_engine_http2_rejected(cli_invoker, mock_evernote_client):
+    result = cli_invoker(
+        "sync", "--database", "fake_db", "--download-engine", "async", "--http2"
+    )
+
+    assert result.exit_code == 2
+    assert "--http2 can't be used with --download-engine async" in result.output
 
 
 @pytest.mark.usefixtures("fake_init_db")
@@ -975,6 +1678,326 @@ def test_sync_massive_note_count(
     assert result_notes == mock_evernote_client.fake_notes
 
 
+def _pipeline_note(note_guid):
+    return Note(
+        guid=note_guid,
+        title=note_guid,
+        content="body",
+        notebookGuid="nbid1",
+        contentLength=100,
+        active=True,
+    )
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_pipeline_downloads_during_chunk_sync(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    mock_evernote_client.fake_usn = 2
+    first_download = threading.Event()
+
+    def fake_iter_sync_chunks(after_usn):
+        yield SyncChunk(
+            chunkHighUSN=1,
+            updateCount=2,
+            notebooks=[Notebook(guid="nbid1", name="name1")],
+            notes=[Note(guid="id1", title="id1", notebookGuid="nbid1")],
+        )
+
+        # Next chunk is fetched only after downloads have started
+        assert first_download.wait(timeout=10)
+
+        yield SyncChunk(
+            chunkHighUSN=2,
+            updateCount=2,
+            notes=[Note(guid="id2", title="id2", notebookGuid="nbid1")],
+        )
+
+    def fake_get_note(note_guid):
+        first_download.set()
+        return _pipeline_note(note_guid)
+
+    mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync.iter_sync_chunks",
+        side_effect=fake_iter_sync_chunks,
+    )
+    mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync.get_note",
+        side_effect=fake_get_note,
+    )
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    assert result.exit_code == 0
+    assert "Downloading notes while syncing..." in result.output
+    assert "Updated or added notes: 2" in result.output
+    assert fake_storage.config.get_config_value("USN") == "2"
+    assert tuple(fake_storage.notes.iter_notes_for_sync()) == ()
+    assert {n.guid for n in fake_storage.notes.iter_notes("nbid1")} == {"id1", "id2"}
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_pipeline_chunk_error_keeps_checkpoint(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    mock_evernote_client.fake_usn = 2
+
+    def fake_iter_sync_chunks(after_usn):
+        yield SyncChunk(
+            chunkHighUSN=1,
+            updateCount=2,
+            notebooks=[Notebook(guid="nbid1", name="name1")],
+            notes=[Note(guid="id1", title="id1", notebookGuid="nbid1")],
+        )
+
+        raise EDAMNotFoundException
+
+    mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync.iter_sync_chunks",
+        side_effect=fake_iter_sync_chunks,
+    )
+    mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync.get_note",
+        side_effect=_pipeline_note,
+    )
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    assert result.exit_code == 1
+
+    # Notes from the applied chunk are downloaded, USN points right after it
+    assert fake_storage.config.get_config_value("USN") == "1"
+    assert [n.guid for n in fake_storage.notes.iter_notes("nbid1")] == ["id1"]
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_pipeline_skips_expunged_notes(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    mock_evernote_client.fake_usn = 2
+
+    def fake_iter_sync_chunks(after_usn):
+        yield SyncChunk(
+            chunkHighUSN=1,
+            updateCount=2,
+            notebooks=[Notebook(guid="nbid1", name="name1")],
+            notes=[
+                Note(guid="id1", title="id1", notebookGuid="nbid1"),
+                Note(guid="id2", title="id2", notebookGuid="nbid1"),
+            ],
+        )
+        yield SyncChunk(chunkHighUSN=2, updateCount=2, expungedNotes=["id2"])
+
+    mock_get_note = mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync.get_note",
+        side_effect=_pipeline_note,
+    )
+    mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync.iter_sync_chunks",
+        side_effect=fake_iter_sync_chunks,
+    )
+    # Hold the first batch until both chunks are applied
+    mocker.patch.object(note_synchronizer.queue.Queue, "empty", return_value=False)
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    assert result.exit_code == 0
+    assert [c.args[0] for c in mock_get_note.call_args_list] == ["id1"]
+    assert [n.guid for n in fake_storage.notes.iter_notes("nbid1")] == ["id1"]
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_no_pipeline(cli_invoker, mock_evernote_client, fake_storage):
+    mock_evernote_client.fake_notebooks.append(Notebook(guid="nbid1", name="name1"))
+    mock_evernote_client.fake_notes.append(_pipeline_note("id1"))
+
+    result = cli_invoker("sync", "--database", "fake_db", "--no-pipeline")
+
+    assert result.exit_code == 0
+    assert "Downloading notes while syncing..." not in result.output
+    assert "1 note(s) to download..." in result.output
+    assert list(fake_storage.notes.iter_notes("nbid1")) == [_pipeline_note("id1")]
+
+
+def _fake_tasks_stream(tasks_chunks):
+    def fake_iter_sync_chunks_v2(last_connection, entity_filter):
+        if EvernoteEntityType.TASK in entity_filter:
+            return tasks_chunks(last_connection)
+        return iter([])
+
+    return fake_iter_sync_chunks_v2
+
+
+@pytest.mark.usefixtures("fake_init_db_jwt")
+def test_sync_tasks_during_note_downloads(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    mock_evernote_client.fake_notebooks.append(Notebook(guid="nbid1", name="name1"))
+    mock_evernote_client.fake_notes.append(_pipeline_note("id1"))
+
+    tasks_started = threading.Event()
+
+    def tasks_chunks(last_connection):
+        tasks_started.set()
+        yield SyncChunkV2(last_timestamp=10, tasks=[Task(taskId="t1", parentId="id1")])
+
+    def fake_get_note(note_guid):
+        # Downloads wait for the tasks stream, so both have to run together
+        assert tasks_started.wait(timeout=10)
+        return _pipeline_note(note_guid)
+
+    mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync.iter_sync_chunks_v2",
+        side_effect=_fake_tasks_stream(tasks_chunks),
+    )
+    mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync.get_note",
+        side_effect=fake_get_note,
+    )
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    assert result.exit_code == 0
+    assert "Updated or added notes: 1" in result.output
+    assert "Updated or added tasks: 1" in result.output
+    assert [t.taskId for t in fake_storage.tasks.iter_tasks("id1")] == ["t1"]
+    assert fake_storage.config.get_config_value("last_connection_tasks") == "11"
+
+
+@pytest.mark.usefixtures("fake_init_db_jwt")
+def test_sync_tasks_stream_error(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    mock_evernote_client.fake_notebooks.append(Notebook(guid="nbid1", name="name1"))
+    mock_evernote_client.fake_notes.append(_pipeline_note("id1"))
+
+    def tasks_chunks(last_connection):
+        yield SyncChunkV2(last_timestamp=10, tasks=[Task(taskId="t1", parentId="id1")])
+        raise ConnectionError("Stream closed")
+
+    mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync.iter_sync_chunks_v2",
+        side_effect=_fake_tasks_stream(tasks_chunks),
+    )
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    assert result.exit_code == 1
+    assert "Stream closed" in result.output
+
+    # Tasks read before the error are kept
+    assert [t.taskId for t in fake_storage.tasks.iter_tasks("id1")] == ["t1"]
+    assert fake_storage.config.get_config_value("last_connection_tasks") == "11"
+
+
+@pytest.mark.usefixtures("fake_init_db_jwt")
+def test_sync_tasks_checkpoint_interval(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    def tasks_chunks(last_connection):
+        for timestamp in (10, 20, 30, 40, 50):
+            yield SyncChunkV2(last_timestamp=timestamp)
+
+    mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync.iter_sync_chunks_v2",
+        side_effect=_fake_tasks_stream(tasks_chunks),
+    )
+    config_spy = mocker.spy(ConfigStorage, "set_config_value")
+
+    result = cli_invoker("sync", "--database", "fake_db", "--v2-checkpoint-chunks", "2")
+
+    checkpoints = [
+        c.args[2]
+        for c in config_spy.call_args_list
+        if c.args[1] == "last_connection_tasks"
+    ]
+
+    assert result.exit_code == 0
+    # Every second chunk and the remainder at the end of the stream
+    assert checkpoints == ["21", "41", "51"]
+    assert fake_storage.config.get_config_value("last_connection_tasks") == "51"
+
+
+@pytest.mark.usefixtures("fake_init_db_jwt")
+def test_sync_tasks_checkpoint_saved_on_error(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    def tasks_chunks(last_connection):
+        yield SyncChunkV2(last_timestamp=10, tasks=[Task(taskId="t1", parentId="id1")])
+        raise ConnectionError("Stream closed")
+
+    mocker.patch(
+        "evernote_backup.evernote_client_sync.EvernoteClientSync.iter_sync_chunks_v2",
+        side_effect=_fake_tasks_stream(tasks_chunks),
+    )
+
+    result = cli_invoker(
+        "sync", "--database", "fake_db", "--v2-checkpoint-chunks", "100"
+    )
+
+    assert result.exit_code == 1
+    assert fake_storage.config.get_config_value("last_connection_tasks") == "11"
+
+
+def test_chunk_stream_reader_bounded_buffer(mocker):
+    mocker.patch.object(note_synchronizer, "STREAM_CHUNKS_QUEUE_SIZE", 2)
+    mocker.patch.object(note_synchronizer, "CHUNKS_QUEUE_TIMEOUT", 0.01)
+
+    read_timestamps = []
+
+    def chunks():
+        for timestamp in range(10):
+            read_timestamps.append(timestamp)
+            yield SyncChunkV2(last_timestamp=timestamp)
+
+    reader = note_synchronizer.ChunkStreamReader(chunks())
+    reader.start()
+
+    while len(read_timestamps) < 3:
+        time.sleep(0.001)
+    time.sleep(0.05)
+
+    # Two chunks buffered, the third one waits for room
+    assert len(read_timestamps) == 3
+
+    assert [c.last_timestamp for c in reader.pop_all()] == list(range(10))
+
+
+def test_chunk_stream_reader_pop_ready_error():
+    def chunks():
+        yield SyncChunkV2(last_timestamp=10)
+        raise ConnectionError("Stream closed")
+
+    reader = note_synchronizer.ChunkStreamReader(chunks())
+    reader.start()
+    reader._thread.join(timeout=5)
+
+    ready = reader.pop_ready()
+
+    assert next(ready).last_timestamp == 10
+    with pytest.raises(ConnectionError, match="Stream closed"):
+        next(ready)
+    with pytest.raises(ConnectionError, match="Stream closed"):
+        list(reader.pop_ready())
+
+
+def test_chunk_stream_reader_stop_while_full(mocker):
+    mocker.patch.object(note_synchronizer, "STREAM_CHUNKS_QUEUE_SIZE", 1)
+    mocker.patch.object(note_synchronizer, "CHUNKS_QUEUE_TIMEOUT", 0.01)
+
+    reader = note_synchronizer.ChunkStreamReader(
+        SyncChunkV2(last_timestamp=t) for t in range(10)
+    )
+    reader.start()
+    reader.stop()
+
+    reader._thread.join(timeout=5)
+    assert not reader._thread.is_alive()
+
+    with pytest.raises(WorkerStopException):
+        list(reader.pop_all())
+
+
 @pytest.mark.usefixtures("fake_init_db_jwt")
 def test_sync_add_task(cli_invoker, mock_evernote_client, fake_storage):
     mock_evernote_client.fake_notebooks.append(
@@ -1348,6 +2371,104 @@ def test_sync_update_jwt(
     assert fake_storage.config.get_config_value("auth_token") == fake_token_jwt
 
 
+class _ImmediateTokenRefresher(TokenRefresher):
+    """Refresh once when started, as if the tokens were about to expire."""
+
+    def start(self):
+        self.refresh()
+
+
+def test_sync_refreshes_jwt_during_sync(
+    tmp_path,
+    cli_invoker,
+    mock_evernote_client,
+    mock_oauth_client,
+    fake_token,
+    fake_token_jwt,
+    mocker,
+):
+    mock_evernote_client.fake_user = "fake_user"
+    mock_evernote_client.fake_notebooks.append(Notebook(guid="nbid1", name="name1"))
+    mock_evernote_client.fake_notes.append(_pipeline_note("id1"))
+
+    database = tmp_path / "test.db"
+    cli_invoker("init-db", "--database", str(database), "--token", fake_token)
+    SqliteStorage(database).config.set_config_value("auth_token", fake_token_jwt)
+
+    mock_oauth_client.expires_at += 100
+    refreshed_bundle = mock_oauth_client.token_bundle
+
+    used_tokens = []
+
+    def fake_get_note(self, note_guid, *args, **kwargs):
+        # Refreshed bundle is stored before the sync finishes
+        stored_token = SqliteStorage(database).config.get_config_value("auth_token")
+        assert stored_token == refreshed_bundle.to_json()
+
+        used_tokens.append(str(self.token))
+        return _pipeline_note(note_guid)
+
+    mocker.patch("evernote_backup.cli_app.TokenRefresher", _ImmediateTokenRefresher)
+    mocker.patch.object(EvernoteClientSync, "get_note", fake_get_note)
+
+    result = cli_invoker("sync", "--database", str(database))
+
+    assert result.exit_code == 0
+    assert "OAuth2 access token refreshed during sync" in result.output
+    assert used_tokens == [refreshed_bundle.monolith_token]
+
+
+def test_sync_refresh_drops_public_linked_notebooks_auth(
+    mock_evernote_client, mock_oauth_client, fake_storage, fake_token
+):
+    mock_evernote_client.fake_user = "fake_user"
+
+    note_client = EvernoteClientSync(
+        backend="evernote",
+        token=fake_token,
+        network_error_retry_count=0,
+        max_chunk_results=50,
+        cafile=None,
+    )
+    refresher = TokenRefresher(mock_oauth_client.token_bundle)
+
+    synchronizer = note_synchronizer.NoteSynchronizer(
+        note_client, fake_storage, 1, 256, True, token_refresher=refresher
+    )
+    private_auth = NotebookAuth(token="t1", shard="s1", expiration=4102444800000)
+    synchronizer.linked_notebooks_auth = {
+        "ln1": private_auth,
+        "ln2": NotebookAuth(token=fake_token, shard="s1"),
+    }
+
+    mock_oauth_client.expires_at += 100
+    refresher.refresh()
+
+    assert synchronizer.linked_notebooks_auth == {"ln1": private_auth}
+    assert str(note_client.token) == mock_oauth_client.token_bundle.monolith_token
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_one_off_jwt_refreshed_not_stored(
+    cli_invoker,
+    mock_evernote_client,
+    mock_oauth_client,
+    fake_storage,
+    fake_token,
+    fake_token_jwt,
+    mocker,
+):
+    mocker.patch("evernote_backup.cli_app.TokenRefresher", _ImmediateTokenRefresher)
+
+    one_off_token = OAuth2TokenBundle.from_json(fake_token_jwt).refresh_token
+
+    result = cli_invoker("sync", "--database", "fake_db", "--token", one_off_token)
+
+    assert result.exit_code == 0
+    assert "OAuth2 access token refreshed during sync" in result.output
+    assert fake_storage.config.get_config_value("auth_token") == fake_token
+
+
 @pytest.mark.usefixtures("fake_init_db_jwt")
 def test_sync_update_jwt_refresh_error(
     cli_invoker,
@@ -1432,3 +2553,166 @@ def test_sync_expired_refresh_token_jwt(
 
     assert result.exit_code == 1
     assert "OAuth2 refresh token is expired or about to expire" in result.output
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_tags_stored_from_chunks(cli_invoker, mock_evernote_client, fake_storage):
+    fake_storage.tags.add_tag_names({"tid1": "old", "tid2": "gone"})
+
+    mock_evernote_client.fake_tags = [Tag(guid="tid1", name="renamed")]
+    mock_evernote_client.fake_expunged_tags = ["tid2"]
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    assert result.exit_code == 0
+    assert fake_storage.tags.get_tag_names() == {"tid1": "renamed"}
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_no_http_compression(cli_invoker, mock_evernote_client, mocker):
+    mock_evernote_client.fake_notes.append(Note(guid="id1", title="test"))
+
+    note_store_spy = mocker.spy(FakeEvernoteNoteStore, "__init__")
+
+    result = cli_invoker("sync", "--database", "fake_db", "--no-http-compression")
+
+    assert result.exit_code == 0
+    assert note_store_spy.call_count > 1
+    assert all(
+        c.kwargs["http_compression"] is False for c in note_store_spy.call_args_list
+    )
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_http2(cli_invoker, mock_evernote_client, mocker):
+    mock_evernote_client.fake_notes.append(Note(guid="id1", title="test"))
+
+    note_store_spy = mocker.spy(FakeEvernoteNoteStore, "__init__")
+
+    result = cli_invoker("sync", "--database", "fake_db", "--http2")
+
+    assert result.exit_code == 0
+    assert note_store_spy.call_count > 1
+    assert all(c.kwargs["http2"] is True for c in note_store_spy.call_args_list)
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_http2_not_installed(cli_invoker, mock_evernote_client, mocker):
+    mocker.patch("evernote_backup.cli_app.is_http2_available", return_value=False)
+
+    result = cli_invoker("sync", "--database", "fake_db", "--http2")
+
+    assert result.exit_code == 1
+    assert "--http2 requires the 'h2' package." in result.output
+
+
+@pytest.fixture
+def reset_traffic_shaper():
+    yield
+
+    traffic_shaper.configure()
+
+
+@pytest.mark.usefixtures("fake_init_db")
+@pytest.mark.usefixtures("reset_traffic_shaper")
+def test_sync_traffic_limits(cli_invoker, mock_evernote_client, fake_storage, mocker):
+    mock_evernote_client.fake_notes.append(
+        Note(guid="id1", title="test", notebookGuid="test", active=True)
+    )
+
+    configure_spy = mocker.spy(traffic_shaper, "configure")
+
+    result = cli_invoker(
+        "sync",
+        "--database",
+        "fake_db",
+        "--max-request-rate",
+        "6000",
+        "--max-request-rate",
+        "3000@00:00-00:00",
+        "--max-download-rate",
+        "100",
+    )
+
+    assert result.exit_code == 0
+    assert "Traffic limits: [6000 req/min, 100 MB/s]" in result.output
+    assert configure_spy.call_args.args == (
+        (TrafficRule(6000), TrafficRule(3000, dt.time(0), dt.time(0))),
+        (TrafficRule(100),),
+    )
+    assert len(list(fake_storage.notes.iter_notes("test"))) == 1
+
+
+@pytest.mark.usefixtures("fake_init_db")
+@pytest.mark.usefixtures("reset_traffic_shaper")
+def test_sync_traffic_limits_process_share(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    mock_evernote_client.fake_notes.append(
+        Note(guid="id1", title="test", notebookGuid="test", active=True)
+    )
+
+    process_pool_spy = mocker.spy(note_synchronizer, "ProcessPoolExecutor")
+
+    result = cli_invoker(
+        "sync",
+        "--database",
+        "fake_db",
+        "--download-engine",
+        "process",
+        "--max-download-workers",
+        "4",
+        "--max-download-rate",
+        "100",
+    )
+
+    _, _, traffic_rules, traffic_share, log_level, _ = (
+        process_pool_spy.call_args.kwargs["initargs"]
+    )
+
+    assert result.exit_code == 0
+    assert traffic_rules == ((), (TrafficRule(100),))
+    # Four download processes and the parent one, which syncs chunks
+    assert traffic_share == 0.2
+    assert log_level == "INFO"
+    assert traffic_shaper._bandwidth.rate == 100 * 1024 * 1024
+    assert len(list(fake_storage.notes.iter_notes("test"))) == 1
+
+
+@pytest.mark.usefixtures("reset_traffic_shaper")
+def test_init_process_worker_logging(mocker, monkeypatch, fake_token):
+    monkeypatch.setattr(note_synchronizer, "_process_note_worker", None)
+    monkeypatch.setattr(logging.getLogger("evernote_backup"), "handlers", [])
+    mocker.patch.object(note_synchronizer.signal, "signal")
+    mock_init_logging = mocker.patch.object(note_synchronizer, "init_logging")
+
+    worker_args = {
+        "token": fake_token,
+        "backend": "evernote",
+        "network_error_retry_count": 0,
+        "max_chunk_results": 1,
+        "download_cache_memory_limit": 1,
+        "cafile": None,
+    }
+
+    try:
+        note_synchronizer._init_process_worker(
+            worker_args, {}, ((), ()), 1.0, "DEBUG", "user1.db"
+        )
+
+        assert get_log_label() == "user1.db"
+    finally:
+        set_log_label(None)
+
+    mock_init_logging.assert_called_once_with("DEBUG")
+    assert note_synchronizer._process_note_worker.token == fake_token
+
+
+@pytest.mark.usefixtures("fake_init_db")
+def test_sync_traffic_limits_bad_value(cli_invoker):
+    result = cli_invoker(
+        "sync", "--database", "fake_db", "--max-download-rate", "1@9am-5pm"
+    )
+
+    assert result.exit_code == 2
+    assert "is not a HH:MM-HH:MM time window" in result.output
@@ -0,0 +1,250 @@
+import threading
+import time
+
+import pytest
+from evernote.edam.error.ttypes import EDAMErrorCode, EDAMSystemException
+from evernote.edam.type.ttypes import Note, Notebook
+
+from evernote_backup import cli_app
+from evernote_backup.errors import WorkerStopException
+from evernote_backup.evernote_client_retry import RetryPolicy
+from evernote_backup.note_storage import SqliteStorage
+from evernote_backup.note_synchronizer import (
+    DownloadSlots,
+    NoteClientWorker,
+    RateLimitGate,
+    StopSignal,
+)
+
+
+@pytest.fixture
+def fake_databases(tmp_path, cli_invoker, mock_evernote_client, fake_token):
+    mock_evernote_client.fake_user = "fake_user"
+
+    databases = [tmp_path / "user1.db", tmp_path / "user2.db"]
+    for database in databases:
+        cli_invoker("init-db", "--database", database, "--token", fake_token)
+
+    return databases
+
+
+@pytest.fixture
+def fake_notes(mock_evernote_client):
+    mock_evernote_client.fake_notebooks.append(
+        Notebook(guid="nbid1", name="name1", stack="stack1", serviceUpdated=1000)
+    )
+
+    test_notes = [
+        Note(
+            guid=f"id{i}",
+            title=f"title{i}",
+            content=f"body{i}",
+            notebookGuid="nbid1",
+            active=True,
+            contentLength=100,
+        )
+        for i in range(10)
+    ]
+
+    mock_evernote_client.fake_notes.extend(test_notes)
+
+    return test_notes
+
+
+def test_sync_many(tmp_path, cli_invoker, fake_databases, fake_notes):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# accounts\nuser1.db\n\nuser2.db\n")
+
+    result = cli_invoker(
+        "sync-many",
+        str(manifest),
+        "--max-parallel-syncs",
+        "2",
+        "--max-total-download-workers",
+        "3",
+    )
+
+    assert result.exit_code == 0
+    assert "Syncing 2 database(s), up to 2 at a time..." in result.output
+    assert "Updated or added notes: 20" in result.output
+    assert "user2.db] Syncing user notebooks..." in result.output
+    assert "Synchronization of all databases completed!" in result.output
+
+    for database in fake_databases:
+        storage = SqliteStorage(database)
+
+        assert sorted(storage.notes.iter_notes("nbid1"), key=lambda n: n.guid) == (
+            sorted(fake_notes, key=lambda n: n.guid)
+        )
+
+
+def test_sync_many_failed_database(tmp_path, cli_invoker, fake_databases, fake_notes):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("missing.db\nuser1.db\n")
+
+    result = cli_invoker("sync-many", str(manifest))
+
+    storage = SqliteStorage(fake_databases[0])
+
+    assert result.exit_code == 1
+    assert "missing.db] Database file" in result.output
+    assert "user1.db] Synchronization completed!" in result.output
+    assert "user1.db: OK" in result.output
+    assert "Synchronization failed for 1 of 2 database(s)!" in result.output
+    assert len(list(storage.notes.iter_notes("nbid1"))) == len(fake_notes)
+
+
+@pytest.mark.parametrize(
+    ("manifest_text", "error"),
+    [
+        ("# nothing here\n\n", "No databases listed in manifest.txt."),
+        ("user1.db\n./user1.db\n", "is listed in the manifest more than once."),
+    ],
+)
+def test_sync_many_bad_manifest(
+    tmp_path, cli_invoker, fake_databases, manifest_text, error
+):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text(manifest_text)
+
+    result = cli_invoker("sync-many", str(manifest))
+
+    assert result.exit_code == 1
+    assert error in result.output
+
+
+def test_sync_database_stopped(fake_databases, fake_notes):
+    stop_signal = StopSignal()
+    stop_signal.set()
+
+    with pytest.raises(WorkerStopException):
+        cli_app._sync_database(
+            database=fake_databases[0],
+            max_chunk_results=200,
+            max_download_workers=1,
+            download_cache_memory_limit=256,
+            network_retry_count=0,
+            use_system_ssl_ca=False,
+            stop_signal=stop_signal,
+        )
+
+    storage = SqliteStorage(fake_databases[0])
+
+    assert list(storage.notes.iter_notes("nbid1")) == []
+    assert storage.config.get_config_value("USN") == "0"
+
+
+def test_download_slots_limit_fifo():
+    slots = DownloadSlots(1)
+    order = []
+
+    slots.acquire()
+
+    def take_slot(name):
+        with slots:
+            order.append(name)
+
+    waiters = []
+    for name in ("first", "second", "third"):
+        waiter = threading.Thread(target=take_slot, args=(name,))
+        waiter.start()
+        waiters.append(waiter)
+
+        # Let it queue up before the next one
+        while slots._next_ticket < len(waiters) + 1:
+            time.sleep(0.001)
+
+    assert order == []
+
+    slots.release()
+    for waiter in waiters:
+        waiter.join(timeout=5)
+
+    assert order == ["first", "second", "third"]
+    assert slots._in_use == 0
+
+
+def test_download_slots_cancel():
+    slots = DownloadSlots(1)
+    errors = []
+
+    slots.acquire()
+
+    def take_slot():
+        try:
+            slots.acquire()
+        except WorkerStopException as e:
+            errors.append(e)
+
+    waiter = threading.Thread(target=take_slot)
+    waiter.start()
+
+    slots.cancel()
+    waiter.join(timeout=5)
+
+    assert not waiter.is_alive()
+    assert len(errors) == 1
+
+    with pytest.raises(WorkerStopException):
+        slots.acquire()
+
+
+def test_download_slots_released_while_paused(mocker, fake_token):
+    slots = DownloadSlots(1)
+
+    workers = []
+    for _ in range(2):
+        worker = NoteClientWorker(
+            token=fake_token,
+            backend="evernote",
+            network_error_retry_count=0,
+            max_chunk_results=1,
+            download_cache_memory_limit=1,
+            cafile=None,
+            rate_limit_gate=RateLimitGate(),
+            retry_policy=RetryPolicy(budgets={}, base_delay=0, max_delay=0),
+            download_slots=slots,
+        )
+        worker._note_client = mocker.Mock(shard="s1")
+        workers.append(worker)
+
+    paused_worker, other_worker = workers
+    is_limited = True
+
+    def fetch_limited():
+        if is_limited:
+            raise EDAMSystemException(
+                errorCode=EDAMErrorCode.RATE_LIMIT_REACHED, rateLimitDuration=60
+            )
+        return Note(guid="id1")
+
+    paused = threading.Thread(
+        target=paused_worker._retry_download, args=("id1", fetch_limited)
+    )
+    paused.start()
+
+    while not paused_worker.rate_limit_gate._is_paused:
+        time.sleep(0.001)
+
+    slots_in_use = []
+
+    def fetch_other():
+        slots_in_use.append(slots._in_use)
+        return Note(guid="id2")
+
+    # Paused account waits for the rate limit without holding the only slot
+    other = threading.Thread(
+        target=other_worker._retry_download, args=("id2", fetch_other)
+    )
+    other.start()
+    other.join(timeout=5)
+
+    assert not other.is_alive()
+    assert slots_in_use == [1]
+
+    is_limited = False
+    paused_worker.rate_limit_gate.cancel()
+    paused.join(timeout=5)
+
+    assert not paused.is_alive()
+    assert slots._in_use == 0
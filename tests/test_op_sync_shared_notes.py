@@ -130,6 +130,38 @@ def test_sync_shared_note_create(cli_invoker, mock_evernote_client, fake_storage
     assert SHARED_WITH_ME_NOTEBOOK_NAME in nb_names
 
 
+@pytest.mark.usefixtures("fake_init_db_jwt")
+def test_sync_shared_note_placement_preloaded(
+    cli_invoker, mock_evernote_client, fake_storage, mocker
+):
+    _queue_shared_note_body(
+        mock_evernote_client,
+        Note(
+            guid=SHARED_NOTE_GUID,
+            title="shared title",
+            content="shared body",
+            notebookGuid="remote-nb",
+            contentLength=100,
+            active=True,
+        ),
+    )
+    mock_evernote_client.fake_updates = [
+        _membership_event(),
+        _note_entity_event(),
+    ]
+    spy_is_shared = mocker.spy(type(fake_storage.shared_notes), "is_shared_note")
+    spy_is_linked = mocker.spy(type(fake_storage.notes), "is_note_in_linked_notebook")
+
+    result = cli_invoker("sync", "--database", "fake_db")
+
+    notes = list(fake_storage.notes.iter_notes(SHARED_WITH_ME_NOTEBOOK_GUID))
+
+    assert result.exit_code == 0
+    assert [n.guid for n in notes] == [SHARED_NOTE_GUID]
+    spy_is_shared.assert_not_called()
+    spy_is_linked.assert_not_called()
+
+
 @pytest.mark.usefixtures("fake_init_db_jwt")
 def test_sync_shared_note_ignore_invitation(
     cli_invoker, mock_evernote_client, fake_storage
@@ -424,7 +456,7 @@ def test_sync_shared_note_entity_before_membership_ignored(
     assert result.exit_code == 0
     assert not fake_storage.shared_notes.is_shared_note(SHARED_NOTE_GUID)
     assert not fake_storage.notes.note_exists(SHARED_NOTE_GUID)
-    assert fake_storage.notes.get_notes_for_sync() == ()
+    assert tuple(fake_storage.notes.iter_notes_for_sync()) == ()
 
 
 @pytest.mark.usefixtures("fake_init_db_jwt")
@@ -1,3 +1,4 @@
+import threading
 from datetime import datetime, timezone
 from unittest.mock import MagicMock
 
@@ -6,8 +7,10 @@ import requests
 from oauthlib.oauth2 import OAuth2Error
 
 from evernote_backup.config_defaults import EVERNOTE_API_USERS_ME_URL
-from evernote_backup.errors import ProgramTerminatedError
+from evernote_backup.errors import OAuthTokenRefreshError, ProgramTerminatedError
 from evernote_backup.token_util import (
+    TOKEN_REFRESH_MIN_DELAY,
+    TokenRefresher,
     fetch_oauth_current_user,
     resolve_auth_token,
     verify_and_log_oauth_session,
@@ -147,3 +150,77 @@ def test_verify_and_log_oauth_session_missing_user_fields(
     assert "user ID unknown" in caplog.text
     assert "username unknown" in caplog.text
     assert "email unknown" in caplog.text
+
+
+def test_token_refresher_delay(mock_oauth_client):
+    refresher = TokenRefresher(mock_oauth_client.token_bundle)
+
+    # Tokens expire in an hour, refresh is due 15 minutes earlier
+    assert refresher.get_refresh_delay() == pytest.approx(45 * 60, abs=5)
+
+    mock_oauth_client.expires_at = mock_oauth_client.issued_at
+    refresher = TokenRefresher(mock_oauth_client.token_bundle)
+
+    assert refresher.get_refresh_delay() == TOKEN_REFRESH_MIN_DELAY
+
+
+def test_token_refresher_refresh(mock_oauth_client):
+    refresher = TokenRefresher(mock_oauth_client.token_bundle)
+    listener = MagicMock()
+    refresher.add_listener(listener)
+
+    mock_oauth_client.expires_at += 100
+    refresher.refresh()
+
+    new_bundle = mock_oauth_client.token_bundle
+
+    listener.assert_called_once_with(new_bundle)
+    assert refresher.bundle == new_bundle
+
+
+def test_token_refresher_listener_error(mock_oauth_client, caplog):
+    refresher = TokenRefresher(mock_oauth_client.token_bundle)
+    failing_listener = MagicMock(side_effect=RuntimeError("test"))
+    listener = MagicMock()
+    refresher.add_listener(failing_listener)
+    refresher.add_listener(listener)
+
+    mock_oauth_client.expires_at += 100
+    with caplog.at_level("ERROR"):
+        refresher.refresh()
+
+    new_bundle = mock_oauth_client.token_bundle
+
+    listener.assert_called_once_with(new_bundle)
+    assert refresher.bundle == new_bundle
+    assert "Failed to apply refreshed OAuth2 token" in caplog.text
+    assert "RuntimeError: test" in caplog.text
+
+
+def test_token_refresher_retries_in_background(mock_oauth_client, mocker, caplog):
+    mocker.patch("evernote_backup.token_util.TOKEN_REFRESH_MIN_DELAY", 0)
+    mocker.patch("evernote_backup.token_util.TOKEN_REFRESH_RETRY_DELAY", 0)
+
+    new_bundle = mock_oauth_client.token_bundle
+    mocker.patch(
+        "evernote_backup.token_util.refresh_oauth_token",
+        side_effect=[OAuthTokenRefreshError("Token refresh failed: test"), new_bundle],
+    )
+
+    mock_oauth_client.expires_at = mock_oauth_client.issued_at
+    refresher = TokenRefresher(mock_oauth_client.token_bundle)
+
+    refreshed = threading.Event()
+
+    def listener(bundle):
+        refresher.stop()
+        refreshed.set()
+
+    refresher.add_listener(listener)
+
+    with caplog.at_level("WARNING"):
+        refresher.start()
+        assert refreshed.wait(timeout=5)
+
+    assert refresher.bundle == new_bundle
+    assert "Token refresh failed: test, retrying in 0 seconds" in caplog.text